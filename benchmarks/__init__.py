@@ -0,0 +1,3 @@
+"""
+Бенчмарки RAG системы (запуск из корня репозитория: python -m benchmarks.<модуль>)
+"""
@@ -0,0 +1,219 @@
+"""
+Хранилища для бенчмарков: в памяти и PostgreSQL + pgvector
+
+Оба варианта используют SimpleRAG, поэтому замеряются те же этапы
+(embed, search, context, llm, log), что и в боте.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.common import SERVICES_DIR  # noqa: F401  (добавляет services в sys.path)
+from benchmarks.corpus import SyntheticDocument
+from shared.utils.document_processor import DocumentProcessor
+from shared.utils.embeddings import normalize_embeddings, similarity_matrix
+from shared.utils.metrics import StageTimer
+from shared.utils.simple_rag import SimpleRAG
+
+BENCHMARK_TITLE_PREFIX = "[benchmark] "
+
+
+@dataclass
+class MemoryDocument:
+    id: int
+    title: str
+
+
+@dataclass
+class MemoryChunk:
+    id: int
+    document_id: int
+    content: str
+    chunk_index: int
+
+
+class InMemoryVectorStore:
+    """Векторное хранилище в памяти (точный поиск по косинусной близости)"""
+
+    def __init__(self):
+        self.documents: Dict[int, MemoryDocument] = {}
+        self.chunks: List[MemoryChunk] = []
+        self._vectors: List[np.ndarray] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def add_document(self, document_id: int, title: str):
+        self.documents[document_id] = MemoryDocument(document_id, title)
+
+    def add_chunks(self, document_id: int, contents: List[str], embeddings: np.ndarray):
+        for index, content in enumerate(contents):
+            self.chunks.append(MemoryChunk(len(self.chunks) + 1, document_id, content, index))
+        if len(contents):
+            self._vectors.extend(normalize_embeddings(embeddings))
+        self._matrix = None
+
+    def search(self, query_embedding, limit: int, threshold: float) -> List[MemoryChunk]:
+        if not self.chunks:
+            return []
+        if self._matrix is None:
+            self._matrix = np.vstack(self._vectors)
+
+        if not np.any(query_embedding):
+            return []
+        indexes, similarities = similarity_matrix(normalize_embeddings(query_embedding), self._matrix,
+                                                  top_k=limit, normalized=True)
+        return [self.chunks[i] for i, similarity in zip(indexes, similarities) if similarity > threshold]
+
+
+class InMemoryRAG(SimpleRAG):
+    """SimpleRAG, у которого pgvector и таблицы заменены хранилищем в памяти"""
+
+    def __init__(self, store: InMemoryVectorStore, embeddings_model, api_key: str = "benchmark",
+                 search_limit: int = 5, similarity_threshold: float = 0.7):
+        # Кэш вопросов выключен: прогревочные вопросы повторяются в замере
+        super().__init__(None, api_key, embeddings_model=embeddings_model,
+                         search_limit=search_limit, similarity_threshold=similarity_threshold,
+                         question_cache_size=0)
+        self.store = store
+        self.logged_queries = 0
+
+    def search_relevant_chunks(self, question: str, limit: int = 5, similarity_threshold: float = 0.7,
+                               timer: Optional[StageTimer] = None) -> List[MemoryChunk]:
+        timer = timer or StageTimer()
+        with timer.stage('embed'):
+            question_embedding = self.create_embedding(question)
+        if question_embedding is None or len(question_embedding) == 0:
+            return []
+        with timer.stage('search'):
+            return self.store.search(question_embedding, limit, similarity_threshold)
+
+    def _load_documents(self, chunks) -> Dict[int, MemoryDocument]:
+        return {chunk.document_id: self.store.documents[chunk.document_id] for chunk in chunks}
+
+    def _log_query(self, user_id, question, answer, chunks_count, response_time=None):
+        self.logged_queries += 1
+
+    def _check_database(self) -> bool:
+        return True
+
+
+def _chunk_and_embed(document: SyntheticDocument, chunker: Callable[[str], List[str]], model,
+                     batch_size: int, timings: Dict[str, float]):
+    start = time.perf_counter()
+    chunks = chunker(document.text)
+    timings["chunk"] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    embeddings = model.encode(chunks, batch_size=batch_size)
+    timings["embed"] += time.perf_counter() - start
+    return chunks, embeddings
+
+
+class InMemoryBackend:
+    name = "memory"
+
+    def __init__(self):
+        self.store = InMemoryVectorStore()
+
+    def ingest(self, documents: List[SyntheticDocument], model, batch_size: int = 32,
+               chunker: Optional[Callable[[str], List[str]]] = None) -> Dict[str, float]:
+        chunker = chunker or DocumentProcessor().split_into_chunks
+        timings = {"chunk": 0.0, "embed": 0.0, "insert": 0.0}
+        for document in documents:
+            chunks, embeddings = _chunk_and_embed(document, chunker, model, batch_size, timings)
+            start = time.perf_counter()
+            self.store.add_document(document.doc_id, document.title)
+            self.store.add_chunks(document.doc_id, chunks, embeddings)
+            timings["insert"] += time.perf_counter() - start
+        return timings
+
+    def chunks_count(self) -> int:
+        return len(self.store.chunks)
+
+    def make_rag(self, model, search_limit: int, similarity_threshold: float) -> SimpleRAG:
+        return InMemoryRAG(self.store, model, search_limit=search_limit,
+                           similarity_threshold=similarity_threshold)
+
+    def cleanup(self):
+        pass
+
+
+class PostgresBackend:
+    """
+    Прогон на реальной PostgreSQL + pgvector
+
+    Документы бенчмарка помечаются префиксом в названии и удаляются в cleanup().
+    """
+    name = "postgres"
+
+    def __init__(self, database_url: str, pool_size: int = 10):
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+
+        self.engine = create_engine(database_url, pool_size=pool_size, pool_pre_ping=True)
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.document_ids: List[int] = []
+        self._chunks_count = 0
+
+    def ingest(self, documents: List[SyntheticDocument], model, batch_size: int = 32,
+               chunker: Optional[Callable[[str], List[str]]] = None) -> Dict[str, float]:
+        from shared.models import Document, DocumentChunk
+
+        chunker = chunker or DocumentProcessor().split_into_chunks
+        timings = {"chunk": 0.0, "embed": 0.0, "insert": 0.0}
+        db = self.SessionLocal()
+        try:
+            for document in documents:
+                chunks, embeddings = _chunk_and_embed(document, chunker, model, batch_size, timings)
+
+                start = time.perf_counter()
+                row = Document(
+                    filename=f"benchmark_{document.doc_id}.txt",
+                    original_filename=f"benchmark_{document.doc_id}.txt",
+                    file_path=f"/tmp/benchmark_{document.doc_id}.txt",
+                    file_size=len(document.text.encode("utf-8")),
+                    file_type="txt",
+                    title=BENCHMARK_TITLE_PREFIX + document.title,
+                    description="Синтетический документ бенчмарка",
+                    processing_status="completed",
+                    chunks_count=len(chunks),
+                )
+                db.add(row)
+                db.flush()
+                self.document_ids.append(row.id)
+                for index, (content, embedding) in enumerate(zip(chunks, embeddings)):
+                    db.add(DocumentChunk(
+                        document_id=row.id,
+                        chunk_index=index,
+                        content=content,
+                        content_length=len(content),
+                        embedding=embedding,
+                    ))
+                db.commit()
+                self._chunks_count += len(chunks)
+                timings["insert"] += time.perf_counter() - start
+        finally:
+            db.close()
+        return timings
+
+    def chunks_count(self) -> int:
+        return self._chunks_count
+
+    def make_rag(self, model, search_limit: int, similarity_threshold: float) -> SimpleRAG:
+        return SimpleRAG(self.SessionLocal(), "benchmark", embeddings_model=model,
+                         search_limit=search_limit, similarity_threshold=similarity_threshold,
+                         question_cache_size=0)
+
+    def cleanup(self):
+        from shared.models import Document
+
+        db = self.SessionLocal()
+        try:
+            for document in db.query(Document).filter(Document.id.in_(self.document_ids)).all():
+                db.delete(document)
+            db.commit()
+        finally:
+            db.close()
+        self.engine.dispose()
@@ -0,0 +1,105 @@
+"""
+Сравнение стратегий чанкирования: по символам и по токенам модели
+
+На DOCX со структурой (заголовки, нумерованные пункты, абзацы) для каждой
+стратегии считает:
+
+- количество чанков и время разбиения;
+- длину чанков в токенах (p50/p95/max) и среднее заполнение лимита модели;
+- долю чанков длиннее лимита (их хвост модель отбрасывает);
+- время создания эмбеддингов для всех чанков документа.
+
+С заглушкой --model hashing токены оцениваются по числу символов, а время
+эмбеддингов не отражает реальную модель; для настоящих цифр нужна модель
+sentence-transformers (используется ее токенизатор и max_seq_length).
+
+Пример:
+    python -m benchmarks.chunking_benchmark --model ai-forever/sbert_large_nlu_ru --documents 8
+    python -m benchmarks.chunking_benchmark --docx /path/to/policy.docx
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import load_embeddings_model, summarize, write_results
+from shared.utils.chunking import StructuredChunker, TokenCounter, iter_docx_blocks
+from shared.utils.document_processor import DocumentProcessor
+
+
+def measure(name: str, chunk, model, counter: TokenCounter, batch_size: int) -> dict:
+    start = time.perf_counter()
+    chunks = chunk()
+    chunk_seconds = time.perf_counter() - start
+
+    tokens = counter.count_batch(chunks)
+    start = time.perf_counter()
+    model.encode(chunks, batch_size=batch_size)
+    embed_seconds = time.perf_counter() - start
+
+    return {
+        "strategy": name,
+        "chunks": len(chunks),
+        "chunk_seconds": round(chunk_seconds, 4),
+        "embed_seconds": round(embed_seconds, 4),
+        "tokens": summarize([float(value) for value in tokens]),
+        "mean_fill": round(sum(min(value, counter.max_tokens) for value in tokens)
+                           / (len(tokens) * counter.max_tokens), 3) if tokens else None,
+        "truncated_share": round(sum(1 for value in tokens if value > counter.max_tokens) / len(tokens), 3)
+        if tokens else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение стратегий чанкирования")
+    parser.add_argument("--model", default="hashing")
+    parser.add_argument("--docx", default=None, help="Свой DOCX вместо сгенерированного")
+    parser.add_argument("--documents", type=int, default=8, help="Документов корпуса в сгенерированном DOCX")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=200)
+    parser.add_argument("--max-tokens", type=int, default=0, help="Лимит токенов (0 - по модели)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    from benchmarks.pdfgen import generate_structured_docx
+
+    model = load_embeddings_model(args.model)
+    counter = TokenCounter.from_model(model, args.max_tokens)
+    chunker = StructuredChunker(counter)
+    processor = DocumentProcessor()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.docx) if args.docx else generate_structured_docx(
+            Path(tmp) / "structured.docx", args.documents, seed=args.seed)
+        text = processor.extract_text(str(path))
+        blocks = list(iter_docx_blocks(str(path)))
+
+        results = [
+            measure(f"chars(size={args.chunk_size}, overlap={args.overlap})",
+                    lambda: processor.split_into_chunks(text, args.chunk_size, args.overlap),
+                    model, counter, args.batch_size),
+            measure(f"tokens(max={counter.max_tokens})",
+                    lambda: list(chunker.iter_chunks(blocks)),
+                    model, counter, args.batch_size),
+        ]
+
+    for result in results:
+        print(f"{result['strategy']:32s} чанков {result['chunks']:5d}  "
+              f"токенов p50={result['tokens']['p50']} max={result['tokens']['max']}  "
+              f"заполнение {result['mean_fill']}  обрезано {result['truncated_share']}  "
+              f"эмбеддинги {result['embed_seconds']} с")
+
+    output = write_results("chunking", {
+        "parameters": vars(args),
+        "max_tokens": counter.max_tokens,
+        "exact_tokens": counter.tokenizer is not None,
+        "results": results,
+    }, args.output)
+    print(f"Результаты: {output}")
+
+
+if __name__ == "__main__":
+    main()
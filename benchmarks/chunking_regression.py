@@ -0,0 +1,206 @@
+"""
+Регрессионная проверка чанкеров на неудобных входных данных
+
+Для DocumentProcessor.split_into_chunks и text_processing.chunk_text на каждом
+случае (длинные URL, таблицы, base64, текст без пунктуации, разделители сразу
+после начала чанка) проверяет:
+
+- количество чанков не превышает estimate_chunk_count;
+- каждый чанк не длиннее chunk_size;
+- чанки идут по порядку и вместе покрывают весь текст (между ними только пробелы);
+
+и сравнивает количество чанков и время с прежними реализациями, у которых
+начало чанка могло сдвигаться на один символ.
+
+Пример:
+    python -m benchmarks.chunking_regression --chunk-size 1000 --overlap 200
+"""
+
+import argparse
+import random
+import string
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.common import write_results
+from shared.utils.document_processor import DocumentProcessor
+from shared.utils.text_processing import chunk_text, clean_text, estimate_chunk_count
+
+PROSE = ("Сотрудник имеет право на ежегодный оплачиваемый отпуск продолжительностью 28 календарных дней. "
+         "Заявление подается руководителю не позднее чем за две недели. ")
+
+
+def adversarial_cases(rng: random.Random) -> Dict[str, str]:
+    """
+    Неудобные тексты
+
+    Повторяющиеся фрагменты пронумерованы: в непериодическом тексте позиция
+    каждого чанка однозначна, что нужно для проверки покрытия в check_chunks.
+    """
+    url = "https://portal.example.ru/docs/" + "/".join(
+        "".join(rng.choice(string.ascii_lowercase + string.digits) for _ in range(12)) for _ in range(400))
+    base64_blob = "".join(rng.choice(string.ascii_letters + string.digits + "+/") for _ in range(20000))
+    table = "\n".join("|" + "|".join(f"{row * 7 + col:>6}" for col in range(12)) + "|" for row in range(600))
+    def prose(count: int) -> str:
+        return "".join(f"{i}. {PROSE}" for i in range(count))
+
+    no_punctuation = " ".join(rng.choice(["отпуск", "сотрудник", "приказ", "оклад", "премия"]) for _ in range(4000))
+    words_without_spaces = "".join(rng.choice(string.ascii_lowercase) for _ in range(30000))
+    return {
+        "prose_then_long_url": prose(3) + url + " " + prose(3),
+        "urls_separated_by_spaces": " ".join(url[i * 50:i * 50 + 1500] for i in range(20)),
+        "prose_then_base64": prose(4) + base64_blob,
+        "markdown_table": table,
+        "table_without_spaces": table.replace(" ", ""),
+        "no_punctuation": no_punctuation,
+        "no_separators": words_without_spaces,
+        "sentence_ends_every_chunk_start": "".join(f"Да {i}. " + base64_blob[i * 1200:(i + 1) * 1200] + " "
+                                                   for i in range(15)),
+        "whitespace_runs": "".join(f"слово{i}" + " " * 900 + "\n" for i in range(50)),
+        "regular_prose": prose(300),
+    }
+
+
+def legacy_split_into_chunks(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+    """Прежний DocumentProcessor.split_into_chunks"""
+    if not text or not text.strip():
+        return []
+    chunks = []
+    text = text.strip()
+    if len(text) <= chunk_size:
+        return [text]
+    start = 0
+    while start < len(text):
+        end = start + chunk_size
+        if end < len(text):
+            for separator in ['. ', '\n', ' ']:
+                sep_pos = text.rfind(separator, start, end)
+                if sep_pos != -1:
+                    end = sep_pos + len(separator)
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = max(start + 1, end - overlap)
+    return chunks
+
+
+def legacy_chunk_text(text: str, chunk_size: int = 800, overlap: int = 150,
+                      max_iterations: int = 100000) -> Optional[List[str]]:
+    """Прежний chunk_text (None, если цикл не завершился за max_iterations)"""
+    if not text:
+        return []
+    text = clean_text(text)
+    if len(text) <= chunk_size:
+        return [text]
+    chunks = []
+    start = 0
+    for _ in range(max_iterations):
+        if start >= len(text):
+            return chunks
+        end = start + chunk_size
+        if end < len(text):
+            sentence_end = max(text.rfind('.', start, end), text.rfind('!', start, end),
+                               text.rfind('?', start, end))
+            if sentence_end > start:
+                end = sentence_end + 1
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = end - overlap
+        if start >= end:
+            start = end
+    return None
+
+
+def check_chunks(text: str, chunks: List[str], chunk_size: int, overlap: int) -> List[str]:
+    """Нарушения инвариантов чанкера (пустой список, если все в порядке)"""
+    problems = []
+    limit = estimate_chunk_count(len(text), chunk_size, overlap)
+    if len(chunks) > limit:
+        problems.append(f"чанков {len(chunks)} > оценки {limit}")
+
+    covered = len(text) - len(text.lstrip())
+    previous_start = -1
+    for index, chunk in enumerate(chunks):
+        if len(chunk) > chunk_size:
+            problems.append(f"чанк {index} длиннее chunk_size: {len(chunk)}")
+        position = text.find(chunk, previous_start + 1)
+        if position == -1:
+            problems.append(f"чанк {index} не найден в тексте после предыдущего")
+            return problems
+        if text[covered:position].strip():
+            problems.append(f"пропущен текст перед чанком {index}")
+        previous_start = position
+        covered = max(covered, position + len(chunk))
+    if text[covered:].strip():
+        problems.append("пропущен конец текста")
+    return problems
+
+
+def run_chunker(func: Callable[[str], Optional[List[str]]], text: str):
+    start = time.perf_counter()
+    chunks = func(text)
+    return chunks, round(time.perf_counter() - start, 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Регрессионная проверка чанкеров")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=200)
+    parser.add_argument("--skip-legacy", action="store_true", help="Не запускать прежние реализации")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    processor = DocumentProcessor()
+    chunkers = {
+        "split_into_chunks": (
+            lambda text: processor.split_into_chunks(text, args.chunk_size, args.overlap),
+            lambda text: legacy_split_into_chunks(text, args.chunk_size, args.overlap),
+            lambda text: text,
+        ),
+        "chunk_text": (
+            lambda text: chunk_text(text, args.chunk_size, args.overlap),
+            lambda text: legacy_chunk_text(text, args.chunk_size, args.overlap),
+            clean_text,
+        ),
+    }
+
+    results = []
+    failed = False
+    for case, text in adversarial_cases(random.Random(args.seed)).items():
+        for name, (chunker, legacy, normalize) in chunkers.items():
+            chunks, seconds = run_chunker(chunker, text)
+            problems = check_chunks(normalize(text), chunks, args.chunk_size, args.overlap)
+            result = {
+                "case": case,
+                "chunker": name,
+                "text_length": len(text),
+                "chunks": len(chunks),
+                "estimate": estimate_chunk_count(len(normalize(text)), args.chunk_size, args.overlap),
+                "seconds": seconds,
+                "problems": problems,
+            }
+            if not args.skip_legacy:
+                legacy_chunks, legacy_seconds = run_chunker(legacy, text)
+                result["legacy_chunks"] = len(legacy_chunks) if legacy_chunks is not None else "не завершился"
+                result["legacy_seconds"] = legacy_seconds
+            results.append(result)
+            failed = failed or bool(problems)
+
+            legacy_info = (f"  было {result['legacy_chunks']} ({result['legacy_seconds']} с)"
+                           if not args.skip_legacy else "")
+            status = "OK" if not problems else "ОШИБКА: " + "; ".join(problems)
+            print(f"{case:34s} {name:18s} чанков {len(chunks):5d} (оценка {result['estimate']:5d}, "
+                  f"{seconds} с){legacy_info}  {status}")
+
+    path = write_results("chunking-regression", {"parameters": vars(args), "results": results}, args.output)
+    print(f"Результаты: {path}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
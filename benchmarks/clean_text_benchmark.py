@@ -0,0 +1,118 @@
+"""
+Проверка и бенчмарк однопроходного clean_text
+
+1. Эквивалентность: на случайных строках (буквы разных алфавитов, цифры,
+   разрешенная пунктуация, спецсимволы, все виды пробельных символов Unicode)
+   сравнивает clean_text с прежней трехпроходной реализацией.
+2. Скорость: время обеих реализаций и chunk_text на тексте в несколько мегабайт.
+
+Пример:
+    python -m benchmarks.clean_text_benchmark --cases 20000 --sizes-mb 1,4,16
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+
+from benchmarks.common import summarize, write_results
+from benchmarks.corpus import generate_corpus
+from shared.utils.text_processing import chunk_text, clean_text
+
+# Пробельные (в том числе редкие Unicode) и невидимые символы
+WHITESPACE = [" ", "\t", "\n", "\r", "\f", "\v", "\x1c", "\x1d", "\x1e", "\x1f", "\x85",
+              "\xa0", "\u1680", "\u2000", "\u2007", "\u200b", "\u2028", "\u2029", "\u202f",
+              "\u3000", "\ufeff"]
+ALLOWED_PUNCTUATION = list(".,!?;:()-—–«»\"'")
+SPECIAL = list("@#$%^&*+=[]{}<>/\\|~`№§©•…“”„‘’\x00\x07\u0301") + ["\U0001f600"]
+LETTERS = list("абвгдеёжзийклмнопрстуфхцчшщъыьэюяАБЯ") + list("abcxyzXYZ_0123456789") + ["ß", "ǅ", "٣", "²"]
+
+
+def legacy_clean_text(text: str) -> str:
+    """Прежняя реализация clean_text (три прохода re.sub)"""
+    if not text:
+        return ""
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'[^\w\s\.,!?;:()\-—–«»""\']+', ' ', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+def random_text(rng: random.Random, max_length: int) -> str:
+    pools = [WHITESPACE, ALLOWED_PUNCTUATION, SPECIAL, LETTERS, LETTERS]
+    return "".join(rng.choice(rng.choice(pools)) for _ in range(rng.randint(0, max_length)))
+
+
+def check_equivalence(cases: int, max_length: int, seed: int) -> int:
+    """Сравнивает реализации на случайных строках, возвращает число проверенных случаев"""
+    rng = random.Random(seed)
+    fixed = ["", " ", "\n\t ", "«Привет», — сказал он!", "a b c", "@@@", "x" * 10]
+    for index in range(cases + len(fixed)):
+        text = fixed[index] if index < len(fixed) else random_text(rng, max_length)
+        expected = legacy_clean_text(text)
+        actual = clean_text(text)
+        if actual != expected:
+            raise AssertionError(f"Расхождение на {text!r}: {actual!r} != {expected!r}")
+    return cases + len(fixed)
+
+
+def make_large_text(size_mb: float, seed: int) -> str:
+    """Текст заданного размера из синтетического корпуса с табуляциями и спецсимволами"""
+    rng = random.Random(seed)
+    base = "\n\n".join(document.text for document in generate_corpus(20, seed=seed))
+    noisy = "".join(ch if rng.random() > 0.02 else rng.choice(SPECIAL + WHITESPACE) for ch in base)
+    target = int(size_mb * 1024 * 1024)
+    return (noisy * (target // len(noisy.encode("utf-8")) + 1))[:target // 2]
+
+
+def time_call(func, text: str, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка и бенчмарк clean_text")
+    parser.add_argument("--cases", type=int, default=20000, help="Случайных строк для проверки эквивалентности")
+    parser.add_argument("--max-length", type=int, default=200)
+    parser.add_argument("--sizes-mb", default="1,4,16", help="Размеры текста для замера, МБ")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    checked = check_equivalence(args.cases, args.max_length, args.seed)
+    print(f"Эквивалентность: {checked} строк, расхождений нет")
+
+    results = []
+    for size_mb in [float(value) for value in args.sizes_mb.split(",") if value.strip()]:
+        text = make_large_text(size_mb, args.seed)
+        if clean_text(text) != legacy_clean_text(text):
+            print(f"Расхождение на тексте {size_mb} МБ", file=sys.stderr)
+            sys.exit(1)
+        result = {
+            "size_mb": round(len(text.encode("utf-8")) / 1024 / 1024, 2),
+            "legacy": time_call(legacy_clean_text, text, args.repeat),
+            "clean_text": time_call(clean_text, text, args.repeat),
+            "chunk_text": time_call(chunk_text, text, args.repeat),
+        }
+        results.append(result)
+        speedup = result["legacy"]["p50"] / result["clean_text"]["p50"] if result["clean_text"]["p50"] else None
+        print(f"{result['size_mb']:7.2f} МБ  legacy p50={result['legacy']['p50']:.4f} с  "
+              f"clean_text p50={result['clean_text']['p50']:.4f} с  "
+              f"(x{speedup:.2f})  chunk_text p50={result['chunk_text']['p50']:.4f} с")
+
+    path = write_results("clean-text", {
+        "parameters": vars(args),
+        "equivalence_cases": checked,
+        "results": results,
+    }, args.output)
+    print(f"Результаты: {path}")
+
+
+if __name__ == "__main__":
+    main()
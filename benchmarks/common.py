@@ -0,0 +1,150 @@
+"""
+Общие утилиты бенчмарков: пути к shared модулям, статистика, запись результатов
+"""
+
+import json
+import math
+import platform
+import re
+import subprocess
+import sys
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# shared модули импортируются так же, как в контейнере админ-панели: shared.utils.*
+SERVICES_DIR = REPO_ROOT / "services"
+if str(SERVICES_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVICES_DIR))
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Перцентиль методом ближайшего ранга (q от 0 до 100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    """Сводка по выборке длительностей в секундах"""
+    if not values:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 6),
+        "p50": round(percentile(values, 50), 6),
+        "p95": round(percentile(values, 95), 6),
+        "p99": round(percentile(values, 99), 6),
+        "max": round(max(values), 6),
+    }
+
+
+def git_revision() -> Dict[str, Optional[str]]:
+    """Текущий коммит и признак незакоммиченных изменений"""
+    def run(*args: str) -> Optional[str]:
+        try:
+            return subprocess.check_output(["git", *args], cwd=REPO_ROOT, stderr=subprocess.DEVNULL,
+                                           text=True).strip()
+        except Exception:
+            return None
+
+    return {
+        "commit": run("rev-parse", "HEAD"),
+        "dirty": bool(run("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+def environment_info() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+    }
+
+
+def write_results(name: str, results: dict, output: Optional[str] = None) -> Path:
+    """
+    Запись результатов в JSON вместе с метаданными о коммите и окружении
+
+    По умолчанию: benchmarks/results/<name>-<commit>.json
+    """
+    revision = git_revision()
+    payload = {
+        "benchmark": name,
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "git": revision,
+        "environment": environment_info(),
+        **results,
+    }
+
+    if output:
+        path = Path(output)
+    else:
+        commit = (revision["commit"] or "nogit")[:12]
+        path = RESULTS_DIR / f"{name}-{commit}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    return path
+
+
+class HashingEmbeddings:
+    """
+    Детерминированная замена SentenceTransformer для бенчмарков
+
+    Векторизует текст хешированием основ слов. Скорость не отражает
+    реальную модель, поэтому подходит для измерения остальных этапов
+    пайплайна и для воспроизводимых прогонов без загрузки модели.
+    """
+
+    _word_re = re.compile(r"\w+", re.UNICODE)
+
+    def __init__(self, dim: int = 1024, stem_length: int = 6):
+        self.dim = dim
+        self.stem_length = stem_length
+        self.max_seq_length = 512
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _encode_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in self._word_re.findall(text.lower()):
+            stem = word[:self.stem_length].encode("utf-8")
+            bucket = zlib.crc32(stem)
+            vector[bucket % self.dim] += 1.0 if bucket & 0x80000000 else -1.0
+        return vector
+
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = False,
+               convert_to_numpy: bool = True, show_progress_bar: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if texts:
+            matrix = np.vstack([self._encode_one(text) for text in texts])
+        else:
+            matrix = np.zeros((0, self.dim), dtype=np.float32)
+        if normalize_embeddings and len(matrix):
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms == 0, 1.0, norms)
+        return matrix[0] if single else matrix
+
+
+def load_embeddings_model(name: str):
+    """
+    Загрузка модели эмбеддингов для бенчмарка
+
+    Args:
+        name: "hashing" для детерминированной заглушки или имя модели sentence-transformers
+    """
+    if name == "hashing":
+        return HashingEmbeddings()
+
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(name)
@@ -0,0 +1,47 @@
+"""
+Сравнение двух JSON файлов с результатами бенчмарков
+
+    python -m benchmarks.compare old.json new.json
+"""
+
+import argparse
+import json
+from typing import Dict
+
+
+def flatten(data, prefix: str = "") -> Dict[str, float]:
+    """Числовые значения вложенного словаря с ключами вида a.b.c"""
+    values = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            values.update(flatten(value, f"{prefix}{key}."))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        values[prefix.rstrip(".")] = float(data)
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение результатов бенчмарков")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--all", action="store_true", help="Показать и параметры запуска")
+    args = parser.parse_args()
+
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+
+    print(f"old: {old.get('git', {}).get('commit')}  new: {new.get('git', {}).get('commit')}")
+    old_values = flatten(old)
+    new_values = flatten(new)
+    for key in sorted(old_values.keys() & new_values.keys()):
+        if not args.all and key.startswith(("parameters.", "environment.", "git.")):
+            continue
+        before, after = old_values[key], new_values[key]
+        delta = (after - before) / before * 100 if before else 0.0
+        print(f"{key:60s} {before:14.6g} {after:14.6g} {delta:+8.1f}%")
+
+
+if __name__ == "__main__":
+    main()
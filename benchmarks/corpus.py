@@ -0,0 +1,197 @@
+"""
+Генератор синтетического корпуса корпоративных документов на русском языке
+
+Корпус детерминирован (зависит только от seed), поэтому результаты
+бенчмарков можно сравнивать между коммитами.
+"""
+
+import random
+from dataclasses import dataclass, field
+from typing import List
+
+# Темы документов: название, ключевые слова и вопросы сотрудников
+TOPICS = [
+    {
+        "title": "Положение об отпусках",
+        "subject": "ежегодный оплачиваемый отпуск",
+        "keywords": ["отпуск", "заявление на отпуск", "график отпусков", "перенос отпуска"],
+        "questions": [
+            "Как оформить ежегодный отпуск?",
+            "Сколько дней отпуска положено сотруднику?",
+            "Можно ли перенести отпуск на другой месяц?",
+        ],
+    },
+    {
+        "title": "Регламент служебных командировок",
+        "subject": "служебная командировка",
+        "keywords": ["командировка", "суточные", "авансовый отчет", "проездные документы"],
+        "questions": [
+            "Какие документы нужны для командировки?",
+            "Какой размер суточных в командировке?",
+            "Когда нужно сдать авансовый отчет после командировки?",
+        ],
+    },
+    {
+        "title": "Порядок оформления больничного листа",
+        "subject": "листок временной нетрудоспособности",
+        "keywords": ["больничный", "электронный больничный", "пособие", "нетрудоспособность"],
+        "questions": [
+            "Как сообщить о больничном?",
+            "Как оплачивается больничный лист?",
+            "Куда передать номер электронного больничного?",
+        ],
+    },
+    {
+        "title": "Положение об оплате труда",
+        "subject": "заработная плата",
+        "keywords": ["зарплата", "аванс", "премия", "расчетный листок"],
+        "questions": [
+            "Когда выплачивается заработная плата?",
+            "Как получить расчетный листок?",
+            "Как начисляется квартальная премия?",
+        ],
+    },
+    {
+        "title": "Инструкция по охране труда",
+        "subject": "охрана труда",
+        "keywords": ["инструктаж", "средства защиты", "несчастный случай", "пожарная безопасность"],
+        "questions": [
+            "Как часто проводится инструктаж по охране труда?",
+            "Что делать при несчастном случае на производстве?",
+            "Где получить средства индивидуальной защиты?",
+        ],
+    },
+    {
+        "title": "Правила удаленной работы",
+        "subject": "дистанционная работа",
+        "keywords": ["удаленка", "рабочее время", "VPN", "корпоративный ноутбук"],
+        "questions": [
+            "Как перейти на удаленную работу?",
+            "Как подключиться к корпоративной сети из дома?",
+            "Кто выдает корпоративный ноутбук для удаленной работы?",
+        ],
+    },
+    {
+        "title": "Порядок увольнения сотрудников",
+        "subject": "расторжение трудового договора",
+        "keywords": ["увольнение", "обходной лист", "отработка", "трудовая книжка"],
+        "questions": [
+            "Какая процедура увольнения по собственному желанию?",
+            "Нужно ли отрабатывать две недели при увольнении?",
+            "Как подписать обходной лист?",
+        ],
+    },
+    {
+        "title": "Программа добровольного медицинского страхования",
+        "subject": "полис ДМС",
+        "keywords": ["ДМС", "страховая компания", "клиника", "стоматология"],
+        "questions": [
+            "Как получить полис ДМС?",
+            "Входит ли стоматология в ДМС?",
+            "Можно ли прикрепить родственников к ДМС?",
+        ],
+    },
+]
+
+SENTENCE_TEMPLATES = [
+    "{Subject} оформляется через отдел кадров не позднее чем за {days} календарных дней.",
+    "Вопросы, связанные с темой «{keyword}», рассматриваются руководителем подразделения в течение {days} рабочих дней.",
+    "Сотрудник обязан ознакомиться с разделом «{keyword}» под подпись в электронной системе документооборота.",
+    "Для согласования используется форма {form_id}, которую можно скачать на корпоративном портале.",
+    "В соответствии с пунктом {clause} настоящего положения {subject} учитывается при расчете выплат.",
+    "Размер компенсации составляет {amount} рублей и пересматривается ежегодно.",
+    "Контроль за соблюдением правил «{keyword}» возлагается на HR-отдел и службу внутреннего контроля.",
+    "При отсутствии необходимых документов заявка возвращается сотруднику на доработку.",
+    "Информация о статусе заявки направляется сотруднику по корпоративной почте.",
+    "Исключения из общего порядка допускаются только по согласованию с директором по персоналу.",
+]
+
+
+@dataclass
+class SyntheticDocument:
+    """Документ синтетического корпуса"""
+    doc_id: int
+    title: str
+    text: str
+    topic: int
+
+
+@dataclass
+class LabelledQuestion:
+    """Вопрос с известным правильным документом"""
+    question: str
+    relevant_doc_ids: List[int] = field(default_factory=list)
+
+
+def _paragraph(rng: random.Random, topic: dict, sentences: int) -> str:
+    parts = []
+    for _ in range(sentences):
+        template = rng.choice(SENTENCE_TEMPLATES)
+        parts.append(template.format(
+            Subject=topic["subject"].capitalize(),
+            subject=topic["subject"],
+            keyword=rng.choice(topic["keywords"]),
+            days=rng.choice([3, 5, 7, 10, 14, 30]),
+            form_id=f"Ф-{rng.randint(1, 99):02d}",
+            clause=f"{rng.randint(1, 12)}.{rng.randint(1, 9)}",
+            amount=rng.randint(5, 200) * 100,
+        ))
+    return " ".join(parts)
+
+
+def generate_document(rng: random.Random, doc_id: int, topic_index: int,
+                      sections: int = 8, paragraphs_per_section: int = 3) -> SyntheticDocument:
+    """Генерация одного документа с нумерованными разделами"""
+    topic = TOPICS[topic_index]
+    title = f"{topic['title']} (редакция {doc_id + 1})"
+
+    lines = [title.upper(), ""]
+    for section in range(1, sections + 1):
+        lines.append(f"{section}. {rng.choice(topic['keywords']).capitalize()}")
+        for _ in range(paragraphs_per_section):
+            lines.append(_paragraph(rng, topic, rng.randint(3, 6)))
+        lines.append("")
+
+    return SyntheticDocument(doc_id=doc_id, title=title, text="\n".join(lines), topic=topic_index)
+
+
+def generate_corpus(documents: int = 40, seed: int = 42,
+                    sections: int = 8, paragraphs_per_section: int = 3) -> List[SyntheticDocument]:
+    """
+    Генерация корпуса документов
+
+    Args:
+        documents: Количество документов
+        seed: Зерно генератора случайных чисел
+        sections: Разделов в документе
+        paragraphs_per_section: Абзацев в разделе
+
+    Returns:
+        List[SyntheticDocument]: Документы корпуса
+    """
+    rng = random.Random(seed)
+    return [
+        generate_document(rng, doc_id, doc_id % len(TOPICS), sections, paragraphs_per_section)
+        for doc_id in range(documents)
+    ]
+
+
+def generate_questions(corpus: List[SyntheticDocument], count: int = 100,
+                       seed: int = 42) -> List[LabelledQuestion]:
+    """
+    Генерация вопросов сотрудников с разметкой релевантных документов
+
+    Релевантными считаются все документы корпуса на тему вопроса.
+    """
+    rng = random.Random(seed)
+    by_topic = {}
+    for document in corpus:
+        by_topic.setdefault(document.topic, []).append(document.doc_id)
+
+    topics = sorted(by_topic)
+    questions = []
+    for i in range(count):
+        topic_index = topics[i % len(topics)]
+        question = rng.choice(TOPICS[topic_index]["questions"])
+        questions.append(LabelledQuestion(question=question, relevant_doc_ids=by_topic[topic_index]))
+    return questions
@@ -0,0 +1,189 @@
+"""
+Дашборд админ-панели: запросы на каждое открытие против готовой статистики
+
+На PostgreSQL со схемой сервиса (при необходимости добавляет --query-logs
+записей журнала запросов) замеряет:
+
+- legacy     - прежний обработчик: пять COUNT(*) и две выборки последних записей;
+- aggregated - shared.utils.dashboard_stats.compute_dashboard_stats
+  (один запрос счетчиков с COUNT ... FILTER и две выборки по индексам created_at);
+- cached     - get_dashboard_stats из Redis (--redis-url) или кэша процесса;
+- render     - cached + отрисовка шаблона dashboard.html (нужен jinja2).
+
+Завершается с кодом 1, если p95 отрисовки из кэша больше --budget-ms.
+
+Пример:
+    python -m benchmarks.dashboard_benchmark --database-url postgresql://... \\
+        --redis-url redis://localhost:6379/0 --query-logs 1000000 --runs 50
+"""
+
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+from benchmarks.common import REPO_ROOT, summarize, write_results
+from shared.utils.dashboard_stats import (
+    compute_dashboard_stats,
+    ensure_dashboard_indexes,
+    get_dashboard_stats,
+    invalidate_dashboard_stats,
+)
+
+TEMPLATES_DIR = REPO_ROOT / "services" / "admin-panel" / "templates"
+
+# Пользователь, от имени которого добавляются записи журнала бенчмарка
+BENCHMARK_TELEGRAM_ID = -20490
+
+
+def legacy_stats(db) -> dict:
+    """Статистика так, как ее считал обработчик дашборда раньше"""
+    from shared.models import Admin, Document, User
+    from shared.models.query_log import QueryLog
+
+    return {
+        "total_documents": db.query(Document).count(),
+        "completed_documents": db.query(Document).filter(Document.processing_status == "completed").count(),
+        "failed_documents": db.query(Document).filter(Document.processing_status == "failed").count(),
+        "total_users": db.query(User).count(),
+        "total_admins": db.query(Admin).count(),
+        "recent_documents": db.query(Document).order_by(Document.created_at.desc()).limit(5).all(),
+        "recent_queries": db.query(QueryLog).order_by(QueryLog.created_at.desc()).limit(10).all(),
+    }
+
+
+def seed_query_logs(db, target: int) -> int:
+    """Добавляет записи журнала запросов до target строк; возвращает число добавленных"""
+    from sqlalchemy import func, literal, select, text
+    from shared.models import User
+    from shared.models.query_log import QueryLog
+
+    existing = db.query(func.count(QueryLog.id)).scalar()
+    missing = target - existing
+    if missing <= 0:
+        return 0
+
+    user = db.query(User).filter(User.telegram_id == BENCHMARK_TELEGRAM_ID).first()
+    if user is None:
+        user = User(telegram_id=BENCHMARK_TELEGRAM_ID, username="dashboard-benchmark",
+                    full_name="Dashboard benchmark", is_active=True)
+        db.add(user)
+        db.commit()
+
+    series = func.generate_series(1, missing).table_valued("value").alias("series")
+    db.execute(QueryLog.__table__.insert().from_select(
+        ["user_id", "query_text", "response_text", "chunks_used", "model_used", "response_time", "created_at"],
+        select(
+            literal(user.id),
+            literal("benchmark query ") + series.c.value.cast(QueryLog.query_text.type),
+            literal("benchmark answer"),
+            literal(0),
+            literal("benchmark"),
+            literal(0.0),
+            func.now() - series.c.value * text("interval '1 second'"),
+        ).select_from(series),
+    ))
+    db.commit()
+    return missing
+
+
+def cleanup(db) -> None:
+    """Удаление пользователя бенчмарка и его записей журнала"""
+    from shared.models import User
+    from shared.models.query_log import QueryLog
+
+    user = db.query(User).filter(User.telegram_id == BENCHMARK_TELEGRAM_ID).first()
+    if user is not None:
+        db.query(QueryLog).filter(QueryLog.user_id == user.id).delete(synchronize_session=False)
+        db.delete(user)
+        db.commit()
+
+
+def measure(function, runs: int) -> dict:
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return summarize(durations)
+
+
+def make_renderer():
+    """Отрисовка dashboard.html тем же шаблоном, что в админ-панели (None без jinja2)"""
+    try:
+        from jinja2 import Environment, FileSystemLoader
+    except ImportError:
+        return None
+
+    environment = Environment(loader=FileSystemLoader(str(TEMPLATES_DIR)), autoescape=True)
+    template = environment.get_template("dashboard.html")
+    # Шаблону нужны только url.path и query_params запроса
+    request = SimpleNamespace(url=SimpleNamespace(path="/"), query_params={})
+    admin = SimpleNamespace(username="admin", full_name="Администратор")
+
+    def render(stats):
+        return template.render(request=request, admin=admin, **stats)
+    return render
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Статистика дашборда админ-панели")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--redis-url", default=None, help="Без Redis - кэш процесса")
+    parser.add_argument("--query-logs", type=int, default=0,
+                        help="Дополнить журнал запросов до стольких записей")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--budget-ms", type=float, default=10.0)
+    parser.add_argument("--cleanup", action="store_true", help="Удалить записи бенчмарка после замера")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("нужен --database-url (или DATABASE_URL)")
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    engine = create_engine(args.database_url)
+    db = sessionmaker(bind=engine)()
+    try:
+        added = seed_query_logs(db, args.query_logs)
+        if added:
+            print(f"Добавлено записей журнала: {added}")
+        ensure_dashboard_indexes(engine)
+
+        results = {
+            "legacy": measure(lambda: legacy_stats(db), args.runs),
+            "aggregated": measure(lambda: compute_dashboard_stats(db), args.runs),
+        }
+
+        invalidate_dashboard_stats(args.redis_url)
+        get_dashboard_stats(db, args.redis_url)
+        results["cached"] = measure(lambda: get_dashboard_stats(db, args.redis_url), args.runs)
+
+        render = make_renderer()
+        if render is not None:
+            results["render"] = measure(lambda: render(get_dashboard_stats(db, args.redis_url)), args.runs)
+
+        for name, summary in results.items():
+            print(f"{name:<11} p50={summary['p50'] * 1000:8.2f} мс  p95={summary['p95'] * 1000:8.2f} мс")
+
+        # URL с паролями в результаты не пишем
+        parameters = {key: value for key, value in vars(args).items() if not key.endswith("_url")}
+        path = write_results("dashboard", {"parameters": parameters, "results": results}, args.output)
+        print(f"Результаты: {path}")
+    finally:
+        if args.cleanup:
+            cleanup(db)
+            invalidate_dashboard_stats(args.redis_url)
+        db.close()
+
+    p95_ms = results.get("render", results["cached"])["p95"] * 1000
+    if p95_ms > args.budget_ms:
+        print(f"p95 {p95_ms:.2f} мс больше бюджета {args.budget_ms} мс")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Передача эмбеддингов в pgvector: списки Python против массивов float32
+
+Для батча эмбеддингов замеряет подготовку параметров запроса:
+
+- list  - как раньше: .tolist() каждого вектора и pgvector.utils.to_db;
+- array - массивы float32 и shared.utils.vector_types.vector_to_db;
+
+а также объем текста, уходящего в PostgreSQL, и проверяет, что векторы
+восстанавливаются без потерь.
+
+Пример:
+    python -m benchmarks.embedding_io_benchmark --vectors 2000 --dimensions 1024
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+from pgvector.utils import from_db, to_db
+
+from benchmarks.common import write_results
+from shared.utils.vector_types import vector_to_db
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сериализация эмбеддингов для pgvector")
+    parser.add_argument("--vectors", type=int, default=2000)
+    parser.add_argument("--dimensions", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    matrix = rng.standard_normal((args.vectors, args.dimensions)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    as_lists, list_seconds = timed(lambda: [to_db(vector.tolist()) for vector in matrix])
+    as_arrays, array_seconds = timed(lambda: [vector_to_db(vector) for vector in matrix])
+
+    lossless = all(np.array_equal(from_db(value), vector) for value, vector in zip(as_arrays, matrix))
+    results = {
+        "list_seconds": round(list_seconds, 4),
+        "array_seconds": round(array_seconds, 4),
+        "speedup": round(list_seconds / array_seconds, 2) if array_seconds else None,
+        "list_bytes": sum(len(value) for value in as_lists),
+        "array_bytes": sum(len(value) for value in as_arrays),
+        "lossless": lossless,
+    }
+    print(f"list  {list_seconds:.4f} с, {results['list_bytes'] / 1024 / 1024:.1f} МБ")
+    print(f"array {array_seconds:.4f} с, {results['array_bytes'] / 1024 / 1024:.1f} МБ "
+          f"(x{results['speedup']}), без потерь: {lossless}")
+
+    path = write_results("embedding-io", {"parameters": vars(args), "results": results}, args.output)
+    print(f"Результаты: {path}")
+
+    if not lossless:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Бенчмарк извлечения текста из больших PDF и DOCX
+
+Сравнивает режимы:
+- legacy - прежняя реализация (text += ... в цикле);
+- join   - extract_text_from_* (генератор страниц + один "".join);
+- stream - DocumentProcessor.iter_text без сборки всего текста.
+
+Для PDF режим stream дополнительно прогоняется с пулом процессов
+(DocumentProcessor(pdf_workers=N)) для каждого N из --workers; пропускная
+способность выводится в страницах в секунду.
+
+Каждый замер выполняется в отдельном процессе, поэтому пиковый RSS
+(ru_maxrss) не смешивается между режимами.
+
+Пример:
+    python -m benchmarks.extraction_benchmark --pages 600 --docx-paragraphs 20000
+    python -m benchmarks.extraction_benchmark --pdf /path/to/handbook.pdf
+    python -m benchmarks.extraction_benchmark --modes stream --workers 1,2,4,8
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import REPO_ROOT, write_results
+
+MODES = ("legacy", "join", "stream")
+
+
+def _legacy_pdf(path: str) -> str:
+    import PyPDF2
+
+    text = ""
+    with open(path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page_num in range(len(pdf_reader.pages)):
+            text += pdf_reader.pages[page_num].extract_text() + "\n"
+    return text
+
+
+def _legacy_docx(path: str) -> str:
+    from docx import Document as DocxDocument
+
+    text = ""
+    for paragraph in DocxDocument(path).paragraphs:
+        text += paragraph.text + "\n"
+    return text
+
+
+def measure(file_format: str, mode: str, path: str, **options) -> dict:
+    """Один замер в текущем процессе (вызывается в дочернем процессе)"""
+    from shared.utils.document_processor import DocumentProcessor
+    from shared.utils.text_processing import extract_text_from_docx, extract_text_from_pdf
+
+    processor = DocumentProcessor(**options)
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+
+    if mode == "legacy":
+        chars = len(_legacy_pdf(path) if file_format == "pdf" else _legacy_docx(path))
+    elif mode == "join":
+        chars = len(extract_text_from_pdf(path) if file_format == "pdf" else extract_text_from_docx(path))
+    else:
+        chars = sum(len(segment) for segment in processor.iter_text(path))
+
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "format": file_format,
+        "mode": mode,
+        "seconds": round(elapsed, 4),
+        "chars": chars,
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+        "peak_rss_growth_mb": round((peak_kb - baseline_kb) / 1024, 1),
+    }
+
+
+def count_pdf_pages(path: Path) -> int:
+    import PyPDF2
+
+    with open(path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def run_isolated(file_format: str, mode: str, path: Path, options: dict) -> dict:
+    command = [sys.executable, "-m", "benchmarks.extraction_benchmark", "--measure",
+               file_format, mode, str(path), "--options", json.dumps(options)]
+    output = subprocess.check_output(command, cwd=REPO_ROOT, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк извлечения текста")
+    parser.add_argument("--pages", type=int, default=600, help="Страниц в сгенерированном PDF")
+    parser.add_argument("--docx-paragraphs", type=int, default=20000)
+    parser.add_argument("--pdf", default=None, help="Свой PDF вместо сгенерированного")
+    parser.add_argument("--docx", default=None, help="Свой DOCX вместо сгенерированного")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--workers", default="1",
+                        help="Число процессов для PDF в режиме stream, через запятую (например 1,2,4)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--measure", nargs=3, metavar=("FORMAT", "MODE", "PATH"), help=argparse.SUPPRESS)
+    parser.add_argument("--options", default="{}", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(*args.measure, **json.loads(args.options))))
+        return
+
+    from benchmarks.pdfgen import generate_docx, generate_pdf
+
+    modes = [mode for mode in args.modes.split(",") if mode]
+    workers = [int(value) for value in args.workers.split(",") if value.strip()]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        files = {
+            "pdf": Path(args.pdf) if args.pdf else generate_pdf(Path(tmp) / "large.pdf", args.pages),
+            "docx": Path(args.docx) if args.docx else generate_docx(Path(tmp) / "large.docx",
+                                                                    args.docx_paragraphs),
+        }
+        pdf_pages = count_pdf_pages(files["pdf"])
+        runs = []
+        for file_format in files:
+            for mode in modes:
+                if file_format == "pdf" and mode == "stream":
+                    # parallel_min_pages=0: параллельный режим даже для небольших файлов
+                    runs.extend((file_format, mode, {"pdf_workers": n, "parallel_min_pages": 0})
+                                for n in workers)
+                else:
+                    runs.append((file_format, mode, {}))
+
+        for file_format, mode, options in runs:
+            path = files[file_format]
+            label = mode + (f"-w{options['pdf_workers']}" if options else "")
+            for _ in range(args.repeat):
+                result = run_isolated(file_format, mode, path, options)
+                result["options"] = options
+                result["file_size_mb"] = round(path.stat().st_size / 1024 / 1024, 2)
+                throughput = ""
+                if file_format == "pdf":
+                    result["pages"] = pdf_pages
+                    result["pages_per_second"] = round(pdf_pages / result["seconds"], 1) if result["seconds"] else None
+                    throughput = f"{result['pages_per_second']} стр/с  "
+                results.append(result)
+                print(f"{file_format:5s} {label:10s} {result['seconds']:8.3f} с  {throughput}"
+                      f"RSS пик {result['peak_rss_mb']} МБ (+{result['peak_rss_growth_mb']} МБ)")
+
+    path = write_results("extraction", {"parameters": vars(args), "results": results}, args.output)
+    print(f"Результаты: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Время импорта точек входа сервисов (python -X importtime)
+
+Для каждой точки входа в отдельном процессе выполняется импорт модуля, как
+при старте сервиса, и по выводу -X importtime считается:
+
+- общее время импорта (минимум из --repeat запусков);
+- самые долгие пакеты верхнего уровня (суммарное время с зависимостями);
+- какие тяжелые пакеты (torch, sentence-transformers, PyPDF2, ...) загружены.
+
+Модель эмбеддингов загружается при создании сервиса, а не при импорте, поэтому
+torch, transformers и onnxruntime на этапе импорта - ошибка: скрипт
+завершается с кодом 1. Точки входа, для которых не установлены зависимости
+(fastapi, celery, aiogram), отмечаются как пропущенные.
+
+Пример:
+    python -m benchmarks.import_time --repeat 5 --top 10
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional, Set, Tuple
+
+from benchmarks.common import SERVICES_DIR, write_results
+
+# Точка входа: (каталог запуска, дополнительные пути PYTHONPATH, импорт)
+ENTRY_POINTS = {
+    "shared-auth": (SERVICES_DIR, [SERVICES_DIR], "import shared.utils.auth"),
+    "admin-panel": (SERVICES_DIR / "admin-panel", [SERVICES_DIR, SERVICES_DIR / "admin-panel"], "import main"),
+    "worker": (SERVICES_DIR / "admin-panel", [SERVICES_DIR, SERVICES_DIR / "admin-panel"], "import tasks"),
+    "telegram-bot": (SERVICES_DIR / "telegram-bot", [SERVICES_DIR / "shared", SERVICES_DIR / "telegram-bot"],
+                     "import bot.handlers"),
+}
+
+# Пакеты, заметно замедляющие старт
+HEAVY_MODULES = ["torch", "sentence_transformers", "transformers", "onnxruntime", "PyPDF2", "docx"]
+
+# Загружаются только вместе с моделью эмбеддингов
+FORBIDDEN_MODULES = {"torch", "sentence_transformers", "transformers", "onnxruntime"}
+
+
+def parse_importtime(stderr: str) -> Tuple[Dict[str, int], Set[str]]:
+    """
+    Разбор вывода -X importtime
+
+    Returns:
+        Tuple: Суммарное время импорта пакетов верхнего уровня (мкс)
+            и имена всех загруженных модулей
+    """
+    cumulative, loaded = {}, set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        loaded.add(name.strip())
+        # Вложенные импорты учтены в суммарном времени родителя
+        if not name.startswith("  "):
+            cumulative[name.strip()] = int(cumulative_us)
+    return cumulative, loaded
+
+
+def run_entry(name: str, repeat: int) -> Dict:
+    """Импорт точки входа в отдельных процессах"""
+    cwd, paths, statement = ENTRY_POINTS[name]
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(path) for path in paths] + [env.get("PYTHONPATH", "")]).rstrip(os.pathsep)
+
+    best: Optional[Dict[str, int]] = None
+    loaded: Set[str] = set()
+    for _ in range(repeat):
+        process = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                                 cwd=cwd, env=env, capture_output=True, text=True)
+        if process.returncode != 0:
+            errors = [line for line in process.stderr.splitlines() if line and not line.startswith("import time:")]
+            return {"status": "skipped", "error": errors[-1] if errors else f"exit code {process.returncode}"}
+        modules, loaded = parse_importtime(process.stderr)
+        if best is None or sum(modules.values()) < sum(best.values()):
+            best = modules
+
+    loaded = {module.split(".")[0] for module in loaded}
+    return {
+        "status": "ok",
+        "total_ms": round(sum(best.values()) / 1000, 1),
+        "modules": best,
+        "heavy": [module for module in HEAVY_MODULES if module in loaded],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время импорта точек входа сервисов")
+    parser.add_argument("--entry", action="append", choices=sorted(ENTRY_POINTS),
+                        help="Точка входа (по умолчанию все, можно повторять)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    results = {}
+    failed: List[str] = []
+    for name in args.entry or list(ENTRY_POINTS):
+        result = run_entry(name, args.repeat)
+        if result["status"] != "ok":
+            print(f"{name:<13} пропущено: {result['error']}")
+            results[name] = result
+            continue
+
+        top = sorted(result["modules"].items(), key=lambda item: item[1], reverse=True)[:args.top]
+        print(f"{name:<13} {result['total_ms']:8.1f} мс, тяжелые пакеты: {', '.join(result['heavy']) or 'нет'}")
+        for module, microseconds in top:
+            print(f"    {microseconds / 1000:8.1f} мс  {module}")
+
+        forbidden = FORBIDDEN_MODULES.intersection(result["heavy"])
+        if forbidden:
+            failed.append(f"{name}: {', '.join(sorted(forbidden))}")
+        result["modules"] = dict(top)
+        results[name] = result
+
+    path = write_results("import-time", {
+        "parameters": {"entries": args.entry or list(ENTRY_POINTS), "repeat": args.repeat},
+        "python": sys.version.split()[0],
+        "results": results,
+    }, args.output)
+    print(f"Результаты: {path}")
+
+    if failed:
+        print(f"Модель эмбеддингов загружается при импорте: {'; '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Сравнение бэкендов эмбеддингов: PyTorch и ONNX (int8)
+
+На синтетическом корпусе считает для обоих бэкендов:
+
+- задержку эмбеддинга одного вопроса (как в боте) и пропускную способность
+  батчей чанков (как при загрузке документов);
+- косинусное сходство эмбеддингов ONNX и PyTorch для каждого текста;
+- совпадение поиска: доля общих чанков в top-k и совпадение top-1 для вопросов.
+
+Завершается с кодом 1, если среднее сходство ниже --min-cosine.
+Нужны sentence-transformers и onnxruntime; ONNX модель экспортируется
+при первом запуске (для экспорта нужен пакет onnx).
+
+Пример:
+    python -m benchmarks.onnx_embeddings_benchmark --onnx-path /tmp/sbert-onnx --threads 1
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.common import percentile, summarize, write_results
+from benchmarks.corpus import generate_corpus, generate_questions
+from shared.utils.document_processor import DocumentProcessor
+from shared.utils.embeddings import (
+    EMBEDDINGS_MODEL_NAME,
+    ONNX_CONFIG_FILE,
+    OnnxSentenceEncoder,
+    export_onnx_model,
+    normalize_embeddings,
+    similarity_matrix,
+)
+
+
+def measure(model, questions, chunks, batch_size: int) -> dict:
+    latencies = []
+    question_embeddings = []
+    for question in questions:
+        start = time.perf_counter()
+        question_embeddings.append(model.encode(question))
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    chunk_embeddings = model.encode(chunks, batch_size=batch_size)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        "query_latency": summarize(latencies),
+        "batch_seconds": round(batch_seconds, 4),
+        "chunks_per_second": round(len(chunks) / batch_seconds, 2) if batch_seconds else None,
+        "questions": np.vstack(question_embeddings),
+        "chunks": np.asarray(chunk_embeddings),
+    }
+
+
+def agreement(reference: dict, candidate: dict, top_k: int) -> dict:
+    """Сходство эмбеддингов и совпадение результатов поиска"""
+    cosines = []
+    for key in ("questions", "chunks"):
+        cosines.extend(np.sum(normalize_embeddings(reference[key]) * normalize_embeddings(candidate[key]),
+                              axis=1).tolist())
+
+    def ranking(result: dict) -> np.ndarray:
+        return similarity_matrix(result["questions"], result["chunks"], top_k=top_k)[0]
+
+    expected, actual = ranking(reference), ranking(candidate)
+    overlap = [len(set(a) & set(b)) / top_k for a, b in zip(expected, actual)]
+    return {
+        "cosine": {
+            "mean": round(float(np.mean(cosines)), 6),
+            "p1": round(percentile(cosines, 1), 6),
+            "min": round(min(cosines), 6),
+        },
+        f"overlap_at_{top_k}": round(float(np.mean(overlap)), 4),
+        "top1_agreement": round(float(np.mean(expected[:, 0] == actual[:, 0])), 4),
+    }
+
+
+def strip_matrices(result: dict) -> dict:
+    return {key: value for key, value in result.items() if key not in ("questions", "chunks")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение бэкендов эмбеддингов PyTorch и ONNX")
+    parser.add_argument("--model", default=EMBEDDINGS_MODEL_NAME)
+    parser.add_argument("--onnx-path", default="/tmp/onnx-embeddings", help="Каталог ONNX модели")
+    parser.add_argument("--no-quantize", action="store_true", help="Экспортировать без int8 квантизации")
+    parser.add_argument("--threads", type=int, default=1, help="Потоков onnxruntime и torch (лимит контейнера)")
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    onnx_path = Path(args.onnx_path)
+    if not (onnx_path / ONNX_CONFIG_FILE).exists():
+        print(f"Экспорт {args.model} в {onnx_path}...")
+        export_onnx_model(args.model, str(onnx_path), quantize=not args.no_quantize)
+
+    corpus = generate_corpus(args.documents, seed=args.seed)
+    processor = DocumentProcessor()
+    chunks = [chunk for document in corpus for chunk in processor.split_into_chunks(document.text)]
+    questions = [question.question for question in generate_questions(corpus, args.questions, seed=args.seed)]
+    print(f"Чанков: {len(chunks)}, вопросов: {len(questions)}")
+
+    torch_model = SentenceTransformer(args.model, device="cpu")
+    onnx_model = OnnxSentenceEncoder(str(onnx_path), threads=args.threads)
+
+    # Прогрев: первые вызовы включают инициализацию
+    torch_model.encode(questions[:2])
+    onnx_model.encode(questions[:2])
+
+    results = {
+        "torch": measure(torch_model, questions, chunks, args.batch_size),
+        "onnx": measure(onnx_model, questions, chunks, args.batch_size),
+    }
+    check = agreement(results["torch"], results["onnx"], args.top_k)
+
+    for name, result in results.items():
+        print(f"{name:6s} вопрос p50={result['query_latency']['p50']:.4f} с "
+              f"p95={result['query_latency']['p95']:.4f} с  "
+              f"батчи {result['chunks_per_second']} чанков/с")
+    print(f"Косинусное сходство ONNX/PyTorch: {check['cosine']}  "
+          f"top-{args.top_k}: {check[f'overlap_at_{args.top_k}']}  top-1: {check['top1_agreement']}")
+
+    path = write_results("onnx-embeddings", {
+        "parameters": vars(args),
+        "quantized": onnx_model.model_key.endswith("int8"),
+        "results": {name: strip_matrices(result) for name, result in results.items()},
+        "agreement": check,
+    }, args.output)
+    print(f"Результаты: {path}")
+
+    if check["cosine"]["mean"] < args.min_cosine:
+        print(f"Среднее сходство ниже {args.min_cosine}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Потери качества и выигрыш в скорости поиска при сокращении размерности PCA
+
+PCA подбирается по эмбеддингам чанков корпуса (как fit-pca в
+shared.utils.vector_storage) и применяется к чанкам и к вопросам. Для полной
+размерности и для каждой из --dimensions через SimpleRAG.search_relevant_chunks
+(хранилище в памяти) считает:
+
+- recall@k и MRR по размеченным вопросам;
+- совпадение top-k с поиском по полным векторам;
+- латентность поиска (embed + search) p50/p95 и объем векторов.
+
+Пример:
+    python -m benchmarks.pca_eval --model ai-forever/sbert_large_nlu_ru \\
+        --dimensions 128,256,384 --limit 5 --save-pca /tmp/pca-256.npz
+"""
+
+import argparse
+
+import numpy as np
+
+from benchmarks.backends import InMemoryBackend
+from benchmarks.common import load_embeddings_model, write_results
+from benchmarks.corpus import generate_corpus, generate_questions
+from benchmarks.retrieval_eval import evaluate, parse_list
+from shared.utils.embeddings import PcaReducer
+
+
+class ReducedModel:
+    """Модель, эмбеддинги которой проходят через PCA"""
+
+    def __init__(self, model, reducer: PcaReducer):
+        self.model = model
+        self.reducer = reducer
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.reducer.dimensions
+
+    def encode(self, sentences, **kwargs):
+        return self.reducer.transform(self.model.encode(sentences, **kwargs))
+
+
+def top_k_overlap(rag, reference_rag, questions, limit: int) -> float:
+    """Средняя доля общих чанков в выдаче с выдачей по полным векторам"""
+    overlaps = []
+    for item in questions:
+        expected = {chunk.id for chunk in reference_rag.search_relevant_chunks(item.question, limit, -1.0)}
+        actual = {chunk.id for chunk in rag.search_relevant_chunks(item.question, limit, -1.0)}
+        overlaps.append(len(expected & actual) / len(expected) if expected else 1.0)
+    return round(float(np.mean(overlaps)), 4) if overlaps else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Поиск по эмбеддингам, сокращенным PCA")
+    parser.add_argument("--model", default="hashing")
+    parser.add_argument("--documents", type=int, default=40)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--dimensions", default="128,256,384")
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="По умолчанию 0.5 (для заглушки hashing - 0.0)")
+    parser.add_argument("--save-pca", default=None,
+                        help="Сохранить PCA первой размерности из --dimensions (для EMBEDDINGS_PCA_PATH)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    if args.threshold is None:
+        args.threshold = 0.0 if args.model == "hashing" else 0.5
+
+    model = load_embeddings_model(args.model)
+    documents = generate_corpus(args.documents, seed=args.seed)
+    questions = generate_questions(documents, args.questions, seed=args.seed)
+
+    full = InMemoryBackend()
+    full.ingest(documents, model)
+    full_rag = full.make_rag(model, args.limit, args.threshold)
+    corpus_embeddings = np.vstack(full.store._vectors)
+    print(f"Чанков: {full.chunks_count()}, исходная размерность: {corpus_embeddings.shape[1]}")
+
+    result = evaluate(full_rag, questions, args.limit, args.threshold)
+    result.update({"dimensions": int(corpus_embeddings.shape[1]), "overlap": 1.0,
+                   "vector_bytes": int(corpus_embeddings.shape[1] * 4)})
+    results = [result]
+
+    for dimensions in parse_list(args.dimensions, int):
+        reducer = PcaReducer.fit(corpus_embeddings, dimensions,
+                                 model_key=getattr(model, "model_key", args.model))
+        if args.save_pca and dimensions == parse_list(args.dimensions, int)[0]:
+            reducer.save(args.save_pca)
+            print(f"PCA {dimensions} сохранен: {args.save_pca}")
+
+        reduced_model = ReducedModel(model, reducer)
+        backend = InMemoryBackend()
+        backend.ingest(documents, reduced_model)
+        rag = backend.make_rag(reduced_model, args.limit, args.threshold)
+
+        result = evaluate(rag, questions, args.limit, args.threshold)
+        result.update({
+            "dimensions": dimensions,
+            "explained_variance": round(float(np.sum(reducer.explained_variance_ratio)), 4),
+            "overlap": top_k_overlap(rag, full_rag, questions, args.limit),
+            "vector_bytes": dimensions * 4,
+        })
+        results.append(result)
+
+    for r in results:
+        variance = f"{r['explained_variance']:.3f}" if "explained_variance" in r else "  -  "
+        print(f"dims={r['dimensions']:<5d} variance={variance} recall@{args.limit}={r['recall_at_k']:.3f} "
+              f"mrr={r['mrr']:.3f} overlap={r['overlap']:.3f} "
+              f"p50={r['latency']['p50']:.5f} с  p95={r['latency']['p95']:.5f} с  "
+              f"{r['vector_bytes']} байт/вектор")
+
+    path = write_results("pca", {
+        "parameters": vars(args),
+        "chunks": full.chunks_count(),
+        "results": results,
+    }, args.output)
+    print(f"Результаты: {path}")
+
+
+if __name__ == "__main__":
+    main()
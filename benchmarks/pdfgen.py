@@ -0,0 +1,145 @@
+"""
+Генерация больших тестовых PDF/DOCX для бенчмарков извлечения текста
+
+PDF пишется вручную (стандартный шрифт Helvetica без встраивания), поэтому
+кириллица транслитерируется - на скорость разбора PyPDF2 это не влияет.
+"""
+
+from pathlib import Path
+from typing import Iterable, List
+
+from benchmarks.corpus import generate_corpus
+
+_TRANSLIT = dict(zip(
+    "абвгдеёжзийклмнопрстуфхцчшщъыьэюя",
+    ["a", "b", "v", "g", "d", "e", "e", "zh", "z", "i", "y", "k", "l", "m", "n", "o", "p",
+     "r", "s", "t", "u", "f", "kh", "ts", "ch", "sh", "shch", "", "y", "", "e", "yu", "ya"],
+))
+
+
+def transliterate(text: str) -> str:
+    result = []
+    for char in text:
+        lower = char.lower()
+        if lower in _TRANSLIT:
+            latin = _TRANSLIT[lower]
+            result.append(latin.capitalize() if char != lower else latin)
+        elif ord(char) < 128:
+            result.append(char)
+        else:
+            result.append(" ")
+    return "".join(result)
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _wrap(text: str, width: int) -> List[str]:
+    lines, current = [], ""
+    for word in text.split():
+        if current and len(current) + 1 + len(word) > width:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        lines.append(current)
+    return lines
+
+
+def write_pdf(path: Path, pages: Iterable[List[str]]) -> Path:
+    """Запись PDF, где каждая страница - список строк"""
+    objects: List[bytes] = []
+    page_ids = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog_id = add(b"")  # заполняется в конце
+    pages_id = add(b"")
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    for lines in pages:
+        content = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        for line in lines:
+            content.append(f"({_escape(line)}) Tj T*")
+        content.append("ET")
+        stream = "\n".join(content).encode("latin-1")
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font_id, content_id)
+        ))
+
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+    objects[catalog_id - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog_id, xref_offset)
+
+    path = Path(path)
+    path.write_bytes(bytes(output))
+    return path
+
+
+def generate_pdf(path: Path, pages: int, lines_per_page: int = 70, seed: int = 42) -> Path:
+    """PDF из текста синтетического корпуса заданного объема"""
+    corpus = generate_corpus(documents=16, seed=seed)
+    lines = _wrap(transliterate(" ".join(doc.text for doc in corpus)), width=110)
+
+    def page_lines():
+        position = 0
+        for _ in range(pages):
+            chunk = [lines[(position + i) % len(lines)] for i in range(lines_per_page)]
+            position += lines_per_page
+            yield chunk
+
+    return write_pdf(path, page_lines())
+
+
+def generate_docx(path: Path, paragraphs: int, seed: int = 42) -> Path:
+    """DOCX из абзацев синтетического корпуса"""
+    from docx import Document
+
+    corpus = generate_corpus(documents=16, seed=seed)
+    source = [line for doc in corpus for line in doc.text.split("\n") if line.strip()]
+    document = Document()
+    for i in range(paragraphs):
+        document.add_paragraph(source[i % len(source)])
+    document.save(str(path))
+    return Path(path)
+
+
+def generate_structured_docx(path: Path, documents: int = 8, seed: int = 42) -> Path:
+    """
+    DOCX со структурой: заголовки разделов стилями Heading, пункты списком,
+    абзацы обычным стилем (документы синтетического корпуса подряд)
+    """
+    from docx import Document
+
+    document = Document()
+    for source in generate_corpus(documents=documents, seed=seed):
+        document.add_heading(source.title, level=1)
+        for line in source.text.split("\n")[2:]:
+            if not line.strip():
+                continue
+            if line[0].isdigit():
+                document.add_heading(line, level=2)
+            elif len(line) < 400:
+                document.add_paragraph(line, style="List Number")
+            else:
+                document.add_paragraph(line)
+    document.save(str(path))
+    return Path(path)
@@ -0,0 +1,229 @@
+"""
+Оценка качества и скорости поиска для разных настроек
+
+Для каждой стратегии чанкования (chunk_text / DocumentProcessor.split_into_chunks
+с разными размерами и перекрытием, tokens - StructuredChunker по токенам модели)
+и каждой конфигурации поиска
+(limit, similarity_threshold в SimpleRAG.search_relevant_chunks) считает:
+
+- recall@k - доля вопросов, для которых среди найденных чанков есть чанк
+  из релевантного документа;
+- MRR - средний обратный ранг первого релевантного чанка;
+- латентность поиска (embed + search), p50/p95;
+- количество чанков в индексе.
+
+В конце выбирается самая быстрая конфигурация, у которой recall@k не ниже
+--min-recall.
+
+Размеченный набор по умолчанию строится из синтетического корпуса; свой набор
+передается через --dataset (JSON):
+    {"documents": [{"id": 1, "title": "...", "text": "..."}],
+     "questions": [{"question": "...", "relevant_doc_ids": [1]}]}
+
+С --backend postgres оценивается только сетка (limit, threshold) по текущему
+содержимому базы, а relevant_doc_ids должны ссылаться на documents.id.
+
+Пример:
+    python -m benchmarks.retrieval_eval --model ai-forever/sbert_large_nlu_ru \\
+        --chunk-sizes 500,800,1000 --overlaps 100,200 --limits 3,5,10 \\
+        --thresholds 0.5,0.6,0.7
+"""
+
+import argparse
+import json
+import os
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks.common import load_embeddings_model, summarize, write_results
+from benchmarks.corpus import (
+    LabelledQuestion,
+    SyntheticDocument,
+    generate_corpus,
+    generate_questions,
+)
+from shared.utils.chunking import StructuredChunker, TokenCounter
+from shared.utils.document_processor import DocumentProcessor
+from shared.utils.metrics import StageTimer
+from shared.utils.text_processing import chunk_text
+
+
+@dataclass
+class ChunkingStrategy:
+    name: str
+    chunk_size: int
+    overlap: int
+
+    @property
+    def label(self) -> str:
+        if self.name == "tokens":
+            return "tokens(max=model)"
+        return f"{self.name}(size={self.chunk_size}, overlap={self.overlap})"
+
+    def chunker(self, model=None) -> Callable[[str], List[str]]:
+        if self.name == "tokens":
+            return StructuredChunker(TokenCounter.from_model(model)).split_text
+        if self.name == "chunk_text":
+            return lambda text: chunk_text(text, chunk_size=self.chunk_size, overlap=self.overlap)
+        processor = DocumentProcessor()
+        return lambda text: processor.split_into_chunks(text, chunk_size=self.chunk_size,
+                                                        overlap=self.overlap)
+
+
+def load_dataset(path: str) -> Tuple[List[SyntheticDocument], List[LabelledQuestion]]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    documents = [
+        SyntheticDocument(doc_id=item["id"], title=item.get("title", str(item["id"])),
+                          text=item.get("text", ""), topic=-1)
+        for item in data.get("documents", [])
+    ]
+    questions = [
+        LabelledQuestion(question=item["question"], relevant_doc_ids=list(item["relevant_doc_ids"]))
+        for item in data["questions"]
+    ]
+    return documents, questions
+
+
+def evaluate(rag, questions: List[LabelledQuestion], limit: int, threshold: float) -> Dict[str, object]:
+    """Метрики одной конфигурации поиска"""
+    hits = 0
+    reciprocal_ranks = []
+    latencies = []
+    returned = []
+
+    for item in questions:
+        timer = StageTimer()
+        chunks = rag.search_relevant_chunks(item.question, limit=limit,
+                                            similarity_threshold=threshold, timer=timer)
+        latencies.append(timer.timings.get("embed", 0.0) + timer.timings.get("search", 0.0))
+        returned.append(len(chunks))
+
+        relevant = set(item.relevant_doc_ids)
+        rank = next((position for position, chunk in enumerate(chunks, 1)
+                     if chunk.document_id in relevant), None)
+        if rank is not None:
+            hits += 1
+            reciprocal_ranks.append(1.0 / rank)
+        else:
+            reciprocal_ranks.append(0.0)
+
+    total = len(questions) or 1
+    return {
+        "limit": limit,
+        "threshold": threshold,
+        "recall_at_k": round(hits / total, 4),
+        "mrr": round(sum(reciprocal_ranks) / total, 4),
+        "avg_chunks_returned": round(sum(returned) / total, 2),
+        "latency": summarize(latencies),
+    }
+
+
+def pick_fastest(configurations: List[Dict[str, object]], min_recall: float) -> Optional[Dict[str, object]]:
+    """Самая быстрая (по p50) конфигурация, удовлетворяющая порогу качества"""
+    passing = [c for c in configurations if c["recall_at_k"] >= min_recall]
+    if not passing:
+        return None
+    return min(passing, key=lambda c: (c["latency"]["p50"], c.get("index_chunks", 0), -c["mrr"]))
+
+
+def parse_list(value: str, cast):
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Оценка качества и скорости поиска")
+    parser.add_argument("--backend", choices=["memory", "postgres"], default="memory")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--dataset", default=None, help="JSON с документами и размеченными вопросами")
+    parser.add_argument("--model", default="hashing")
+    parser.add_argument("--documents", type=int, default=40)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--chunkers", default="split_into_chunks,chunk_text,tokens")
+    parser.add_argument("--chunk-sizes", default="500,800,1000")
+    parser.add_argument("--overlaps", default="100,200")
+    parser.add_argument("--limits", default="3,5,10")
+    parser.add_argument("--thresholds", default=None,
+                        help="По умолчанию 0.5,0.6,0.7 (для заглушки hashing - 0.0,0.05,0.1)")
+    parser.add_argument("--min-recall", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    if args.thresholds is None:
+        args.thresholds = "0.0,0.05,0.1" if args.model == "hashing" else "0.5,0.6,0.7"
+    limits = parse_list(args.limits, int)
+    thresholds = parse_list(args.thresholds, float)
+
+    if args.dataset:
+        documents, questions = load_dataset(args.dataset)
+    else:
+        documents = generate_corpus(args.documents, seed=args.seed)
+        questions = generate_questions(documents, args.questions, seed=args.seed)
+
+    model = load_embeddings_model(args.model)
+    configurations = []
+
+    if args.backend == "postgres":
+        from benchmarks.backends import PostgresBackend
+
+        backend = PostgresBackend(args.database_url or os.getenv("DATABASE_URL"))
+        rag = backend.make_rag(model, max(limits), min(thresholds))
+        try:
+            for limit in limits:
+                for threshold in thresholds:
+                    result = evaluate(rag, questions, limit, threshold)
+                    result["chunking"] = "database"
+                    configurations.append(result)
+        finally:
+            rag.db.close()
+            backend.engine.dispose()
+    else:
+        from benchmarks.backends import InMemoryBackend
+
+        chunkers = parse_list(args.chunkers, str)
+        strategies = [
+            ChunkingStrategy(name, size, overlap)
+            for name in chunkers if name != "tokens"
+            for size in parse_list(args.chunk_sizes, int)
+            for overlap in parse_list(args.overlaps, int)
+            if overlap < size
+        ]
+        # Размер чанков по токенам задается моделью, сетка размеров к нему не применяется
+        if "tokens" in chunkers:
+            strategies.append(ChunkingStrategy("tokens", 0, 0))
+        for strategy in strategies:
+            backend = InMemoryBackend()
+            ingestion = backend.ingest(documents, model, chunker=strategy.chunker(model))
+            rag = backend.make_rag(model, max(limits), min(thresholds))
+            for limit in limits:
+                for threshold in thresholds:
+                    result = evaluate(rag, questions, limit, threshold)
+                    result["chunking"] = strategy.label
+                    result["index_chunks"] = backend.chunks_count()
+                    result["ingestion_seconds"] = {k: round(v, 4) for k, v in ingestion.items()}
+                    configurations.append(result)
+
+    for c in configurations:
+        print(f"{c['chunking']:45s} k={c['limit']:<3d} thr={c['threshold']:<5} "
+              f"recall@k={c['recall_at_k']:.3f} mrr={c['mrr']:.3f} "
+              f"p50={c['latency']['p50']:.4f}s chunks={c.get('index_chunks', '-')}")
+
+    best = pick_fastest(configurations, args.min_recall)
+    if best:
+        print(f"\nЛучшая конфигурация (recall@k >= {args.min_recall}): {best['chunking']}, "
+              f"limit={best['limit']}, threshold={best['threshold']}")
+    else:
+        print(f"\nНи одна конфигурация не достигла recall@k >= {args.min_recall}")
+
+    path = write_results("retrieval", {
+        "parameters": vars(args),
+        "questions": len(questions),
+        "configurations": configurations,
+        "best": best,
+    }, args.output)
+    print(f"Результаты: {path}")
+
+
+if __name__ == "__main__":
+    main()
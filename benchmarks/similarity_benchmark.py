@@ -0,0 +1,98 @@
+"""
+Сходство эмбеддингов: попарный calculate_similarity против similarity_matrix
+
+Для батча запросов и матрицы кандидатов (эмбеддинги чанков синтетического
+корпуса) замеряет время:
+
+- pairwise - calculate_similarity для каждой пары (списки Python, как раньше);
+- matrix   - similarity_matrix по ненормированным векторам;
+- matrix_normalized - similarity_matrix по заранее нормированным векторам
+  (эмбеддинги сервиса с EMBEDDINGS_NORMALIZE=1);
+
+и проверяет, что top-k кандидатов у всех вариантов совпадает.
+
+Пример:
+    python -m benchmarks.similarity_benchmark --queries 50 --documents 40 --top-k 10
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.common import load_embeddings_model, write_results
+from benchmarks.corpus import generate_corpus, generate_questions
+from shared.utils.document_processor import DocumentProcessor
+from shared.utils.embeddings import SimpleEmbeddings, normalize_embeddings, similarity_matrix
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Попарное и матричное сходство эмбеддингов")
+    parser.add_argument("--model", default="hashing")
+    parser.add_argument("--documents", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    model = load_embeddings_model(args.model)
+    corpus = generate_corpus(args.documents, seed=args.seed)
+    processor = DocumentProcessor()
+    chunks = [chunk for document in corpus for chunk in processor.split_into_chunks(document.text)]
+    questions = [item.question for item in generate_questions(corpus, args.queries, seed=args.seed)]
+
+    candidates = np.asarray(model.encode(chunks), dtype=np.float32)
+    queries = np.asarray(model.encode(questions), dtype=np.float32)
+    print(f"Запросов: {len(queries)}, кандидатов: {len(candidates)}, размерность: {candidates.shape[1]}")
+
+    # Метод экземпляра не использует модель - экземпляр без загрузки модели
+    embeddings = SimpleEmbeddings.__new__(SimpleEmbeddings)
+    query_lists, candidate_lists = queries.tolist(), candidates.tolist()
+    pairwise, pairwise_seconds = timed(lambda: np.array([
+        [embeddings.calculate_similarity(query, candidate) for candidate in candidate_lists]
+        for query in query_lists
+    ]))
+    (matrix_top, _), matrix_seconds = timed(lambda: similarity_matrix(queries, candidates, top_k=args.top_k))
+
+    normalized_queries, normalized_candidates = normalize_embeddings(queries), normalize_embeddings(candidates)
+    (normalized_top, _), normalized_seconds = timed(lambda: similarity_matrix(
+        normalized_queries, normalized_candidates, top_k=args.top_k, normalized=True))
+
+    pairwise_top = np.argsort(-pairwise, axis=1, kind="stable")[:, :args.top_k]
+    agreement = float(np.mean([
+        len(set(a) & set(b)) / args.top_k for a, b in zip(pairwise_top, matrix_top)
+    ]))
+    normalized_agreement = float(np.mean([
+        len(set(a) & set(b)) / args.top_k for a, b in zip(matrix_top, normalized_top)
+    ]))
+
+    results = {
+        "pairwise_seconds": round(pairwise_seconds, 6),
+        "matrix_seconds": round(matrix_seconds, 6),
+        "matrix_normalized_seconds": round(normalized_seconds, 6),
+        "speedup": round(pairwise_seconds / matrix_seconds, 1) if matrix_seconds else None,
+        f"top_{args.top_k}_agreement": round(agreement, 4),
+        f"top_{args.top_k}_agreement_normalized": round(normalized_agreement, 4),
+    }
+    print(f"pairwise {pairwise_seconds:.4f} с, matrix {matrix_seconds:.4f} с, "
+          f"matrix (нормированные) {normalized_seconds:.4f} с, ускорение x{results['speedup']}")
+    print(f"Совпадение top-{args.top_k}: {agreement:.4f}, для нормированных: {normalized_agreement:.4f}")
+
+    path = write_results("similarity", {"parameters": vars(args), "results": results}, args.output)
+    print(f"Результаты: {path}")
+
+    # Ранжирование не должно зависеть от способа подсчета (кроме совпадающих значений)
+    if min(agreement, normalized_agreement) < 0.99:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
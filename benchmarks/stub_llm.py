@@ -0,0 +1,138 @@
+"""
+Заглушка GigaChat API с настраиваемой задержкой
+
+Отвечает на POST /chat/completions и GET /models в формате GigaChat,
+поэтому GigaChatClient работает с ней без изменений
+(достаточно указать GIGACHAT_BASE_URL).
+
+Запуск отдельно:
+    python -m benchmarks.stub_llm --port 8900 --latency 0.8 --jitter 0.2
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+STUB_ANSWER = (
+    "Согласно корпоративным документам, для решения вашего вопроса необходимо "
+    "обратиться в отдел кадров и оформить заявление по установленной форме."
+)
+
+
+class StubGigaChatServer:
+    """HTTP сервер, имитирующий GigaChat"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.5, jitter: float = 0.0, seed: int = 42):
+        """
+        Args:
+            host: Адрес сервера
+            port: Порт (0 - выбрать свободный)
+            latency: Средняя задержка ответа в секундах
+            jitter: Максимальное отклонение задержки в секундах
+            seed: Зерно генератора задержек
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.requests_count = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _delay(self) -> float:
+        with self._lock:
+            self.requests_count += 1
+            offset = self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        return max(0.0, self.latency + offset)
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send_json(self, payload: dict, status: int = 200):
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/models"):
+                    self._send_json({"object": "list", "data": [{"id": "GigaChat", "object": "model"}]})
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json({"error": "not found"}, status=404)
+                    return
+
+                time.sleep(stub._delay())
+                prompt = request.get("messages", [{}])[-1].get("content", "")
+                prompt_tokens = len(prompt.split())
+                completion_tokens = len(STUB_ANSWER.split())
+                self._send_json({
+                    "choices": [{"message": {"role": "assistant", "content": STUB_ANSWER}}],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                    "model": request.get("model", "GigaChat"),
+                })
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StubGigaChatServer":
+        """Запуск сервера в фоновом потоке"""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Остановка сервера"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "StubGigaChatServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заглушка GigaChat API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.5, help="Задержка ответа, сек")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Разброс задержки, сек")
+    args = parser.parse_args()
+
+    server = StubGigaChatServer(args.host, args.port, args.latency, args.jitter)
+    print(f"Заглушка GigaChat: {server.base_url} (задержка {args.latency}±{args.jitter} с)")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
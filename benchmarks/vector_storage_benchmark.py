@@ -0,0 +1,134 @@
+"""
+Память и качество поиска по эмбеддингам пониженной точности
+
+На PostgreSQL + pgvector 0.7+ загружает синтетический корпус, строит HNSW
+индексы первого прохода (halfvec, binary) и для каждого режима и множителя
+кандидатов (VECTOR_RESCORE_FACTOR) считает:
+
+- recall@limit относительно точного поиска по float векторам (без индексов);
+- латентность поиска p50/p95;
+- размер индекса первого прохода и объем float векторов в таблице.
+
+Индексы, которых не было до запуска, удаляются в конце (--keep-indexes - оставить).
+
+Пример:
+    python -m benchmarks.vector_storage_benchmark --database-url postgresql://... \\
+        --model ai-forever/sbert_large_nlu_ru --documents 200 --factors 2,5,10,20
+"""
+
+import argparse
+import os
+import time
+
+from sqlalchemy import text
+
+from benchmarks.backends import PostgresBackend
+from benchmarks.common import load_embeddings_model, summarize, write_results
+from benchmarks.corpus import generate_corpus, generate_questions
+from shared.utils.vector_storage import (
+    INDEX_NAMES,
+    create_index,
+    drop_index,
+    search_chunk_ids,
+    storage_status,
+)
+
+
+def exact_search(db, embedding, limit: int):
+    """Точный поиск: планировщику запрещены индексы"""
+    for setting in ("enable_indexscan", "enable_bitmapscan"):
+        db.execute(text("SELECT set_config(:name, 'off', true)"), {'name': setting})
+    ids = search_chunk_ids(db, embedding, limit, -1.0, mode="float")
+    db.rollback()
+    return ids
+
+
+def timed_search(db, embedding, limit: int, mode: str, factor: int):
+    start = time.perf_counter()
+    ids = search_chunk_ids(db, embedding, limit, -1.0, mode=mode, factor=factor)
+    seconds = time.perf_counter() - start
+    db.rollback()
+    return ids, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Память и recall поиска пониженной точности")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--model", default="hashing")
+    parser.add_argument("--documents", type=int, default=40)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--modes", default="halfvec,binary")
+    parser.add_argument("--factors", default="2,5,10,20", help="Кандидатов первого прохода на результат")
+    parser.add_argument("--keep-indexes", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    if not args.database_url:
+        raise SystemExit("Нужен --database-url или DATABASE_URL")
+
+    modes = [mode for mode in args.modes.split(",") if mode.strip()]
+    factors = [int(value) for value in args.factors.split(",") if value.strip()]
+
+    model = load_embeddings_model(args.model)
+    corpus = generate_corpus(args.documents, seed=args.seed)
+    questions = [item.question for item in generate_questions(corpus, args.questions, seed=args.seed)]
+    embeddings = list(model.encode(questions))
+
+    backend = PostgresBackend(args.database_url)
+    db = backend.SessionLocal()
+    created = []
+    try:
+        backend.ingest(corpus, model)
+        with backend.engine.connect() as connection:
+            existing = storage_status(connection)["indexes"]
+        for mode in modes:
+            if existing.get(mode) is None:
+                created.append(mode)
+            # Размерность выражений индекса - как у векторов вопроса в search_chunk_ids
+            create_index(backend.engine, mode, len(embeddings[0]))
+
+        exact = [exact_search(db, embedding, args.limit) for embedding in embeddings]
+
+        results = []
+        for mode in ["float"] + modes:
+            for factor in (factors if mode != "float" else [1]):
+                recalls, latencies = [], []
+                for embedding, expected in zip(embeddings, exact):
+                    ids, seconds = timed_search(db, embedding, args.limit, mode, factor)
+                    latencies.append(seconds)
+                    recalls.append(len(set(ids) & set(expected)) / len(expected) if expected else 1.0)
+                result = {
+                    "mode": mode,
+                    "factor": factor if mode != "float" else None,
+                    "recall": round(sum(recalls) / len(recalls), 4),
+                    "latency": summarize(latencies),
+                }
+                results.append(result)
+                print(f"{mode:8s} x{factor:<3d} recall@{args.limit}={result['recall']:.4f}  "
+                      f"p50={result['latency']['p50']:.4f} с  p95={result['latency']['p95']:.4f} с")
+
+        with backend.engine.connect() as connection:
+            status = storage_status(connection)
+        print(f"Чанков {status['chunks']}, float векторы {status['embedding_bytes'] / 1024 / 1024:.1f} МБ")
+        for mode in modes:
+            size = status["indexes"][mode]
+            print(f"  индекс {INDEX_NAMES[mode]}: {size / 1024 / 1024:.1f} МБ")
+    finally:
+        db.close()
+        if not args.keep_indexes:
+            for mode in created:
+                drop_index(backend.engine, mode)
+        backend.cleanup()
+
+    path = write_results("vector-storage", {
+        "parameters": vars(args),
+        "storage": status,
+        "results": results,
+    }, args.output)
+    print(f"Результаты: {path}")
+
+
+if __name__ == "__main__":
+    main()
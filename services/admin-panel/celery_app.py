@@ -30,5 +30,16 @@ app.conf.update(
     worker_max_tasks_per_child=1000,
 )
 
+# Периодические задачи (beat запускается вместе с воркером: celery worker -B)
+DASHBOARD_STATS_INTERVAL = int(os.getenv("DASHBOARD_STATS_INTERVAL", "30"))
+app.conf.beat_schedule = {
+    'refresh-dashboard-stats': {
+        'task': 'tasks.refresh_dashboard_stats',
+        'schedule': DASHBOARD_STATS_INTERVAL,
+        # Не копим пересчеты в очереди за долгой обработкой документа
+        'options': {'expires': DASHBOARD_STATS_INTERVAL},
+    },
+}
+
 if __name__ == '__main__':
     app.start() 
\ No newline at end of file
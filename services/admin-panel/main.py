@@ -4,14 +4,16 @@ Admin Panel
 """
 
 import os
+import re
 import sys
 import logging
-import shutil
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import List, Optional
+from urllib.parse import urlencode
 
 from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, Request, Cookie, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
@@ -19,7 +21,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
+from sqlalchemy import desc, exists, func, or_, select, tuple_
 
 # Добавляем путь к shared модулям для локального запуска
 current_dir = Path(__file__).parent
@@ -34,18 +36,24 @@ try:
     from shared.models import Document, DocumentChunk, Admin, User
     from shared.models.query_log import QueryLog
     from shared.utils.auth import get_password_hash, verify_password
+    from shared.utils.metrics import render_metrics, instrument_engine_pool, update_queue_lengths, DUPLICATE_UPLOADS_TOTAL
+    from shared.utils.content_hash import ensure_hash_columns, copy_with_sha256, find_document_by_hash, set_document_hash, get_document_hash
+    from shared.utils.dashboard_stats import DASHBOARD_STATS_INTERVAL, get_dashboard_stats
 except ImportError:
     # Если не получилось, пробуем локальный импорт
     from models.database import SessionLocal, engine, Base
     from models import Document, DocumentChunk, Admin, User
     from models.query_log import QueryLog
     from utils.auth import get_password_hash, verify_password
+    from utils.metrics import render_metrics, instrument_engine_pool, update_queue_lengths, DUPLICATE_UPLOADS_TOTAL
+    from utils.content_hash import ensure_hash_columns, copy_with_sha256, find_document_by_hash, set_document_hash, get_document_hash
+    from utils.dashboard_stats import DASHBOARD_STATS_INTERVAL, get_dashboard_stats
 
 # Импортируем Celery для обработки документов
 try:
     from celery.result import AsyncResult
     from celery_app import app as celery_app
-    from tasks import process_document
+    from tasks import process_document, refresh_dashboard_stats, reindex_document
     CELERY_AVAILABLE = True
 except ImportError:
     print("⚠️  Celery недоступен - функции обработки документов отключены")
@@ -53,6 +61,8 @@ except ImportError:
     AsyncResult = None
     celery_app = None
     process_document = None
+    refresh_dashboard_stats = None
+    reindex_document = None
 
 # Настройка логирования
 logging.basicConfig(
@@ -68,9 +78,46 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Метрики пула соединений к базе данных
+instrument_engine_pool(engine)
+
+# Брокер Celery (для метрики длины очереди)
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Пользователей на странице /users
+USERS_PAGE_SIZE = int(os.getenv("USERS_PAGE_SIZE", "50"))
+
+# Фильтр "Недавно активные": пользователи с запросами за столько дней
+RECENT_USERS_DAYS = int(os.getenv("RECENT_USERS_DAYS", "7"))
+
 # Секретный ключ для сессий
 SECRET_KEY = os.getenv("ADMIN_SECRET_KEY", "super-secret-admin-key-change-in-production")
 
+# POST-запросы, меняющие счетчики дашборда и страницы пользователей
+STATS_CHANGING_PATHS = re.compile(
+    r"^/(documents/(upload|\d+/(delete|replace))"
+    r"|users/(create|\d+/(delete|block|unblock))"
+    r"|admins/(create|\d+/delete))$"
+)
+
+@app.middleware("http")
+async def refresh_stats_on_change(request: Request, call_next):
+    """
+    Внеочередной пересчет статистики дашборда после изменений счетчиков
+    
+    Пересчет ставится в очередь Celery, до его завершения страницы отдают
+    сохраненную статистику и не считают ее при запросе. Постановка в
+    очередь (запрос к Redis) выполняется в пуле потоков.
+    """
+    response = await call_next(request)
+    if (request.method == "POST" and response.status_code < 400 and CELERY_AVAILABLE
+            and STATS_CHANGING_PATHS.match(request.url.path)):
+        try:
+            await run_in_threadpool(refresh_dashboard_stats.apply_async, expires=DASHBOARD_STATS_INTERVAL)
+        except Exception as e:
+            logger.error(f"Ошибка постановки пересчета статистики дашборда: {str(e)}")
+    return response
+
 # Обработчик исключений для редиректа на страницу входа
 @app.exception_handler(401)
 async def auth_exception_handler(request: Request, exc: HTTPException):
@@ -81,6 +128,7 @@ async def startup_event():
     """Инициализация при запуске приложения"""
     # Создаем таблицы
     Base.metadata.create_all(bind=engine)
+    ensure_hash_columns(engine)
     logger.info("База данных инициализирована")
     
     # Создаем администратора по умолчанию, если его нет
@@ -231,29 +279,19 @@ async def logout():
 async def dashboard(request: Request, db: Session = Depends(get_db), admin: Admin = Depends(require_auth)):
     """Главная страница админ-панели"""
     try:
-        # Получаем статистику
-        total_documents = db.query(Document).count()
-        completed_documents = db.query(Document).filter(Document.processing_status == "completed").count()
-        failed_documents = db.query(Document).filter(Document.processing_status == "failed").count()
-        total_users = db.query(User).count()
-        total_admins = db.query(Admin).count()
-        
-        # Последние документы
-        recent_documents = db.query(Document).order_by(Document.created_at.desc()).limit(5).all()
-        
-        # Последние запросы пользователей
-        recent_queries = db.query(QueryLog).order_by(QueryLog.created_at.desc()).limit(10).all()
+        # Статистика, посчитанная задачей Celery beat (при отсутствии - пересчет)
+        stats = get_dashboard_stats(db, REDIS_URL)
         
         return templates.TemplateResponse("dashboard.html", {
             "request": request,
             "admin": admin,
-            "total_documents": total_documents,
-            "completed_documents": completed_documents,
-            "failed_documents": failed_documents,
-            "total_users": total_users,
-            "total_admins": total_admins,
-            "recent_documents": recent_documents,
-            "recent_queries": recent_queries
+            "total_documents": stats["total_documents"],
+            "completed_documents": stats["completed_documents"],
+            "failed_documents": stats["failed_documents"],
+            "total_users": stats["total_users"],
+            "total_admins": stats["total_admins"],
+            "recent_documents": stats["recent_documents"],
+            "recent_queries": stats["recent_queries"]
         })
         
     except Exception as e:
@@ -318,9 +356,17 @@ async def upload_document(
         unique_filename = f"{timestamp}_{file.filename}"
         file_path = uploads_dir / unique_filename
         
-        # Сохраняем файл
+        # Сохраняем файл, заодно считая его хеш
         with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+            file_hash = copy_with_sha256(file.file, buffer)
+        
+        # Тот же файл уже загружен - повторно не обрабатываем
+        existing_id = find_document_by_hash(db, file_hash)
+        if existing_id is not None:
+            file_path.unlink(missing_ok=True)
+            DUPLICATE_UPLOADS_TOTAL.inc()
+            logger.info(f"Файл {file.filename} совпадает с документом {existing_id}, загрузка пропущена")
+            return RedirectResponse(url="/documents?success=duplicate", status_code=303)
         
         # Получаем размер файла
         file_size = file_path.stat().st_size
@@ -339,6 +385,8 @@ async def upload_document(
         )
         
         db.add(document)
+        db.flush()
+        set_document_hash(db, document.id, file_hash)
         db.commit()
         db.refresh(document)
         
@@ -402,23 +450,172 @@ async def delete_document(document_id: int, request: Request, db: Session = Depe
         })
 
 
+@app.post("/documents/{document_id}/replace")
+async def replace_document(
+    document_id: int,
+    request: Request,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    admin: Admin = Depends(require_auth)
+):
+    """Замена документа новой версией: переиндексируются только изменившиеся чанки"""
+    try:
+        validate_file(file)
+        
+        document = db.query(Document).filter(Document.id == document_id).first()
+        if not document:
+            return templates.TemplateResponse("error.html", {
+                "request": request,
+                "error": "Документ не найден"
+            })
+        
+        if document.processing_status in ("pending", "processing"):
+            return templates.TemplateResponse("error.html", {
+                "request": request,
+                "error": "Документ еще обрабатывается, замените его после завершения обработки"
+            })
+        
+        if not (CELERY_AVAILABLE and reindex_document):
+            return templates.TemplateResponse("error.html", {
+                "request": request,
+                "error": "Обработка документов недоступна"
+            })
+        
+        # Сохраняем новую версию рядом с прежней, прежний файл удалит задача после замены
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        file_path = uploads_dir / f"{timestamp}_{file.filename}"
+        with open(file_path, "wb") as buffer:
+            file_hash = copy_with_sha256(file.file, buffer)
+        
+        if file_hash == get_document_hash(db, document_id):
+            file_path.unlink(missing_ok=True)
+            return RedirectResponse(url="/documents?success=unchanged", status_code=303)
+        
+        document.processing_status = "pending"
+        document.updated_at = datetime.utcnow()
+        db.commit()
+        
+        task = reindex_document.delay(document_id, str(file_path), file_hash, file.filename)
+        logger.info(f"Новая версия документа {document_id} отправлена на переиндексацию. Task ID: {task.id}")
+        
+        return RedirectResponse(url="/documents?success=replaced", status_code=303)
+        
+    except HTTPException as e:
+        return templates.TemplateResponse("error.html", {
+            "request": request,
+            "error": e.detail
+        })
+    except Exception as e:
+        logger.error(f"Ошибка замены документа {document_id}: {str(e)}")
+        return templates.TemplateResponse("error.html", {
+            "request": request,
+            "error": "Ошибка замены документа"
+        })
+
+
+def encode_users_cursor(user: User) -> str:
+    """Курсор страницы пользователей: позиция последнего пользователя в порядке (created_at, id)"""
+    return f"{user.created_at.isoformat()}_{user.id}"
+
+
+def decode_users_cursor(cursor: str) -> Optional[tuple]:
+    """Разбор курсора; None, если курсор некорректен"""
+    try:
+        created_at, user_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(created_at), int(user_id)
+    except ValueError:
+        return None
+
+
+def query_users_page(db: Session, q: str = "", status_filter: str = "", after: Optional[str] = None,
+                     limit: int = USERS_PAGE_SIZE) -> tuple:
+    """
+    Страница пользователей со статистикой запросов одним SQL запросом
+    
+    Пользователи выбираются по курсору (keyset: created_at, id по убыванию),
+    количество и дата последнего запроса считаются GROUP BY по query_logs
+    только для пользователей страницы.
+    
+    Returns:
+        tuple: Пользователи страницы (с queries_count и last_query_date)
+            и курсор следующей страницы (None, если это последняя)
+    """
+    conditions = []
+    if q:
+        search = [User.username.icontains(q, autoescape=True),
+                  User.first_name.icontains(q, autoescape=True),
+                  User.last_name.icontains(q, autoescape=True)]
+        if q.isdigit():
+            search.append(User.telegram_id == int(q))
+        conditions.append(or_(*search))
+    
+    if status_filter == "active":
+        conditions.append(User.is_active.is_(True))
+    elif status_filter == "blocked":
+        conditions.append(User.is_active.is_(False))
+    elif status_filter == "recent":
+        since = datetime.utcnow() - timedelta(days=RECENT_USERS_DAYS)
+        conditions.append(exists().where(QueryLog.user_id == User.id, QueryLog.created_at >= since))
+    
+    cursor = decode_users_cursor(after) if after else None
+    if cursor is not None:
+        conditions.append(tuple_(User.created_at, User.id) < cursor)
+    
+    # Лишняя строка показывает, есть ли следующая страница
+    page = (select(User.id).where(*conditions)
+            .order_by(User.created_at.desc(), User.id.desc())
+            .limit(limit + 1).subquery())
+    query_stats = (select(QueryLog.user_id,
+                          func.count().label("queries_count"),
+                          func.max(QueryLog.created_at).label("last_query_date"))
+                   .where(QueryLog.user_id.in_(select(page.c.id)))
+                   .group_by(QueryLog.user_id).subquery())
+    rows = db.execute(
+        select(User, query_stats.c.queries_count, query_stats.c.last_query_date)
+        .join(page, page.c.id == User.id)
+        .outerjoin(query_stats, query_stats.c.user_id == User.id)
+        .order_by(User.created_at.desc(), User.id.desc())
+    ).all()
+    
+    users = []
+    for user, queries_count, last_query_date in rows[:limit]:
+        user.queries_count = queries_count or 0
+        user.last_query_date = last_query_date
+        users.append(user)
+    
+    next_cursor = encode_users_cursor(users[-1]) if len(rows) > limit else None
+    return users, next_cursor
+
+
 @app.get("/users", response_class=HTMLResponse)
-async def users_page(request: Request, db: Session = Depends(get_db), admin: Admin = Depends(require_auth)):
-    """Страница управления пользователями"""
+async def users_page(request: Request, q: str = "", filter: str = "", after: Optional[str] = None,
+                     db: Session = Depends(get_db), admin: Admin = Depends(require_auth)):
+    """Страница управления пользователями (поиск ?q=, фильтр ?filter=, следующая страница ?after=)"""
     try:
-        # Получаем всех пользователей
-        users = db.query(User).order_by(User.created_at.desc()).all()
+        q = q.strip()
+        users, next_cursor = query_users_page(db, q, filter, after)
+        
+        # Итоги по всем пользователям - из кэша статистики дашборда
+        stats = get_dashboard_stats(db, REDIS_URL)
+        total_users = stats["total_users"]
+        active_users = stats.get("active_users", 0)
         
-        # Получаем статистику по пользователям
-        for user in users:
-            user.queries_count = db.query(QueryLog).filter(QueryLog.user_id == user.id).count()
-            last_query = db.query(QueryLog).filter(QueryLog.user_id == user.id).order_by(QueryLog.created_at.desc()).first()
-            user.last_query_date = last_query.created_at if last_query else None
+        params = {key: value for key, value in (("q", q), ("filter", filter)) if value}
+        next_url = f"/users?{urlencode({**params, 'after': next_cursor})}" if next_cursor else None
+        first_url = f"/users?{urlencode(params)}" if after else None
         
         return templates.TemplateResponse("users.html", {
             "request": request,
             "admin": admin,
-            "users": users
+            "users": users,
+            "q": q,
+            "status_filter": filter,
+            "total_users": total_users,
+            "active_users": active_users,
+            "blocked_users": total_users - active_users,
+            "total_queries": stats.get("total_queries", 0),
+            "next_url": next_url,
+            "first_url": first_url
         })
         
     except Exception as e:
@@ -739,6 +936,19 @@ async def get_document_status_api(document_id: int, db: Session = Depends(get_db
         return {"error": "Ошибка получения статуса"}
 
 
+@app.get("/metrics")
+def metrics():
+    """
+    Метрики Prometheus (включая длину очереди Celery)
+
+    Обычная функция: FastAPI выполняет ее в пуле потоков, запрос к Redis
+    не блокирует event loop.
+    """
+    update_queue_lengths(REDIS_URL)
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001) 
\ No newline at end of file
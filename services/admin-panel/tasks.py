@@ -3,26 +3,100 @@ Celery задачи для обработки документов
 """
 
 import os
+import time
+import queue
 import logging
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
+import numpy as np
 from celery import Celery
+from celery.signals import task_prerun, task_postrun, task_retry, task_failure, worker_process_init
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker
 
 # Импортируем shared модули
 from shared.models.database import engine
 from shared.models import Document, DocumentChunk
 from shared.utils.document_processor import DocumentProcessor
-from shared.utils.text_processing import chunk_text
-from shared.utils.embeddings import EmbeddingService
+from shared.utils.text_processing import chunk_text, estimate_chunk_count
+from shared.utils.embeddings import EmbeddingService, load_pca_reducer
+from shared.utils.embedding_models import (
+    EmbeddingModelChanged,
+    check_active_model,
+    ensure_registry,
+    get_migration,
+    load_pending_chunks,
+    model_name_from_key,
+    set_next_embeddings,
+    start_migration,
+    switch_over,
+)
+from shared.utils.vector_storage import ensure_reduced_column, set_reduced_embeddings
+import shared.utils.dashboard_stats as dashboard_stats
+from shared.utils.chunking import (
+    APPROX_CHARS_PER_TOKEN,
+    StructuredChunker,
+    TokenCounter,
+    get_chunking_strategy,
+    iter_document_blocks,
+)
+from shared.utils.content_hash import (
+    chunk_sha256,
+    ensure_hash_columns,
+    load_chunk_hashes,
+    load_embeddings_by_hash,
+    set_chunk_hashes,
+    set_document_hash,
+)
+from shared.utils.metrics import (
+    CELERY_TASK_FAILURES_TOTAL,
+    CELERY_TASK_RETRIES_TOTAL,
+    CELERY_TASK_SECONDS,
+    EMBEDDING_BATCH_SIZES,
+    EMBEDDINGS_REUSED_TOTAL,
+    INGESTION_CHUNKS_PER_SECOND,
+    INGESTION_CHUNKS_TOTAL,
+    INGESTION_DOCUMENTS_TOTAL,
+    INGESTION_DURATION_SECONDS,
+    INGESTION_STAGE_ITEMS_PER_SECOND,
+    INGESTION_STAGE_SECONDS,
+    instrument_engine_pool,
+    start_metrics_server,
+)
 
 # Импортируем Celery app
-from celery_app import app
+from celery_app import app, REDIS_URL
 
 # Создаем сессию базы данных
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+instrument_engine_pool(engine)
+
+# Размер батча при создании эмбеддингов чанков
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+
+# Размер чанков документа и перекрытие между ними, символов
+DOCUMENT_CHUNK_SIZE = 1000
+DOCUMENT_CHUNK_OVERLAP = 200
+
+# Сколько эмбеддингов текущего документа держать в памяти для повторяющихся чанков
+EMBEDDING_REUSE_CACHE_SIZE = int(os.getenv("EMBEDDING_REUSE_CACHE_SIZE", "256"))
+
+# Емкость очередей между этапами потоковой обработки документа
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+
+# Чанков в одном батче перерасчета эмбеддингов новой моделью
+REEMBED_BATCH_SIZE = int(os.getenv("REEMBED_BATCH_SIZE", "256"))
+
+# Сколько секунд работает одна задача перерасчета, потом она ставит в очередь продолжение
+REEMBED_TASK_SECONDS = int(os.getenv("REEMBED_TASK_SECONDS", "600"))
+
+# Порт для экспорта метрик воркера
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9101"))
 
 # Настройка логирования
 logging.basicConfig(
@@ -32,14 +106,336 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# Время старта задач для расчета длительности: task_id -> perf_counter
+_task_started_at = {}
+
+# PCA для сокращенных эмбеддингов (EMBEDDINGS_PCA_PATH), загружается один раз на процесс
+_pca_reducer = None
+_pca_loaded = False
+
+# Индексы для статистики дашборда проверяются один раз на процесс
+_dashboard_indexes_ready = False
+
+
+@worker_process_init.connect
+def start_worker_metrics(**kwargs):
+    """Запуск экспорта метрик в процессе воркера (задачи выполняются здесь)"""
+    start_metrics_server(WORKER_METRICS_PORT)
+
+
+@task_prerun.connect
+def on_task_prerun(task_id=None, **kwargs):
+    _task_started_at[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def on_task_postrun(task_id=None, task=None, state=None, **kwargs):
+    started_at = _task_started_at.pop(task_id, None)
+    if started_at is not None and task is not None:
+        CELERY_TASK_SECONDS.labels(task=task.name, state=state or "UNKNOWN").observe(
+            time.perf_counter() - started_at
+        )
+
+
+@task_retry.connect
+def on_task_retry(sender=None, **kwargs):
+    CELERY_TASK_RETRIES_TOTAL.labels(task=getattr(sender, "name", "unknown")).inc()
+
+
+@task_failure.connect
+def on_task_failure(sender=None, **kwargs):
+    CELERY_TASK_FAILURES_TOTAL.labels(task=getattr(sender, "name", "unknown")).inc()
+
+
+# Интервал проверки отмены при ожидании очереди, сек
+_QUEUE_POLL_INTERVAL = 0.5
+
+# Маркер завершения этапа
+_PIPELINE_DONE = object()
+
+
+class _StageFailed:
+    """Ошибка этапа, передается по очереди следующим этапам"""
+    
+    def __init__(self, stage: str, error: Exception):
+        self.stage = stage
+        self.error = error
+
+
+class IngestionPipeline:
+    """
+    Потоковая обработка документа
+    
+    Каждый этап работает в своем потоке и передает результаты следующему
+    через ограниченную очередь: пока одни страницы разбиваются на чанки,
+    для готовых чанков считаются эмбеддинги, а предыдущие батчи пишутся в БД.
+    Между соседними этапами в памяти не больше PIPELINE_QUEUE_SIZE элементов.
+    """
+    
+    def __init__(self, queue_size: int = PIPELINE_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.cancelled = threading.Event()
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self._threads: List[threading.Thread] = []
+    
+    def stage(self, name: str, produce: Callable[[Optional[Iterator]], Iterator],
+              inbox: Optional[queue.Queue] = None, batched: bool = False) -> queue.Queue:
+        """
+        Запускает этап в отдельном потоке
+        
+        Args:
+            name: Название этапа (метка в метриках)
+            produce: Функция, которая получает итератор по результатам предыдущего
+                     этапа (None для первого этапа) и возвращает итератор результатов
+            inbox: Очередь предыдущего этапа
+            batched: Результаты этапа - батчи (в пропускную способность идет их длина)
+            
+        Returns:
+            Очередь с результатами этапа
+        """
+        outbox = queue.Queue(maxsize=self.queue_size)
+        stats = self._stats(name)
+        
+        def run():
+            try:
+                items = iter(produce(self.drain(inbox, name) if inbox is not None else None))
+                while True:
+                    started = time.perf_counter()
+                    item = next(items, _PIPELINE_DONE)
+                    stats['busy'] += time.perf_counter() - started
+                    if item is _PIPELINE_DONE:
+                        break
+                    stats['items'] += len(item) if batched else 1
+                    if not self._put(outbox, item):
+                        return
+            except Exception as e:
+                logger.error(f"Ошибка этапа {name}: {str(e)}")
+                self._put(outbox, _StageFailed(name, e))
+                return
+            self._put(outbox, _PIPELINE_DONE)
+        
+        thread = threading.Thread(target=run, name=f"ingestion-{name}", daemon=True)
+        self._threads.append(thread)
+        thread.start()
+        return outbox
+    
+    def drain(self, inbox: queue.Queue, name: Optional[str] = None) -> Iterator:
+        """
+        Итератор по очереди этапа до маркера завершения
+        
+        Ошибка любого предыдущего этапа пробрасывается потребителю.
+        Если передан name, время ожидания не учитывается в работе этапа name.
+        """
+        stats = self._stats(name) if name else None
+        while True:
+            started = time.perf_counter()
+            item = self._get(inbox)
+            if stats is not None:
+                stats['wait'] += time.perf_counter() - started
+            if item is _PIPELINE_DONE:
+                return
+            if isinstance(item, _StageFailed):
+                raise item.error
+            yield item
+    
+    def record(self, name: str, seconds: float, items: int):
+        """Учет работы этапа, выполняемого в потоке задачи"""
+        stats = self._stats(name)
+        stats['busy'] += seconds
+        stats['items'] += items
+    
+    def close(self):
+        """Останавливает этапы (если обработка прервана) и дожидается потоков"""
+        self.cancelled.set()
+        for thread in self._threads:
+            thread.join()
+    
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """Время работы и пропускная способность этапов, с записью в метрики"""
+        summary = {}
+        for name, stats in self.stats.items():
+            busy = max(stats['busy'] - stats['wait'], 0.0)
+            rate = stats['items'] / busy if busy > 0 else 0.0
+            INGESTION_STAGE_SECONDS.labels(stage=name).observe(busy)
+            INGESTION_STAGE_ITEMS_PER_SECOND.labels(stage=name).set(rate)
+            summary[name] = {
+                "busy_seconds": round(busy, 3),
+                "items": int(stats['items']),
+                "items_per_second": round(rate, 1)
+            }
+        return summary
+    
+    def _stats(self, name: str) -> Dict[str, float]:
+        return self.stats.setdefault(name, {'busy': 0.0, 'wait': 0.0, 'items': 0})
+    
+    def _put(self, outbox: queue.Queue, item) -> bool:
+        while not self.cancelled.is_set():
+            try:
+                outbox.put(item, timeout=_QUEUE_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _get(self, inbox: queue.Queue):
+        while not self.cancelled.is_set():
+            try:
+                return inbox.get(timeout=_QUEUE_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return _PIPELINE_DONE
+
+
+def _log_chunk_estimate(processor: DocumentProcessor, file_path: str, document_id: int,
+                        chunk_size: int, overlap: int) -> None:
+    """
+    Логирует оценку числа чанков до начала извлечения и эмбеддингов
+    
+    Длина текста оценивается по первым страницам PDF, абзацам DOCX или
+    размеру TXT (DocumentProcessor.estimate_text_length), chunk_size - в символах.
+    """
+    try:
+        text_length = processor.estimate_text_length(file_path)
+    except Exception as e:
+        logger.warning(f"Не удалось оценить размер документа {document_id}: {str(e)}")
+        return
+    logger.info(f"Документ {document_id}: около {text_length} символов, "
+                f"ожидается около {estimate_chunk_count(text_length, chunk_size, overlap)} чанков")
+
+
+def _get_pca_reducer():
+    global _pca_reducer, _pca_loaded
+    if not _pca_loaded:
+        _pca_reducer = load_pca_reducer()
+        _pca_loaded = True
+    return _pca_reducer
+
+
+def _prepare_chunk_columns():
+    """
+    Колонки чанков вне моделей (хеш текста, сокращенный эмбеддинг) и реестр моделей
+    
+    Вызывается до работы с document_chunks в сессии задачи: ALTER TABLE
+    из другого соединения ждал бы блокировок этой сессии.
+    """
+    ensure_hash_columns(engine)
+    ensure_registry(engine)
+    if _get_pca_reducer() is not None:
+        ensure_reduced_column(engine)
+
+
+def _save_chunk_columns(db, rows: List[Tuple[DocumentChunk, str]], embedding_service: EmbeddingService):
+    """
+    Хеши текста и сокращенные PCA эмбеддинги для уже отправленных в БД чанков
+    
+    Заодно проверяет, что модель задачи все еще активна: если модель сменилась
+    после начала задачи, эмбеддинги прежней модели в embedding не записываются.
+    """
+    if not rows:
+        return
+    check_active_model(db, embedding_service.model_name)
+    set_chunk_hashes(db, {chunk.id: content_hash for chunk, content_hash in rows})
+    
+    reducer = _get_pca_reducer()
+    if reducer is not None and model_name_from_key(reducer.model_key) == embedding_service.model_name:
+        reduced = reducer.transform([chunk.embedding for chunk, _ in rows])
+        set_reduced_embeddings(db, {chunk.id: vector for (chunk, _), vector in zip(rows, reduced)})
+
+
+def _chunking_stages(file_path: str, document_id: int,
+                     embedding_service: EmbeddingService) -> Tuple[Callable, Callable]:
+    """Этапы извлечения и разбиения на чанки: по токенам модели с учетом структуры или по символам"""
+    processor = DocumentProcessor()
+    if get_chunking_strategy() == "tokens":
+        chunker = StructuredChunker(TokenCounter.from_model(embedding_service.model))
+        logger.info(f"Чанкирование по токенам: до {chunker.max_tokens} токенов в чанке")
+        # Длина чанка в символах - по средней длине токена, без перекрытия
+        _log_chunk_estimate(processor, file_path, document_id, chunker.max_tokens * APPROX_CHARS_PER_TOKEN, 0)
+        extract = lambda _: iter_document_blocks(file_path, processor)
+        split = chunker.iter_chunks
+    else:
+        _log_chunk_estimate(processor, file_path, document_id, DOCUMENT_CHUNK_SIZE, DOCUMENT_CHUNK_OVERLAP)
+        extract = lambda _: processor.iter_text(file_path)
+        split = lambda segments: processor.iter_chunks(segments, DOCUMENT_CHUNK_SIZE, DOCUMENT_CHUNK_OVERLAP)
+    return extract, split
+
+
+def _batch_chunks(chunks: Iterator[str], batch_size: int) -> Iterator[List[Tuple[int, str]]]:
+    """Группирует чанки в батчи (номер чанка, текст)"""
+    batch = []
+    for i, chunk in enumerate(chunks):
+        batch.append((i, chunk))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _embed_batches(embedding_service: EmbeddingService,
+                   batches: Iterator[List[Tuple[int, str]]]) -> Iterator[List[Tuple[int, str, Optional[np.ndarray], str]]]:
+    """
+    Считает эмбеддинги для батчей чанков
+    
+    Для текста, который уже есть в базе (по хешу нормализованного текста) или
+    повторяется в документе, берется готовый эмбеддинг - модель считает
+    только новые тексты. Возвращает (номер, текст, эмбеддинг, хеш текста).
+    """
+    db = SessionLocal()
+    recent: "OrderedDict[str, np.ndarray]" = OrderedDict()
+    try:
+        for batch in batches:
+            hashes = [chunk_sha256(text) for _, text in batch]
+            known = {content_hash: recent[content_hash] for content_hash in hashes if content_hash in recent}
+            
+            lookup = [content_hash for content_hash in hashes if content_hash not in known]
+            if lookup:
+                try:
+                    known.update(load_embeddings_by_hash(db, lookup))
+                except Exception as e:
+                    logger.error(f"Ошибка поиска сохраненных эмбеддингов: {str(e)}")
+                    db.rollback()
+            
+            # Новые тексты, каждый уникальный текст считается один раз
+            pending: Dict[str, str] = {}
+            for (_, text), content_hash in zip(batch, hashes):
+                if content_hash not in known:
+                    pending.setdefault(content_hash, text)
+            
+            if pending:
+                EMBEDDING_BATCH_SIZES.observe(len(pending))
+                embeddings = embedding_service.create_embeddings_batch(list(pending.values()))
+                for content_hash, embedding in zip(pending, embeddings):
+                    if embedding is not None:
+                        known[content_hash] = embedding
+            
+            reused = len(batch) - len(pending)
+            if reused:
+                EMBEDDINGS_REUSED_TOTAL.inc(reused)
+            
+            for content_hash, embedding in known.items():
+                recent[content_hash] = embedding
+                recent.move_to_end(content_hash)
+            while len(recent) > EMBEDDING_REUSE_CACHE_SIZE:
+                recent.popitem(last=False)
+            
+            yield [(i, text, known.get(content_hash), content_hash)
+                   for (i, text), content_hash in zip(batch, hashes)]
+    finally:
+        db.close()
+
+
 @app.task(bind=True)
 def process_document(self, document_id: int):
     """
     Обработка документа: извлечение текста, создание чанков и эмбеддингов
     """
     db = SessionLocal()
+    started_at = time.perf_counter()
     
     try:
+        _prepare_chunk_columns()
+        
         # Получаем документ из базы данных
         document = db.query(Document).filter(Document.id == document_id).first()
         if not document:
@@ -53,47 +449,58 @@ def process_document(self, document_id: int):
         
         logger.info(f"Начинаем обработку документа {document_id}: {document.original_filename}")
         
-        # Инициализируем процессор документов
-        processor = DocumentProcessor()
-        
-        # Извлекаем текст из документа
-        text_content = processor.extract_text(document.file_path)
-        if not text_content or not text_content.strip():
-            raise Exception("Не удалось извлечь текст из документа")
-        
-        # Разбиваем текст на чанки
-        chunks = processor.split_into_chunks(text_content)
-        if not chunks:
-            raise Exception("Не удалось разбить документ на чанки")
-        
-        logger.info(f"Документ разбит на {len(chunks)} чанков")
-        
-        # Инициализируем сервис эмбеддингов
-        embedding_service = EmbeddingService()
+        embedding_service = EmbeddingService(engine)
+        extract, split = _chunking_stages(document.file_path, document_id, embedding_service)
         
-        # Создаем чанки в базе данных
-        created_chunks = []
-        for i, chunk_text in enumerate(chunks):
-            try:
-                # Генерируем эмбеддинг для чанка
-                embedding = embedding_service.get_embedding(chunk_text)
-                
-                # Создаем чанк в базе данных
-                chunk = DocumentChunk(
-                    document_id=document.id,
-                    chunk_index=i,
-                    content=chunk_text,
-                    content_length=len(chunk_text),
-                    embedding=embedding,
-                    created_at=datetime.utcnow()
-                )
+        # Страницы -> чанки -> эмбеддинги -> БД, этапы работают одновременно
+        pipeline = IngestionPipeline()
+        chunks_total = 0
+        created_chunks = 0
+        try:
+            pages = pipeline.stage('extract', extract)
+            chunk_batches = pipeline.stage(
+                'chunk',
+                lambda segments: _batch_chunks(split(segments), EMBEDDING_BATCH_SIZE),
+                inbox=pages, batched=True
+            )
+            embedded_batches = pipeline.stage(
+                'embed',
+                lambda batches: _embed_batches(embedding_service, batches),
+                inbox=chunk_batches, batched=True
+            )
+            
+            # Чанки отправляются в БД по мере готовности, фиксируются одной транзакцией
+            for batch in pipeline.drain(embedded_batches):
+                batch_started = time.perf_counter()
+                chunks_total += len(batch)
                 
-                db.add(chunk)
-                created_chunks.append(chunk)
+                rows = []
+                for i, chunk_text, embedding, content_hash in batch:
+                    if embedding is None:
+                        logger.error(f"Не удалось создать эмбеддинг чанка {i} для документа {document_id}")
+                        continue
+                    
+                    # Создаем чанк в базе данных
+                    chunk = DocumentChunk(
+                        document_id=document_id,
+                        chunk_index=i,
+                        content=chunk_text,
+                        content_length=len(chunk_text),
+                        embedding=embedding,
+                        created_at=datetime.utcnow()
+                    )
+                    db.add(chunk)
+                    rows.append((chunk, content_hash))
+                    created_chunks += 1
                 
-            except Exception as e:
-                logger.error(f"Ошибка создания чанка {i} для документа {document_id}: {str(e)}")
-                continue
+                db.flush()
+                _save_chunk_columns(db, rows, embedding_service)
+                pipeline.record('insert', time.perf_counter() - batch_started, len(batch))
+        finally:
+            pipeline.close()
+        
+        if not chunks_total:
+            raise Exception("Не удалось извлечь текст из документа")
         
         if not created_chunks:
             raise Exception("Не удалось создать ни одного чанка")
@@ -101,27 +508,45 @@ def process_document(self, document_id: int):
         # Сохраняем все чанки
         db.commit()
         
+        stages = pipeline.report()
+        logger.info(f"Документ {document_id}: {chunks_total} чанков, этапы: {stages}")
+        
         # Обновляем статус документа на "completed"
         document.processing_status = "completed"
         document.processed_at = datetime.utcnow()
         document.updated_at = datetime.utcnow()
-        document.chunks_count = len(created_chunks)
+        document.chunks_count = created_chunks
         db.commit()
         
-        logger.info(f"Документ {document_id} успешно обработан. Создано {len(created_chunks)} чанков")
+        elapsed = time.perf_counter() - started_at
+        INGESTION_DOCUMENTS_TOTAL.labels(status="completed").inc()
+        INGESTION_CHUNKS_TOTAL.inc(created_chunks)
+        INGESTION_DURATION_SECONDS.observe(elapsed)
+        INGESTION_CHUNKS_PER_SECOND.set(created_chunks / elapsed if elapsed > 0 else 0)
+        
+        logger.info(f"Документ {document_id} успешно обработан за {elapsed:.1f} с. Создано {created_chunks} чанков")
         
         return {
             "status": "completed",
             "document_id": document_id,
-            "chunks_created": len(created_chunks),
+            "chunks_created": created_chunks,
+            "stages": stages,
             "message": "Документ успешно обработан"
         }
         
     except Exception as e:
+        if isinstance(e, EmbeddingModelChanged) and self.request.retries < self.max_retries:
+            logger.warning(f"Документ {document_id} будет обработан заново: {str(e)}")
+            db.rollback()
+            raise self.retry(countdown=5)
+        
         logger.error(f"Ошибка обработки документа {document_id}: {str(e)}")
+        INGESTION_DOCUMENTS_TOTAL.labels(status="failed").inc()
         
         # Обновляем статус документа на "failed"
         try:
+            # Отменяем уже отправленные в БД чанки
+            db.rollback()
             document = db.query(Document).filter(Document.id == document_id).first()
             if document:
                 document.processing_status = "failed"
@@ -141,6 +566,268 @@ def process_document(self, document_id: int):
         db.close()
 
 
+@app.task(bind=True)
+def reindex_document(self, document_id: int, file_path: str, file_hash: str, original_filename: str):
+    """
+    Переиндексация документа по новой версии файла
+    
+    Новая версия разбивается на чанки, хеши чанков сравниваются с сохраненными:
+    совпавшие чанки остаются (меняется только номер), эмбеддинги считаются
+    только для новых, устаревшие удаляются. Чанки и запись документа меняются
+    одной транзакцией - до ее фиксации поиск идет по прежней версии.
+    """
+    db = SessionLocal()
+    started_at = time.perf_counter()
+    
+    try:
+        _prepare_chunk_columns()
+        
+        document = db.query(Document).filter(Document.id == document_id).first()
+        if not document:
+            logger.error(f"Документ {document_id} не найден")
+            Path(file_path).unlink(missing_ok=True)
+            return {"status": "error", "message": "Документ не найден"}
+        
+        document.processing_status = "processing"
+        document.updated_at = datetime.utcnow()
+        db.commit()
+        
+        logger.info(f"Переиндексация документа {document_id}: {original_filename}")
+        
+        embedding_service = EmbeddingService(engine)
+        extract, split = _chunking_stages(file_path, document_id, embedding_service)
+        chunks = list(split(extract(None)))
+        if not chunks:
+            raise Exception("Не удалось извлечь текст из документа")
+        
+        # Сопоставляем чанки новой версии с сохраненными по хешу текста
+        existing: Dict[str, List[Tuple[int, int]]] = {}
+        for chunk_id, chunk_index, content_hash in load_chunk_hashes(db, document_id):
+            existing.setdefault(content_hash, []).append((chunk_id, chunk_index))
+        
+        moved = []
+        added = []
+        for i, chunk_text in enumerate(chunks):
+            matches = existing.get(chunk_sha256(chunk_text))
+            if matches:
+                chunk_id, chunk_index = matches.pop(0)
+                if chunk_index != i:
+                    moved.append({'chunk_id': chunk_id, 'chunk_index': i})
+            else:
+                added.append((i, chunk_text))
+        stale = [chunk_id for matches in existing.values() for chunk_id, _ in matches]
+        
+        # Эмбеддинги только для новых чанков
+        batches = (added[start:start + EMBEDDING_BATCH_SIZE] for start in range(0, len(added), EMBEDDING_BATCH_SIZE))
+        rows = []
+        for batch in _embed_batches(embedding_service, batches):
+            for i, chunk_text, embedding, content_hash in batch:
+                if embedding is None:
+                    raise Exception(f"Не удалось создать эмбеддинг чанка {i}")
+                rows.append((DocumentChunk(
+                    document_id=document_id,
+                    chunk_index=i,
+                    content=chunk_text,
+                    content_length=len(chunk_text),
+                    embedding=embedding,
+                    created_at=datetime.utcnow()
+                ), content_hash))
+        
+        # Замена версии одной транзакцией
+        if stale:
+            db.query(DocumentChunk).filter(DocumentChunk.id.in_(stale)).delete(synchronize_session=False)
+        if moved:
+            db.execute(text("UPDATE document_chunks SET chunk_index = :chunk_index WHERE id = :chunk_id"), moved)
+        db.add_all([chunk for chunk, _ in rows])
+        db.flush()
+        _save_chunk_columns(db, rows, embedding_service)
+        
+        old_file_path = document.file_path
+        new_file = Path(file_path)
+        document.filename = new_file.name
+        document.original_filename = original_filename
+        document.file_path = file_path
+        document.file_size = new_file.stat().st_size
+        document.file_type = new_file.suffix.lower().lstrip('.')
+        document.chunks_count = len(chunks)
+        document.processing_status = "completed"
+        document.error_message = None
+        document.processed_at = datetime.utcnow()
+        document.updated_at = datetime.utcnow()
+        set_document_hash(db, document_id, file_hash)
+        db.commit()
+        
+        if old_file_path and old_file_path != file_path:
+            try:
+                Path(old_file_path).unlink(missing_ok=True)
+            except Exception as e:
+                logger.warning(f"Не удалось удалить файл {old_file_path}: {str(e)}")
+        
+        elapsed = time.perf_counter() - started_at
+        INGESTION_DOCUMENTS_TOTAL.labels(status="reindexed").inc()
+        INGESTION_CHUNKS_TOTAL.inc(len(rows))
+        INGESTION_DURATION_SECONDS.observe(elapsed)
+        
+        kept = len(chunks) - len(rows)
+        logger.info(f"Документ {document_id} переиндексирован за {elapsed:.1f} с: "
+                    f"оставлено {kept}, добавлено {len(rows)}, удалено {len(stale)} чанков")
+        
+        return {
+            "status": "completed",
+            "document_id": document_id,
+            "chunks_kept": kept,
+            "chunks_added": len(rows),
+            "chunks_deleted": len(stale),
+            "message": "Документ переиндексирован"
+        }
+        
+    except Exception as e:
+        if isinstance(e, EmbeddingModelChanged) and self.request.retries < self.max_retries:
+            logger.warning(f"Документ {document_id} будет переиндексирован заново: {str(e)}")
+            db.rollback()
+            raise self.retry(countdown=5)
+        
+        logger.error(f"Ошибка переиндексации документа {document_id}: {str(e)}")
+        INGESTION_DOCUMENTS_TOTAL.labels(status="failed").inc()
+        
+        # Прежняя версия остается в поиске, новый файл не нужен
+        try:
+            db.rollback()
+            Path(file_path).unlink(missing_ok=True)
+            document = db.query(Document).filter(Document.id == document_id).first()
+            if document:
+                document.processing_status = "completed" if document.chunks_count else "failed"
+                document.error_message = f"Не удалось заменить документ: {str(e)}"
+                document.updated_at = datetime.utcnow()
+                db.commit()
+        except Exception as db_error:
+            logger.error(f"Ошибка обновления статуса документа {document_id}: {str(db_error)}")
+        
+        return {
+            "status": "failed",
+            "document_id": document_id,
+            "error": str(e)
+        }
+        
+    finally:
+        db.close()
+
+
+@app.task(bind=True)
+def reembed_chunks(self, model_name: str):
+    """
+    Перерасчет эмбеддингов всех чанков моделью model_name
+    
+    Эмбеддинги пишутся батчами в теневую колонку embedding_next, каждый батч
+    фиксируется отдельно, поиск все это время идет по прежней модели. Через
+    REEMBED_TASK_SECONDS задача ставит в очередь свое продолжение. Когда
+    посчитаны все чанки (включая добавленные за время перерасчета), модель
+    становится активной (switch_over).
+    """
+    db = SessionLocal()
+    started_at = time.perf_counter()
+    processed = 0
+    
+    try:
+        ensure_registry(engine)
+        embedding_service = EmbeddingService(engine, model_name=model_name)
+        
+        # Модели без фиксированной размерности колонки подойдет любая размерность
+        column_dimensions = getattr(DocumentChunk.__table__.c.embedding.type, 'dim', None)
+        if column_dimensions and column_dimensions != embedding_service.embedding_dim:
+            raise Exception(f"Размерность модели {embedding_service.embedding_dim} не совпадает "
+                            f"с колонкой embedding ({column_dimensions})")
+        
+        migration = get_migration(db)
+        db.rollback()
+        if migration is None:
+            start_migration(engine, model_name, embedding_service.embedding_dim)
+        elif migration["model_name"] != model_name:
+            raise Exception(f"Уже идет переход на модель {migration['model_name']}")
+        
+        while True:
+            pending = load_pending_chunks(db, REEMBED_BATCH_SIZE)
+            if not pending:
+                db.rollback()
+                if switch_over(engine, model_name):
+                    break
+                continue
+            
+            embeddings = embedding_service.create_embeddings_batch([content for _, content in pending])
+            failed = [chunk_id for (chunk_id, _), embedding in zip(pending, embeddings) if embedding is None]
+            if failed:
+                raise Exception(f"Не удалось создать эмбеддинги чанков {failed[:10]}")
+            
+            set_next_embeddings(db, {chunk_id: embedding for (chunk_id, _), embedding in zip(pending, embeddings)})
+            db.commit()
+            processed += len(pending)
+            
+            if time.perf_counter() - started_at > REEMBED_TASK_SECONDS:
+                reembed_chunks.delay(model_name)
+                logger.info(f"Перерасчет эмбеддингов моделью {model_name}: {processed} чанков, продолжение в очереди")
+                return {"status": "continued", "model_name": model_name, "chunks_processed": processed}
+        
+        elapsed = time.perf_counter() - started_at
+        logger.info(f"Модель эмбеддингов {model_name} активна, посчитано {processed} чанков за {elapsed:.1f} с")
+        
+        return {
+            "status": "completed",
+            "model_name": model_name,
+            "chunks_processed": processed,
+            "message": "Модель эмбеддингов переключена"
+        }
+        
+    except OperationalError as e:
+        # Не дождались блокировки для переключения - повторим позже
+        db.rollback()
+        logger.warning(f"Переключение на модель {model_name} отложено: {str(e)}")
+        reembed_chunks.apply_async(args=[model_name], countdown=60)
+        return {"status": "continued", "model_name": model_name, "chunks_processed": processed}
+        
+    except Exception as e:
+        logger.error(f"Ошибка перерасчета эмбеддингов моделью {model_name}: {str(e)}")
+        db.rollback()
+        return {
+            "status": "failed",
+            "model_name": model_name,
+            "chunks_processed": processed,
+            "error": str(e)
+        }
+        
+    finally:
+        db.close()
+
+
+@app.task
+def refresh_dashboard_stats():
+    """
+    Периодический пересчет статистики дашборда админ-панели (Celery beat)
+    """
+    global _dashboard_indexes_ready
+    
+    # Индексы ускоряют пересчет, но без них статистика все равно считается:
+    # ошибка построения не должна останавливать каждый запуск beat
+    if not _dashboard_indexes_ready:
+        try:
+            dashboard_stats.ensure_dashboard_indexes(engine)
+            _dashboard_indexes_ready = True
+        except Exception as e:
+            logger.error(f"Ошибка создания индексов статистики дашборда: {str(e)}")
+    
+    db = SessionLocal()
+    
+    try:
+        stats = dashboard_stats.refresh_dashboard_stats(db, REDIS_URL)
+        return {"total_documents": stats["total_documents"], "total_users": stats["total_users"]}
+        
+    except Exception as e:
+        logger.error(f"Ошибка пересчета статистики дашборда: {str(e)}")
+        return {"error": str(e)}
+        
+    finally:
+        db.close()
+
+
 @app.task
 def cleanup_failed_documents():
     """
@@ -1,17 +1,39 @@
-from .auth import create_access_token, verify_token, get_password_hash, verify_password
-from .text_processing import clean_text, chunk_text, extract_text_from_file
-from .embeddings import SimpleEmbeddings, EmbeddingService
-from .yandex_gpt import YandexGPTClient
-
-__all__ = [
-    "create_access_token",
-    "verify_token", 
-    "get_password_hash",
-    "verify_password",
-    "clean_text",
-    "chunk_text",
-    "extract_text_from_file",
-    "SimpleEmbeddings",
-    "EmbeddingService",
-    "YandexGPTClient"
-] 
\ No newline at end of file
+"""
+Общие утилиты сервисов
+
+Имена пакета загружаются лениво (PEP 562): модуль импортируется при первом
+обращении к имени. Так ``from utils.auth import ...`` не тянет за собой
+sentence-transformers/torch, PyPDF2 и docx из соседних модулей.
+"""
+
+import importlib
+
+# Имя -> модуль пакета, из которого оно загружается
+_LAZY_IMPORTS = {
+    "create_access_token": ".auth",
+    "verify_token": ".auth",
+    "get_password_hash": ".auth",
+    "verify_password": ".auth",
+    "clean_text": ".text_processing",
+    "chunk_text": ".text_processing",
+    "extract_text_from_file": ".text_processing",
+    "SimpleEmbeddings": ".embeddings",
+    "EmbeddingService": ".embeddings",
+    "YandexGPTClient": ".yandex_gpt",
+}
+
+__all__ = list(_LAZY_IMPORTS)
+
+
+def __getattr__(name):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    # Следующие обращения не проходят через __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,312 @@
+"""
+Чанкирование по токенам модели эмбеддингов с учетом структуры документа
+
+SBERT обрезает вход на max_seq_length токенов, поэтому хвост длинного
+символьного чанка в эмбеддинг не попадает, а короткие чанки тратят
+лишние проходы модели. StructuredChunker считает длину токенизатором
+модели, не разрывает заголовки, пункты и абзацы без необходимости и
+заполняет чанки почти до лимита модели.
+"""
+
+import os
+import re
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Стратегия разбиения документов при загрузке:
+# chars  - по символам (DocumentProcessor.split_into_chunks),
+# tokens - по токенам модели с учетом структуры (StructuredChunker)
+CHUNKING_STRATEGIES = ("chars", "tokens")
+CHUNKING_STRATEGY = os.getenv("CHUNKING_STRATEGY", "chars")
+
+# Лимит чанка в токенах (0 - max_seq_length модели за вычетом служебных токенов)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "0"))
+
+# Заполнение чанка (доля лимита), после которого новый раздел начинает новый чанк
+CHUNK_MIN_FILL = float(os.getenv("CHUNK_MIN_FILL", "0.5"))
+
+# Оценка длины, если у модели нет токенизатора
+APPROX_CHARS_PER_TOKEN = 4
+
+# Заголовок не может быть длиннее
+MAX_HEADING_LENGTH = 120
+
+_HEADING_STYLE_RE = re.compile(r'^(heading|заголовок)\s*(\d+)$', re.IGNORECASE)
+_NUMBERED_RE = re.compile(r'^(\d+(?:\.\d+)*)[.)]?\s+\S')
+_SECTION_WORD_RE = re.compile(r'^(глава|раздел|статья|часть|приложение)\s+[\dIVXLC]+', re.IGNORECASE)
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?…;])\s+')
+
+
+@dataclass
+class TextBlock:
+    """Структурный элемент документа"""
+    text: str
+    kind: str = "paragraph"  # heading, clause или paragraph
+    level: int = 0           # уровень заголовка или глубина номера пункта
+
+
+class TokenCounter:
+    """Подсчет токенов токенизатором модели эмбеддингов"""
+
+    def __init__(self, tokenizer=None, max_tokens: int = 510):
+        """
+        Args:
+            tokenizer: Токенизатор HuggingFace (None - оценка по числу символов)
+            max_tokens: Лимит токенов в чанке без учета служебных токенов
+        """
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+
+    @classmethod
+    def from_model(cls, model, max_tokens: int = CHUNK_MAX_TOKENS) -> "TokenCounter":
+        """
+        Счетчик для модели SentenceTransformer
+
+        Лимит по умолчанию - max_seq_length модели минус служебные токены ([CLS], [SEP]).
+        """
+        tokenizer = getattr(model, "tokenizer", None)
+        if not max_tokens:
+            max_seq_length = getattr(model, "max_seq_length", None) or 512
+            special_tokens = tokenizer.num_special_tokens_to_add() if tokenizer is not None else 2
+            max_tokens = max_seq_length - special_tokens
+
+        if tokenizer is None:
+            logger.warning("У модели нет токенизатора, длина чанков оценивается по числу символов")
+        return cls(tokenizer, max_tokens)
+
+    def count(self, text: str) -> int:
+        return self.count_batch([text])[0]
+
+    def count_batch(self, texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        if self.tokenizer is None:
+            # +1 - запас на разделитель, чтобы сумма по частям не была меньше оценки их объединения
+            return [len(text) // APPROX_CHARS_PER_TOKEN + 1 for text in texts]
+        encoded = self.tokenizer(texts, add_special_tokens=False, verbose=False)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+
+def classify_line(line: str) -> TextBlock:
+    """
+    Определяет тип строки простого текста (PDF, TXT)
+
+    Заголовок - короткая строка без точки в конце: нумерованная ("3. Отпуск"),
+    начинающаяся с "Глава", "Раздел" и т.п. или написанная прописными буквами.
+    Пункт - строка, начинающаяся с номера ("2.1. Сотрудник ...").
+    """
+    text = line.strip()
+    numbered = _NUMBERED_RE.match(text)
+    is_short = len(text) <= MAX_HEADING_LENGTH and not text.endswith(('.', ';', ':', ',', '!', '?'))
+
+    if is_short:
+        if numbered:
+            return TextBlock(text, "heading", numbered.group(1).count('.') + 1)
+        if _SECTION_WORD_RE.match(text) or (text.isupper() and len(text) > 3):
+            return TextBlock(text, "heading", 1)
+
+    if numbered:
+        return TextBlock(text, "clause", numbered.group(1).count('.') + 1)
+    return TextBlock(text, "paragraph")
+
+
+def split_text_blocks(text: str) -> Iterator[TextBlock]:
+    """Разбивает простой текст на блоки по строкам"""
+    for line in text.split('\n'):
+        if line.strip():
+            yield classify_line(line)
+
+
+def iter_docx_blocks(file_path: str) -> Iterator[TextBlock]:
+    """
+    Блоки DOCX по абзацам с учетом стилей
+
+    Заголовки определяются по стилям "Heading N" / "Title", пункты - по
+    автонумерации Word или номеру в начале абзаца.
+    """
+    from docx import Document as DocxDocument
+
+    for paragraph in DocxDocument(file_path).paragraphs:
+        text = paragraph.text.strip()
+        if not text:
+            continue
+
+        style_name = paragraph.style.name if paragraph.style is not None else ""
+        heading = _HEADING_STYLE_RE.match(style_name)
+        if heading:
+            yield TextBlock(text, "heading", int(heading.group(2)))
+            continue
+        if style_name == "Title":
+            yield TextBlock(text, "heading", 1)
+            continue
+        if style_name.startswith("List Number"):
+            yield TextBlock(text, "clause", 1)
+            continue
+
+        properties = paragraph._p.pPr
+        if properties is not None and properties.numPr is not None:
+            level = properties.numPr.ilvl.val if properties.numPr.ilvl is not None else 0
+            yield TextBlock(text, "clause", level + 1)
+            continue
+
+        yield classify_line(text)
+
+
+def iter_document_blocks(file_path: str, processor=None) -> Iterator[TextBlock]:
+    """
+    Блоки документа любого поддерживаемого типа
+
+    Для DOCX используется разметка Word, для остальных типов - текст из
+    DocumentProcessor.iter_text, разобранный по строкам.
+    """
+    if Path(file_path).suffix.lower() == '.docx':
+        yield from iter_docx_blocks(file_path)
+        return
+
+    if processor is None:
+        from .document_processor import DocumentProcessor
+        processor = DocumentProcessor()
+
+    for segment in processor.iter_text(file_path):
+        yield from split_text_blocks(segment)
+
+
+class StructuredChunker:
+    """
+    Чанкер по токенам с учетом структуры
+
+    Блоки (заголовки, пункты, абзацы) добавляются в чанк целиком, пока он
+    помещается в лимит токенов. Новый раздел начинает новый чанк, если
+    текущий заполнен хотя бы на min_fill. Чанк, продолжающий раздел, начинается
+    с пути заголовков ("Раздел / Подраздел"). Блок длиннее лимита делится по
+    предложениям, затем по словам и дополняет текущий чанк.
+    """
+
+    def __init__(self, counter: TokenCounter, min_fill: float = CHUNK_MIN_FILL):
+        self.counter = counter
+        self.min_fill = min_fill
+
+    @property
+    def max_tokens(self) -> int:
+        return self.counter.max_tokens
+
+    def split_text(self, text: str) -> List[str]:
+        """Разбивает простой текст на чанки"""
+        return list(self.iter_chunks(split_text_blocks(text)))
+
+    def iter_chunks(self, blocks: Iterable[TextBlock]) -> Iterator[str]:
+        """
+        Потоково собирает чанки из блоков документа
+
+        Args:
+            blocks: Блоки в порядке следования в документе
+        """
+        budget = self.max_tokens
+        path: List[TextBlock] = []
+        parts: List[str] = []
+        used = 0
+
+        for block in blocks:
+            text = block.text.strip()
+            if not text:
+                continue
+
+            if block.kind == "heading":
+                if parts and used >= budget * self.min_fill:
+                    yield "\n".join(parts)
+                    parts, used = [], 0
+                path = [heading for heading in path if heading.level < block.level]
+
+            # Части длинного блока дополняют текущий чанк и оставляют место под путь заголовков
+            context = self._context(path, budget // 4)
+            limit = budget - (context[1] if context else 0)
+            for piece, tokens in self._units(text, budget - used if parts else limit, limit):
+                if parts and used + tokens > budget:
+                    yield "\n".join(parts)
+                    parts, used = [], 0
+
+                if not parts:
+                    context = self._context(path, budget - tokens)
+                    if context:
+                        parts, used = [context[0]], context[1]
+
+                parts.append(piece)
+                used += tokens
+
+            if block.kind == "heading":
+                path.append(block)
+
+        if parts:
+            yield "\n".join(parts)
+
+    def _context(self, path: List[TextBlock], available: int) -> Optional[Tuple[str, int]]:
+        """Путь заголовков для начала чанка, если он помещается в available токенов"""
+        if not path:
+            return None
+
+        for headings in (path, path[-1:]):
+            context = " / ".join(heading.text for heading in headings)
+            tokens = self.counter.count(context)
+            if tokens <= available:
+                return context, tokens
+        return None
+
+    def _units(self, text: str, available: int, limit: int, tokens: Optional[int] = None,
+               depth: int = 0) -> Iterator[Tuple[str, int]]:
+        """
+        Делит блок на части: предложения, затем слова, затем куски по числу
+        символов (токен не короче одного символа)
+
+        Блок, помещающийся в лимит модели, возвращается целиком. Иначе первая
+        часть занимает не больше available токенов, остальные - не больше limit.
+        """
+        if tokens is None:
+            tokens = self.counter.count(text)
+        if tokens <= self.max_tokens:
+            yield text, tokens
+            return
+
+        size = available if available > 0 else limit
+        if depth >= 2:
+            start = 0
+            while start < len(text):
+                piece = text[start:start + size]
+                yield piece, self.counter.count(piece)
+                start += size
+                size = limit
+            return
+
+        pieces = _SENTENCE_SPLIT_RE.split(text) if depth == 0 else text.split()
+        group: List[str] = []
+        used = 0
+        for piece, count in zip(pieces, self.counter.count_batch(pieces)):
+            if group and used + count > size:
+                yield " ".join(group), used
+                group, used, size = [], 0, limit
+
+            if count > size:
+                if count > limit:
+                    # Предложение длиннее лимита - делим дальше
+                    yield from self._units(piece, size, limit, count, depth + 1)
+                else:
+                    yield piece, count
+                size = limit
+                continue
+
+            group.append(piece)
+            used += count
+
+        if group:
+            yield " ".join(group), used
+
+
+def get_chunking_strategy() -> str:
+    """Стратегия из CHUNKING_STRATEGY (неизвестное значение - chars)"""
+    if CHUNKING_STRATEGY not in CHUNKING_STRATEGIES:
+        logger.warning(f"Неизвестная стратегия чанкирования {CHUNKING_STRATEGY}, используем chars")
+        return "chars"
+    return CHUNKING_STRATEGY
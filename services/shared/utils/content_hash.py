@@ -0,0 +1,141 @@
+"""
+Хеши содержимого для дедупликации документов и чанков при загрузке
+
+- documents.file_hash - SHA-256 загруженного файла: повторная загрузка того
+  же файла (с другим именем) не обрабатывается заново;
+- document_chunks.content_hash - SHA-256 нормализованного текста чанка:
+  для уже известного текста берется сохраненный эмбеддинг вместо нового
+  прохода модели.
+
+Колонки добавляются идемпотентным DDL (ensure_hash_columns), поэтому работа с
+ними идет через SQL, а не через атрибуты моделей.
+"""
+
+import hashlib
+import logging
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import String, bindparam, text
+
+from .vector_types import Float32Vector
+
+logger = logging.getLogger(__name__)
+
+# Размер блока при чтении файла
+HASH_BLOCK_SIZE = 1024 * 1024
+
+_SCHEMA_STATEMENTS = (
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS file_hash VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS ix_documents_file_hash ON documents (file_hash)",
+    "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS ix_document_chunks_content_hash ON document_chunks (content_hash)",
+)
+
+_schema_ready = False
+
+
+def ensure_hash_columns(engine) -> None:
+    """Добавляет колонки и индексы хешей, если их еще нет (один раз на процесс)"""
+    global _schema_ready
+    if _schema_ready:
+        return
+
+    with engine.begin() as connection:
+        for statement in _SCHEMA_STATEMENTS:
+            connection.execute(text(statement))
+    _schema_ready = True
+    logger.info("Колонки хешей документов и чанков проверены")
+
+
+def copy_with_sha256(source: BinaryIO, destination: BinaryIO) -> str:
+    """Копирует поток (например, загружаемый файл) и считает его SHA-256"""
+    digest = hashlib.sha256()
+    while True:
+        block = source.read(HASH_BLOCK_SIZE)
+        if not block:
+            break
+        digest.update(block)
+        destination.write(block)
+    return digest.hexdigest()
+
+
+def file_sha256(file_path: str) -> str:
+    """SHA-256 файла на диске"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def normalize_chunk_text(content: str) -> str:
+    """Нормализация текста чанка перед хешированием: пробелы и переносы схлопываются"""
+    return " ".join(content.split())
+
+
+def chunk_sha256(content: str) -> str:
+    """SHA-256 нормализованного текста чанка"""
+    return hashlib.sha256(normalize_chunk_text(content).encode('utf-8')).hexdigest()
+
+
+def find_document_by_hash(db, file_hash: str) -> Optional[int]:
+    """id уже загруженного документа с таким же файлом (кроме неудачно обработанных)"""
+    row = db.execute(text("""
+        SELECT id FROM documents
+        WHERE file_hash = :file_hash AND processing_status <> 'failed'
+        ORDER BY id
+        LIMIT 1
+    """), {'file_hash': file_hash}).first()
+    return row[0] if row else None
+
+
+def get_document_hash(db, document_id: int) -> Optional[str]:
+    return db.execute(text("SELECT file_hash FROM documents WHERE id = :document_id"),
+                      {'document_id': document_id}).scalar()
+
+
+def set_document_hash(db, document_id: int, file_hash: str) -> None:
+    db.execute(text("UPDATE documents SET file_hash = :file_hash WHERE id = :document_id"),
+               {'file_hash': file_hash, 'document_id': document_id})
+
+
+def set_chunk_hashes(db, chunk_hashes: Dict[int, str]) -> None:
+    """Записывает хеши для чанков {id чанка: хеш}"""
+    if not chunk_hashes:
+        return
+    db.execute(text("UPDATE document_chunks SET content_hash = :content_hash WHERE id = :chunk_id"),
+               [{'chunk_id': chunk_id, 'content_hash': content_hash}
+                for chunk_id, content_hash in chunk_hashes.items()])
+
+
+def load_chunk_hashes(db, document_id: int) -> List[Tuple[int, int, str]]:
+    """
+    Чанки документа (id, номер, хеш текста) в порядке номеров
+
+    Для чанков, сохраненных до появления хешей, хеш считается по тексту.
+    """
+    rows = db.execute(text("""
+        SELECT id, chunk_index, content_hash,
+               CASE WHEN content_hash IS NULL THEN content END AS content
+        FROM document_chunks
+        WHERE document_id = :document_id
+        ORDER BY chunk_index, id
+    """), {'document_id': document_id})
+    return [(row.id, row.chunk_index, row.content_hash or chunk_sha256(row.content or ""))
+            for row in rows]
+
+
+def load_embeddings_by_hash(db, hashes: Iterable[str]) -> Dict[str, np.ndarray]:
+    """Сохраненные эмбеддинги для известных хешей текста чанков"""
+    hashes = list(set(hashes))
+    if not hashes:
+        return {}
+
+    query = text("""
+        SELECT DISTINCT ON (content_hash) content_hash, embedding
+        FROM document_chunks
+        WHERE content_hash IN :hashes AND embedding IS NOT NULL
+    """).bindparams(bindparam('hashes', expanding=True)).columns(content_hash=String, embedding=Float32Vector())
+
+    return {row.content_hash: row.embedding for row in db.execute(query, {'hashes': hashes})}
@@ -0,0 +1,203 @@
+"""
+Статистика дашборда админ-панели
+
+Счетчики документов, пользователей, администраторов и запросов (для
+дашборда и страницы пользователей) считаются одним запросом
+(COUNT ... FILTER вместо отдельных COUNT(*)), последние документы и
+запросы выбираются по индексам created_at. Результат хранится в Redis (JSON)
+и обновляется задачей Celery beat tasks.refresh_dashboard_stats раз в
+DASHBOARD_STATS_INTERVAL секунд, дашборд читает готовую статистику.
+
+Если Redis недоступен или статистика старше DASHBOARD_STATS_MAX_AGE,
+она пересчитывается при запросе и кэшируется в процессе. После изменений
+из админ-панели кэш сбрасывается (invalidate_dashboard_stats).
+"""
+
+import os
+import json
+import time
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func, select, text
+
+from ..models import Admin, Document, User
+from ..models.query_log import QueryLog
+
+logger = logging.getLogger(__name__)
+
+# Период пересчета задачей Celery beat, секунды
+DASHBOARD_STATS_INTERVAL = int(os.getenv("DASHBOARD_STATS_INTERVAL", "30"))
+
+# Более старая статистика пересчитывается при запросе (например, если beat не запущен)
+DASHBOARD_STATS_MAX_AGE = int(os.getenv("DASHBOARD_STATS_MAX_AGE", str(DASHBOARD_STATS_INTERVAL * 3)))
+
+DASHBOARD_STATS_KEY = "admin:dashboard_stats"
+RECENT_DOCUMENTS_LIMIT = 5
+RECENT_QUERIES_LIMIT = 10
+
+# Последняя статистика процесса (без Redis)
+_local_stats: Optional[Dict[str, Any]] = None
+_redis_clients: Dict[str, Any] = {}
+
+
+def ensure_dashboard_indexes(engine) -> None:
+    """
+    Индексы для статистики дашборда и страницы пользователей
+
+    - created_at документов и запросов - последние записи без сортировки
+      всей query_logs;
+    - (user_id, created_at) запросов - количество и дата последнего запроса
+      для пользователей страницы /users.
+
+    Индексы создаются CONCURRENTLY, без блокировки записи.
+    """
+    indexes = [
+        (Document.__tablename__, "created_at"),
+        (QueryLog.__tablename__, "created_at"),
+        (QueryLog.__tablename__, "user_id, created_at"),
+    ]
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for table, columns in indexes:
+            name = f"ix_{table}_{columns.replace(', ', '_')}"
+            # Недостроенный после прерванного CONCURRENTLY индекс остается невалидным
+            invalid = connection.execute(text("""
+                SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname = :name AND NOT i.indisvalid
+            """), {'name': name}).scalar()
+            if invalid:
+                connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            connection.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})"))
+
+
+def compute_dashboard_stats(db) -> Dict[str, Any]:
+    """
+    Подсчет статистики дашборда (три запроса независимо от размера таблиц)
+
+    Returns:
+        Dict: Счетчики, последние документы и запросы (словари) и computed_at
+    """
+    counts = db.execute(
+        select(
+            func.count().label('total_documents'),
+            func.count().filter(Document.processing_status == "completed").label('completed_documents'),
+            func.count().filter(Document.processing_status == "failed").label('failed_documents'),
+            select(func.count()).select_from(User).scalar_subquery().label('total_users'),
+            select(func.count()).select_from(User).where(User.is_active.is_(True))
+            .scalar_subquery().label('active_users'),
+            select(func.count()).select_from(Admin).scalar_subquery().label('total_admins'),
+            select(func.count()).select_from(QueryLog).scalar_subquery().label('total_queries'),
+        ).select_from(Document)
+    ).one()
+
+    recent_documents = db.execute(
+        select(Document.id, Document.title, Document.processing_status, Document.created_at)
+        .order_by(Document.created_at.desc())
+        .limit(RECENT_DOCUMENTS_LIMIT)
+    ).mappings().all()
+
+    recent_queries = db.execute(
+        select(QueryLog.user_id, QueryLog.query_text, QueryLog.created_at)
+        .order_by(QueryLog.created_at.desc())
+        .limit(RECENT_QUERIES_LIMIT)
+    ).mappings().all()
+
+    return {
+        **counts._asdict(),
+        'recent_documents': [dict(row) for row in recent_documents],
+        'recent_queries': [dict(row) for row in recent_queries],
+        'computed_at': time.time(),
+    }
+
+
+def _get_redis(redis_url: Optional[str]):
+    if not redis_url:
+        return None
+    client = _redis_clients.get(redis_url)
+    if client is None:
+        try:
+            import redis
+        except ImportError:
+            return None
+        client = _redis_clients[redis_url] = redis.Redis.from_url(redis_url, socket_timeout=0.5)
+    return client
+
+
+def _dumps(stats: Dict[str, Any]) -> str:
+    return json.dumps(stats, ensure_ascii=False,
+                      default=lambda value: value.isoformat() if isinstance(value, datetime) else str(value))
+
+
+def _loads(raw) -> Dict[str, Any]:
+    stats = json.loads(raw)
+    # Шаблон форматирует даты через strftime
+    for key in ('recent_documents', 'recent_queries'):
+        for row in stats[key]:
+            if row.get('created_at'):
+                row['created_at'] = datetime.fromisoformat(row['created_at'])
+    return stats
+
+
+def store_dashboard_stats(stats: Dict[str, Any], redis_url: Optional[str] = None) -> None:
+    """Сохранение статистики в Redis и в кэш процесса"""
+    global _local_stats
+    _local_stats = stats
+
+    client = _get_redis(redis_url)
+    if client is None:
+        return
+    try:
+        client.set(DASHBOARD_STATS_KEY, _dumps(stats), ex=DASHBOARD_STATS_MAX_AGE)
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить статистику дашборда в Redis: {str(e)}")
+
+
+def load_dashboard_stats(redis_url: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Сохраненная статистика: из Redis, иначе из кэша процесса"""
+    client = _get_redis(redis_url)
+    if client is not None:
+        try:
+            raw = client.get(DASHBOARD_STATS_KEY)
+            if raw is not None:
+                return _loads(raw)
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать статистику дашборда из Redis: {str(e)}")
+    return _local_stats
+
+
+def refresh_dashboard_stats(db, redis_url: Optional[str] = None) -> Dict[str, Any]:
+    """Пересчет и сохранение статистики"""
+    stats = compute_dashboard_stats(db)
+    store_dashboard_stats(stats, redis_url)
+    return stats
+
+
+def get_dashboard_stats(db, redis_url: Optional[str] = None,
+                        max_age: int = DASHBOARD_STATS_MAX_AGE) -> Dict[str, Any]:
+    """
+    Статистика для дашборда
+
+    Args:
+        db: Сессия БД (нужна, только если статистику приходится пересчитать)
+        redis_url: URL Redis с общей статистикой
+        max_age: Максимальный возраст сохраненной статистики, секунды
+    """
+    stats = load_dashboard_stats(redis_url)
+    if stats is None or time.time() - stats['computed_at'] > max_age:
+        stats = refresh_dashboard_stats(db, redis_url)
+    return stats
+
+
+def invalidate_dashboard_stats(redis_url: Optional[str] = None) -> None:
+    """Сброс сохраненной статистики: следующий запрос дашборда пересчитает ее"""
+    global _local_stats
+    _local_stats = None
+
+    client = _get_redis(redis_url)
+    if client is None:
+        return
+    try:
+        client.delete(DASHBOARD_STATS_KEY)
+    except Exception as e:
+        logger.warning(f"Не удалось сбросить статистику дашборда в Redis: {str(e)}")
@@ -4,30 +4,69 @@
 
 import os
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterable, Iterator, List, Optional
 try:
     import magic
     MAGIC_AVAILABLE = True
 except ImportError:
     MAGIC_AVAILABLE = False
     magic = None
-import PyPDF2
-from docx import Document as DocxDocument
 
 logger = logging.getLogger(__name__)
 
+# Параллельное извлечение текста из PDF (вне Celery: в prefork воркере, процессе-демоне,
+# пул процессов создать нельзя, и извлечение всегда последовательное)
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "1"))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "50"))
+# Количество диапазонов страниц на один процесс (для равномерной загрузки)
+PDF_RANGES_PER_WORKER = 4
+
+# Страниц PDF, по которым оценивается длина текста всего документа
+ESTIMATE_SAMPLE_PAGES = 5
+
+# Разделители, по которым режутся чанки (в порядке приоритета)
+CHUNK_SEPARATORS = ('. ', '\n', ' ')
+
+
+def _extract_pdf_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """Извлекает текст страниц [start, stop) в дочернем процессе"""
+    import PyPDF2
+    
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return [pdf_reader.pages[page_num].extract_text() + "\n" for page_num in range(start, stop)]
+
 
 class DocumentProcessor:
     """Класс для обработки различных типов документов"""
     
-    def __init__(self):
+    def __init__(self, pdf_workers: Optional[int] = None, parallel_min_pages: Optional[int] = None):
+        """
+        Args:
+            pdf_workers: Количество процессов для извлечения текста из PDF
+                         (1 - последовательно, по умолчанию PDF_EXTRACT_WORKERS;
+                         в процессе-демоне, например воркере Celery, всегда 1)
+            parallel_min_pages: Минимальное число страниц для параллельного режима
+                                (по умолчанию PDF_PARALLEL_MIN_PAGES)
+        """
+        self.pdf_workers = pdf_workers if pdf_workers is not None else PDF_EXTRACT_WORKERS
+        self.parallel_min_pages = parallel_min_pages if parallel_min_pages is not None else PDF_PARALLEL_MIN_PAGES
         self.supported_types = {
             'pdf': self._extract_pdf_text,
             'docx': self._extract_docx_text,
             'doc': self._extract_doc_text,
             'txt': self._extract_txt_text
         }
+        # Потоковое извлечение: генераторы страниц/абзацев
+        self.segment_iterators = {
+            'pdf': self._iter_pdf_pages,
+            'docx': self._iter_docx_paragraphs,
+            'doc': self._iter_doc_text,
+            'txt': self._iter_txt_text
+        }
     
     def extract_text(self, file_path: str) -> str:
         """
@@ -63,39 +102,145 @@ class DocumentProcessor:
             logger.error(f"Ошибка извлечения текста из {file_path}: {str(e)}")
             raise
     
-    def _extract_pdf_text(self, file_path: Path) -> str:
-        """Извлекает текст из PDF файла"""
-        text = ""
+    def iter_text(self, file_path: str) -> Iterator[str]:
+        """
+        Потоково извлекает текст из документа
+        
+        Отдает текст частями (страницы PDF, абзацы DOCX), не собирая весь
+        документ в памяти. "".join(iter_text(path)) совпадает с текстом
+        соответствующего _extract_*_text.
+        
+        Args:
+            file_path: Путь к файлу
+            
+        Yields:
+            Фрагменты текста документа
+        """
+        file_path = Path(file_path)
+        
+        if not file_path.exists():
+            raise FileNotFoundError(f"Файл не найден: {file_path}")
+        
+        file_ext = file_path.suffix.lower().lstrip('.')
+        
+        if file_ext not in self.segment_iterators:
+            raise ValueError(f"Неподдерживаемый тип файла: {file_ext}")
+        
+        yield from self.segment_iterators[file_ext](file_path)
+    
+    def _iter_pdf_pages(self, file_path: Path) -> Iterator[str]:
+        """
+        Постранично извлекает текст из PDF файла
+        
+        Большие файлы при pdf_workers > 1 разбиваются на диапазоны страниц,
+        которые разбираются в пуле процессов; текст отдается в порядке страниц.
+        """
+        import PyPDF2
         
         try:
             with open(file_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
+                pages_count = len(pdf_reader.pages)
                 
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    text += page.extract_text() + "\n"
+                if not self._use_parallel_pdf(pages_count):
+                    for page in pdf_reader.pages:
+                        yield page.extract_text() + "\n"
+                    return
+            
+            yield from self._iter_pdf_pages_parallel(file_path, pages_count)
                     
         except Exception as e:
             logger.error(f"Ошибка чтения PDF файла {file_path}: {str(e)}")
             raise
+    
+    def estimate_text_length(self, file_path: str, sample_pages: int = ESTIMATE_SAMPLE_PAGES) -> int:
+        """
+        Оценка длины текста документа в символах до извлечения
         
-        return text
+        PDF - средняя длина первых sample_pages страниц, умноженная на число
+        страниц; DOCX - сумма длин абзацев; TXT - размер файла в байтах
+        (не меньше числа символов). Для остальных типов - 0.
+        """
+        file_path = Path(file_path)
+        file_ext = file_path.suffix.lower().lstrip('.')
+        
+        if file_ext == 'pdf':
+            import PyPDF2
+            
+            with open(file_path, 'rb') as file:
+                pdf_reader = PyPDF2.PdfReader(file)
+                pages_count = len(pdf_reader.pages)
+                sample = [len(pdf_reader.pages[page_num].extract_text()) + 1
+                          for page_num in range(min(sample_pages, pages_count))]
+            return sum(sample) * pages_count // len(sample) if sample else 0
+        if file_ext == 'docx':
+            from docx import Document as DocxDocument
+            
+            return sum(len(paragraph.text) + 1 for paragraph in DocxDocument(file_path).paragraphs)
+        if file_ext == 'txt':
+            return file_path.stat().st_size
+        return 0
     
-    def _extract_docx_text(self, file_path: Path) -> str:
-        """Извлекает текст из DOCX файла"""
-        text = ""
+    def _use_parallel_pdf(self, pages_count: int) -> bool:
+        """Нужно ли извлекать текст PDF в пуле процессов"""
+        if self.pdf_workers <= 1 or pages_count < self.parallel_min_pages:
+            return False
+        
+        # Процессы-демоны (например, prefork воркеры Celery) не могут создавать дочерние процессы
+        if multiprocessing.current_process().daemon:
+            logger.warning("Параллельное извлечение PDF недоступно в процессе-демоне, используем последовательное")
+            return False
+        
+        return True
+    
+    def _iter_pdf_pages_parallel(self, file_path: Path, pages_count: int) -> Iterator[str]:
+        """Извлечение текста PDF в пуле процессов с сохранением порядка страниц"""
+        workers = min(self.pdf_workers, os.cpu_count() or 1, pages_count)
+        ranges_count = min(pages_count, workers * PDF_RANGES_PER_WORKER)
+        step = -(-pages_count // ranges_count)
+        ranges = [(start, min(start + step, pages_count)) for start in range(0, pages_count, step)]
+        
+        logger.info(f"Параллельное извлечение PDF {file_path}: {pages_count} страниц, {workers} процессов")
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(
+                _extract_pdf_page_range,
+                [str(file_path)] * len(ranges),
+                [start for start, _ in ranges],
+                [stop for _, stop in ranges]
+            )
+            for pages in results:
+                yield from pages
+    
+    def _iter_docx_paragraphs(self, file_path: Path) -> Iterator[str]:
+        """Поабзацно извлекает текст из DOCX файла"""
+        from docx import Document as DocxDocument
         
         try:
             doc = DocxDocument(file_path)
             
             for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
+                yield paragraph.text + "\n"
                 
         except Exception as e:
             logger.error(f"Ошибка чтения DOCX файла {file_path}: {str(e)}")
             raise
-        
-        return text
+    
+    def _iter_doc_text(self, file_path: Path) -> Iterator[str]:
+        """Извлекает текст из DOC файла (старый формат Word)"""
+        yield self._extract_doc_text(file_path)
+    
+    def _iter_txt_text(self, file_path: Path) -> Iterator[str]:
+        """Извлекает текст из TXT файла (одним фрагментом, после определения кодировки)"""
+        yield self._extract_txt_text(file_path)
+    
+    def _extract_pdf_text(self, file_path: Path) -> str:
+        """Извлекает текст из PDF файла"""
+        return "".join(self._iter_pdf_pages(file_path))
+    
+    def _extract_docx_text(self, file_path: Path) -> str:
+        """Извлекает текст из DOCX файла"""
+        return "".join(self._iter_docx_paragraphs(file_path))
     
     def _extract_doc_text(self, file_path: Path) -> str:
         """Извлекает текст из DOC файла (старый формат Word)"""
@@ -133,38 +278,96 @@ class DocumentProcessor:
             
         Returns:
             Список чанков
+            
+        Каждый следующий чанк начинается не менее чем на chunk_size - overlap
+        символов дальше предыдущего, поэтому чанков не больше
+        estimate_chunk_count(len(text), chunk_size, overlap).
         """
         if not text or not text.strip():
             return []
         
-        chunks = []
-        text = text.strip()
+        return list(self.iter_chunks([text], chunk_size=chunk_size, overlap=overlap))
+    
+    def iter_chunks(self, segments: Iterable[str], chunk_size: int = 1000, overlap: int = 200) -> Iterator[str]:
+        """
+        Потоково разбивает текст на чанки
         
-        # Если текст короткий, возвращаем его как один чанк
-        if len(text) <= chunk_size:
-            return [text]
+        Дает те же чанки, что split_into_chunks("".join(segments)), но в памяти
+        хранится только необработанный хвост текста. Чанк отрезается, как только
+        известно, что текст продолжается дальше его правой границы.
         
+        Args:
+            segments: Части текста (например, страницы из iter_text)
+            chunk_size: Размер чанка в символах
+            overlap: Перекрытие между чанками
+        """
+        if overlap >= chunk_size:
+            raise ValueError(f"Перекрытие ({overlap}) должно быть меньше размера чанка ({chunk_size})")
+        
+        # Минимальный сдвиг начала следующего чанка
+        step = chunk_size - overlap
+        buffer = ""
         start = 0
+        cut = False
+        
+        for segment in segments:
+            if not segment:
+                continue
+            # Начальные пробелы всего текста отбрасываются, как в text.strip()
+            buffer = buffer + segment if buffer else segment.lstrip()
+            
+            length = len(buffer.rstrip())
+            while start + chunk_size < length:
+                end = self._find_chunk_end(buffer, start + step, start + chunk_size)
+                chunk = buffer[start:end].strip()
+                if chunk:
+                    yield chunk
+                cut = True
+                start = max(end - overlap, start + step)
+            
+            if start:
+                buffer = buffer[start:]
+                start = 0
+        
+        text = buffer.rstrip()
+        if not text:
+            return
+        
+        # Если текст короткий, возвращаем его как один чанк
+        if not cut and len(text) <= chunk_size:
+            yield text
+            return
+        
         while start < len(text):
             end = start + chunk_size
             
             # Если это не последний чанк, ищем ближайший разделитель
             if end < len(text):
-                # Ищем ближайший разделитель (точка, перенос строки, пробел)
-                for separator in ['. ', '\n', ' ']:
-                    sep_pos = text.rfind(separator, start, end)
-                    if sep_pos != -1:
-                        end = sep_pos + len(separator)
-                        break
+                end = self._find_chunk_end(text, start + step, end)
             
             chunk = text[start:end].strip()
             if chunk:
-                chunks.append(chunk)
+                yield chunk
             
-            # Следующий чанк начинается с учетом перекрытия
-            start = max(start + 1, end - overlap)
+            # Чанк дошел до конца текста: дальше были бы только его хвосты
+            if end >= len(text):
+                break
+            
+            # Следующий чанк начинается с учетом перекрытия, но не ближе step
+            start = max(end - overlap, start + step)
+    
+    def _find_chunk_end(self, text: str, search_start: int, end: int) -> int:
+        """
+        Ищет ближайший к концу чанка разделитель (точка, перенос строки, пробел)
         
-        return chunks
+        Разделитель ищется только в [search_start, end), чтобы чанк не
+        получился короче минимального сдвига; если его нет, чанк режется по end.
+        """
+        for separator in CHUNK_SEPARATORS:
+            sep_pos = text.rfind(separator, search_start, end)
+            if sep_pos != -1:
+                return sep_pos + len(separator)
+        return end
     
     def validate_file(self, file_path: str, max_size: int = 50 * 1024 * 1024) -> bool:
         """
@@ -0,0 +1,388 @@
+"""
+Реестр моделей эмбеддингов и переход на новую модель без остановки поиска
+
+Модель, которой посчитаны document_chunks.embedding, записана в таблице
+embedding_models со статусом active: воркер и бот берут модель оттуда, а
+EMBEDDINGS_MODEL задает только начальную модель пустого реестра.
+
+Переход на другую модель:
+1. Задача reembed_chunks регистрирует модель со статусом migrating и
+   добавляет теневую колонку document_chunks.embedding_next;
+2. батчами считает эмбеддинги новой моделью в embedding_next, поиск в это
+   время идет по embedding прежней модели;
+3. когда embedding_next заполнена у всех чанков, по ней CONCURRENTLY строятся
+   индексы первого прохода vector_storage (те, что есть у embedding) с
+   размерностью новой модели;
+4. одной транзакцией под блокировкой таблицы колонки и индексы
+   переименовываются (embedding -> embedding_prev, embedding_next -> embedding),
+   а новая модель становится active.
+
+Поиск проверяет модель в той же транзакции (search_target): процесс, который
+еще не загрузил новую модель, ищет по embedding_prev векторами прежней.
+Прежние векторы и их индексы остаются в embedding_prev до команды cleanup
+(PCA для режима reduced нужно подобрать заново).
+
+Команды:
+    python -m shared.utils.embedding_models status
+    python -m shared.utils.embedding_models start --model sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2
+    python -m shared.utils.embedding_models cancel
+    python -m shared.utils.embedding_models cleanup
+"""
+
+import os
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, text
+
+from .embeddings import EMBEDDINGS_MODEL_NAME
+from .vector_storage import EMBEDDING_INDEX_MODES, create_index, existing_indexes, index_name
+from .vector_types import Float32Vector
+
+logger = logging.getLogger(__name__)
+
+# Как часто бот перечитывает активную модель из реестра, секунд
+EMBEDDINGS_MODEL_CHECK_SECONDS = int(os.getenv("EMBEDDINGS_MODEL_CHECK_SECONDS", "30"))
+
+# Сколько ждать блокировку document_chunks при переключении модели
+SWITCH_LOCK_TIMEOUT = os.getenv("EMBEDDINGS_SWITCH_LOCK_TIMEOUT", "5s")
+
+_SCHEMA_STATEMENTS = (
+    """
+    CREATE TABLE IF NOT EXISTS embedding_models (
+        model_name VARCHAR(200) PRIMARY KEY,
+        dimensions INTEGER,
+        status VARCHAR(20) NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT now(),
+        activated_at TIMESTAMP
+    )
+    """,
+    # Одна активная модель и не больше одной миграции
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS ux_embedding_models_status
+    ON embedding_models (status) WHERE status IN ('active', 'migrating')
+    """,
+    # Реестр пуст - активна модель из EMBEDDINGS_MODEL, размерность берется из сохраненных векторов
+    """
+    INSERT INTO embedding_models (model_name, dimensions, status, activated_at)
+    SELECT :model_name,
+           (SELECT vector_dims(embedding) FROM document_chunks WHERE embedding IS NOT NULL LIMIT 1),
+           'active', now()
+    WHERE NOT EXISTS (SELECT 1 FROM embedding_models WHERE status = 'active')
+    ON CONFLICT DO NOTHING
+    """,
+)
+
+_registry_ready = False
+
+# Активная модель: id engine -> (модель, время проверки)
+_active_models: Dict[int, Tuple[str, float]] = {}
+
+
+class EmbeddingModelChanged(RuntimeError):
+    """Активная модель сменилась, пока задача считала эмбеддинги прежней"""
+
+
+def ensure_registry(engine) -> None:
+    """Создает реестр и регистрирует начальную модель (один раз на процесс)"""
+    global _registry_ready
+    if _registry_ready:
+        return
+
+    with engine.begin() as connection:
+        for statement in _SCHEMA_STATEMENTS:
+            connection.execute(text(statement), {'model_name': EMBEDDINGS_MODEL_NAME})
+    _registry_ready = True
+
+
+def model_name_from_key(model_key: str) -> str:
+    """Имя модели из ключа хранилища эмбеддингов (без суффикса бэкенда, например +onnx-int8)"""
+    return model_key.split("+", 1)[0]
+
+
+def _load_active_model(connection) -> str:
+    name = connection.execute(text("SELECT model_name FROM embedding_models WHERE status = 'active'")).scalar()
+    return name or EMBEDDINGS_MODEL_NAME
+
+
+def get_active_model_name(engine, max_age: float = EMBEDDINGS_MODEL_CHECK_SECONDS) -> str:
+    """
+    Активная модель эмбеддингов
+
+    Значение кэшируется на max_age секунд; при ошибке БД возвращается
+    последнее известное значение (или EMBEDDINGS_MODEL).
+    """
+    cached = _active_models.get(id(engine))
+    if cached is not None and time.monotonic() - cached[1] < max_age:
+        return cached[0]
+
+    try:
+        ensure_registry(engine)
+        with engine.connect() as connection:
+            name = _load_active_model(connection)
+    except Exception as e:
+        logger.error(f"Ошибка чтения реестра моделей эмбеддингов: {str(e)}")
+        return cached[0] if cached is not None else EMBEDDINGS_MODEL_NAME
+
+    _active_models[id(engine)] = (name, time.monotonic())
+    return name
+
+
+def forget_active_model(engine) -> None:
+    """Следующий get_active_model_name прочитает реестр, не дожидаясь max_age"""
+    _active_models.pop(id(engine), None)
+
+
+def get_active_dimensions(engine) -> Optional[int]:
+    """Размерность векторов активной модели из реестра (None - не записана)"""
+    ensure_registry(engine)
+    with engine.connect() as connection:
+        return connection.execute(text(
+            "SELECT dimensions FROM embedding_models WHERE status = 'active'"
+        )).scalar()
+
+
+def search_target(db, model_name: str) -> Optional[Tuple[str, Optional[int]]]:
+    """
+    Колонка с векторами модели model_name и их размерность для поиска
+
+    Блокирует document_chunks (ACCESS SHARE) до конца транзакции db:
+    switch_over не переименует колонки между этой проверкой и поиском.
+
+    Returns:
+        ("embedding", размерность) для активной модели, ("embedding_prev",
+        размерность) для предыдущей до cleanup, None - векторов модели нет
+    """
+    db.execute(text("LOCK TABLE document_chunks IN ACCESS SHARE MODE"))
+    # Активная модель и последняя из выведенных (векторы в embedding_prev)
+    rows = db.execute(text("""
+        SELECT model_name, dimensions, status FROM embedding_models
+        WHERE status = 'active' OR (status = 'retired' AND activated_at IS NOT NULL)
+        ORDER BY status = 'active' DESC, activated_at DESC
+        LIMIT 2
+    """)).all()
+    if not rows or rows[0].status != 'active':
+        return ("embedding", None) if model_name == EMBEDDINGS_MODEL_NAME else None
+
+    if rows[0].model_name == model_name:
+        return "embedding", rows[0].dimensions
+    if len(rows) > 1 and rows[1].model_name == model_name:
+        prev_exists = db.execute(text("""
+            SELECT 1 FROM pg_attribute
+            WHERE attrelid = 'document_chunks'::regclass AND attname = 'embedding_prev' AND NOT attisdropped
+        """)).scalar()
+        if prev_exists:
+            return "embedding_prev", rows[1].dimensions
+    return None
+
+
+def check_active_model(db, model_name: str) -> None:
+    """
+    Проверяет, что model_name все еще активна
+
+    Вызывается после отправки чанков в БД: транзакция уже держит блокировку
+    document_chunks, поэтому до ее фиксации модель не сменится.
+    """
+    active = _load_active_model(db)
+    if active != model_name:
+        raise EmbeddingModelChanged(f"Активная модель эмбеддингов сменилась: {model_name} -> {active}")
+
+
+def get_migration(connection) -> Optional[dict]:
+    """Модель, на которую идет переход ({model_name, dimensions}), или None"""
+    row = connection.execute(text(
+        "SELECT model_name, dimensions FROM embedding_models WHERE status = 'migrating'"
+    )).first()
+    return dict(row._mapping) if row else None
+
+
+def start_migration(engine, model_name: str, dimensions: int) -> None:
+    """
+    Регистрирует переход на модель и добавляет теневую колонку
+
+    Повторный вызов для той же модели ничего не меняет.
+    """
+    ensure_registry(engine)
+    with engine.begin() as connection:
+        if model_name == _load_active_model(connection):
+            raise ValueError(f"Модель {model_name} уже активна")
+
+        migration = get_migration(connection)
+        if migration is not None and migration["model_name"] != model_name:
+            raise ValueError(f"Уже идет переход на модель {migration['model_name']}")
+
+        prev_exists = connection.execute(text("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'document_chunks' AND column_name = 'embedding_prev'
+        """)).first()
+        if prev_exists:
+            raise ValueError("Остались векторы прошлой модели: сначала выполните cleanup")
+
+        connection.execute(text("ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS embedding_next vector"))
+        connection.execute(text("""
+            INSERT INTO embedding_models (model_name, dimensions, status)
+            VALUES (:model_name, :dimensions, 'migrating')
+            ON CONFLICT (model_name) DO UPDATE SET status = 'migrating', dimensions = EXCLUDED.dimensions
+        """), {'model_name': model_name, 'dimensions': dimensions})
+    logger.info(f"Начат переход на модель эмбеддингов {model_name} ({dimensions})")
+
+
+def load_pending_chunks(db, limit: int) -> List[Tuple[int, str]]:
+    """Чанки без эмбеддинга новой модели (id, текст)"""
+    rows = db.execute(text("""
+        SELECT id, content FROM document_chunks
+        WHERE embedding_next IS NULL
+        ORDER BY id
+        LIMIT :limit
+    """), {'limit': limit})
+    return [(row.id, row.content) for row in rows]
+
+
+def set_next_embeddings(db, embeddings: Dict[int, np.ndarray]) -> None:
+    """Записывает эмбеддинги новой модели {id чанка: вектор}"""
+    if not embeddings:
+        return
+    query = text("UPDATE document_chunks SET embedding_next = :embedding WHERE id = :chunk_id").bindparams(
+        bindparam('embedding', type_=Float32Vector()))
+    db.execute(query, [{'chunk_id': chunk_id, 'embedding': embedding}
+                       for chunk_id, embedding in embeddings.items()])
+
+
+def migration_progress(connection) -> Optional[dict]:
+    """Сколько чанков уже посчитано новой моделью (None - перехода нет)"""
+    migration = get_migration(connection)
+    if migration is None:
+        return None
+    row = connection.execute(text(
+        "SELECT count(*) AS total, count(embedding_next) AS done FROM document_chunks"
+    )).first()
+    return {**migration, "total": row.total, "done": row.done}
+
+
+def switch_over(engine, model_name: str) -> bool:
+    """
+    Делает model_name активной, если все чанки посчитаны новой моделью
+
+    Сначала по embedding_next строятся индексы первого прохода (без
+    блокировки записи), затем проверка и переименование колонок с индексами
+    идут под блокировкой document_chunks: чанки, добавленные параллельно, не
+    останутся без вектора новой модели. Возвращает False, если посчитаны не
+    все чанки. Если блокировку не удалось получить за
+    EMBEDDINGS_SWITCH_LOCK_TIMEOUT, поднимается ошибка БД.
+    """
+    with engine.connect() as connection:
+        migration = get_migration(connection)
+        if migration is None or migration["model_name"] != model_name:
+            raise ValueError(f"Переход на модель {model_name} не начат")
+        pending = connection.execute(text(
+            "SELECT count(*) FROM document_chunks WHERE embedding_next IS NULL"
+        )).scalar()
+        modes = existing_indexes(connection)
+    if pending:
+        logger.info(f"Переключение на {model_name} отложено: {pending} чанков без эмбеддинга")
+        return False
+
+    # Индексы по выражениям остаются у переименованной колонки - строим их для новой заранее
+    for mode in modes:
+        create_index(engine, mode, migration["dimensions"], column="embedding_next")
+
+    with engine.begin() as connection:
+        connection.execute(text("SELECT set_config('lock_timeout', :timeout, true)"),
+                           {'timeout': SWITCH_LOCK_TIMEOUT})
+        connection.execute(text("LOCK TABLE document_chunks IN ACCESS EXCLUSIVE MODE"))
+
+        migration = get_migration(connection)
+        if migration is None or migration["model_name"] != model_name:
+            raise ValueError(f"Переход на модель {model_name} не начат")
+
+        pending = connection.execute(text(
+            "SELECT count(*) FROM document_chunks WHERE embedding_next IS NULL"
+        )).scalar()
+        if pending:
+            logger.info(f"Переключение на {model_name} отложено: {pending} чанков без эмбеддинга")
+            return False
+
+        previous = _load_active_model(connection)
+        connection.execute(text("ALTER TABLE document_chunks RENAME COLUMN embedding TO embedding_prev"))
+        connection.execute(text("ALTER TABLE document_chunks ALTER COLUMN embedding_prev DROP NOT NULL"))
+        connection.execute(text("ALTER TABLE document_chunks RENAME COLUMN embedding_next TO embedding"))
+        for mode in EMBEDDING_INDEX_MODES:
+            connection.execute(text(
+                f"ALTER INDEX IF EXISTS {index_name(mode)} RENAME TO {index_name(mode, 'embedding_prev')}"))
+            connection.execute(text(
+                f"ALTER INDEX IF EXISTS {index_name(mode, 'embedding_next')} RENAME TO {index_name(mode)}"))
+        connection.execute(text("UPDATE embedding_models SET status = 'retired' WHERE status = 'active'"))
+        connection.execute(text("""
+            UPDATE embedding_models SET status = 'active', activated_at = now()
+            WHERE model_name = :model_name
+        """), {'model_name': model_name})
+
+    _active_models.clear()
+    logger.info(f"Активная модель эмбеддингов: {previous} -> {model_name}")
+    return True
+
+
+def cancel_migration(engine) -> Optional[str]:
+    """Отменяет переход: удаляет теневую колонку, возвращает модель перехода"""
+    with engine.begin() as connection:
+        migration = get_migration(connection)
+        connection.execute(text("ALTER TABLE document_chunks DROP COLUMN IF EXISTS embedding_next"))
+        connection.execute(text("UPDATE embedding_models SET status = 'retired' WHERE status = 'migrating'"))
+    return migration["model_name"] if migration else None
+
+
+def drop_previous_embeddings(engine) -> None:
+    """Удаляет векторы прежней модели (и индексы первого прохода по ним, *_prev)"""
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE document_chunks DROP COLUMN IF EXISTS embedding_prev"))
+
+
+def main():
+    import argparse
+    from sqlalchemy import create_engine
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Реестр моделей эмбеддингов и переход на новую модель")
+    parser.add_argument("command", choices=["status", "start", "cancel", "cleanup"])
+    parser.add_argument("--model", default=None, help="Модель для start")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    args = parser.parse_args()
+
+    if not args.database_url:
+        raise SystemExit("Нужен --database-url или DATABASE_URL")
+
+    engine = create_engine(args.database_url)
+    try:
+        ensure_registry(engine)
+        if args.command == "start":
+            if not args.model:
+                raise SystemExit("Нужен --model")
+            # Модель загружает воркер: он и регистрирует переход с размерностью модели
+            from celery import Celery
+
+            Celery(broker=args.redis_url).send_task("tasks.reembed_chunks", args=[args.model])
+            print(f"Задача перерасчета эмбеддингов моделью {args.model} поставлена в очередь")
+        elif args.command == "cancel":
+            model_name = cancel_migration(engine)
+            print(f"Переход на {model_name} отменен" if model_name else "Перехода нет")
+        elif args.command == "cleanup":
+            drop_previous_embeddings(engine)
+            print("Векторы прежней модели удалены")
+
+        with engine.connect() as connection:
+            for row in connection.execute(text(
+                "SELECT model_name, dimensions, status, activated_at FROM embedding_models ORDER BY created_at"
+            )):
+                print(f"  {row.status:9s} {row.model_name} ({row.dimensions or '?'})")
+            progress = migration_progress(connection)
+        if progress is not None:
+            print(f"Переход на {progress['model_name']}: {progress['done']} из {progress['total']} чанков")
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Общее хранилище эмбеддингов в Postgres
+
+Эмбеддинг текста хранится по ключу (модель, SHA-256 нормализованного текста)
+в таблице embedding_cache: воркер сохраняет и переиспользует эмбеддинги чанков
+при загрузке и переиндексации документов (вопросы бота сюда не пишутся, их
+эмбеддинги кэшируются в памяти бота). Размер таблицы
+ограничен EMBEDDING_STORE_MAX_ROWS, при превышении удаляются записи, которые
+дольше всего не использовались.
+
+Хранилище - оптимизация: при ошибках БД эмбеддинги просто считаются моделью.
+"""
+
+import os
+import logging
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import String, bindparam, text
+
+from .content_hash import chunk_sha256
+from .metrics import EMBEDDING_STORE_LOOKUPS_TOTAL
+from .vector_types import Float32Vector
+
+logger = logging.getLogger(__name__)
+
+# Хранилище включено (0 - эмбеддинги всегда считаются моделью)
+EMBEDDING_STORE_ENABLED = os.getenv("EMBEDDING_STORE_ENABLED", "1") == "1"
+
+# Максимум строк в таблице (для всех моделей)
+EMBEDDING_STORE_MAX_ROWS = int(os.getenv("EMBEDDING_STORE_MAX_ROWS", "200000"))
+
+# Вытеснение проверяется после стольких новых записей
+EMBEDDING_STORE_EVICT_EVERY = int(os.getenv("EMBEDDING_STORE_EVICT_EVERY", "1000"))
+
+# Время последнего использования обновляется не чаще, секунд
+EMBEDDING_STORE_TOUCH_SECONDS = int(os.getenv("EMBEDDING_STORE_TOUCH_SECONDS", "3600"))
+
+_SCHEMA_STATEMENTS = (
+    """
+    CREATE TABLE IF NOT EXISTS embedding_cache (
+        model_name VARCHAR(200) NOT NULL,
+        text_hash VARCHAR(64) NOT NULL,
+        embedding vector NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT now(),
+        last_used_at TIMESTAMP NOT NULL DEFAULT now(),
+        PRIMARY KEY (model_name, text_hash)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_embedding_cache_last_used_at ON embedding_cache (last_used_at)",
+)
+
+# Хранилища процесса: (id engine, модель) -> EmbeddingStore
+_stores: Dict[tuple, "EmbeddingStore"] = {}
+
+
+class EmbeddingStore:
+    """Эмбеддинги одной модели в таблице embedding_cache"""
+
+    def __init__(self, engine, model_name: str, max_rows: int = EMBEDDING_STORE_MAX_ROWS):
+        """
+        Args:
+            engine: SQLAlchemy engine (запросы идут в отдельных транзакциях)
+            model_name: Полное имя модели эмбеддингов
+            max_rows: Максимум строк в таблице
+        """
+        self.engine = engine
+        self.model_name = model_name
+        self.max_rows = max_rows
+        self._schema_ready = False
+        self._inserted = 0
+
+    def ensure_schema(self) -> None:
+        """Создает таблицу, если ее еще нет"""
+        if self._schema_ready:
+            return
+        with self.engine.begin() as connection:
+            for statement in _SCHEMA_STATEMENTS:
+                connection.execute(text(statement))
+        self._schema_ready = True
+
+    def lookup(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Сохраненные эмбеддинги текстов (None - эмбеддинга нет)
+
+        Args:
+            texts: Тексты в порядке, в котором нужны эмбеддинги
+        """
+        hashes = [chunk_sha256(text_) for text_ in texts]
+        try:
+            found = self._load(set(hashes))
+        except Exception as e:
+            logger.error(f"Ошибка чтения хранилища эмбеддингов: {str(e)}")
+            found = {}
+
+        hits = sum(1 for content_hash in hashes if content_hash in found)
+        if hits:
+            EMBEDDING_STORE_LOOKUPS_TOTAL.labels(result="hit").inc(hits)
+        if len(hashes) - hits:
+            EMBEDDING_STORE_LOOKUPS_TOTAL.labels(result="miss").inc(len(hashes) - hits)
+        return [found.get(content_hash) for content_hash in hashes]
+
+    def save(self, texts: Sequence[str], embeddings: Sequence[Optional[np.ndarray]]) -> None:
+        """Сохраняет эмбеддинги текстов (пустые эмбеддинги пропускаются)"""
+        rows = {}
+        for text_, embedding in zip(texts, embeddings):
+            if embedding is not None:
+                rows[chunk_sha256(text_)] = embedding
+        if not rows:
+            return
+
+        try:
+            self.ensure_schema()
+            query = text("""
+                INSERT INTO embedding_cache (model_name, text_hash, embedding)
+                VALUES (:model_name, :text_hash, :embedding)
+                ON CONFLICT (model_name, text_hash) DO NOTHING
+            """).bindparams(bindparam('embedding', type_=Float32Vector()))
+            with self.engine.begin() as connection:
+                connection.execute(query, [
+                    {'model_name': self.model_name, 'text_hash': content_hash, 'embedding': embedding}
+                    for content_hash, embedding in rows.items()
+                ])
+
+            self._inserted += len(rows)
+            if self._inserted >= EMBEDDING_STORE_EVICT_EVERY:
+                self._inserted = 0
+                self.evict()
+        except Exception as e:
+            logger.error(f"Ошибка записи в хранилище эмбеддингов: {str(e)}")
+
+    def evict(self) -> int:
+        """Удаляет давно не использованные записи сверх max_rows, возвращает их количество"""
+        self.ensure_schema()
+        with self.engine.begin() as connection:
+            deleted = connection.execute(text("""
+                DELETE FROM embedding_cache
+                WHERE (model_name, text_hash) IN (
+                    SELECT model_name, text_hash FROM embedding_cache
+                    ORDER BY last_used_at DESC
+                    OFFSET :max_rows
+                )
+            """), {'max_rows': self.max_rows}).rowcount
+        if deleted:
+            logger.info(f"Из хранилища эмбеддингов вытеснено {deleted} записей")
+        return deleted
+
+    def _load(self, hashes) -> Dict[str, np.ndarray]:
+        if not hashes:
+            return {}
+        self.ensure_schema()
+
+        query = text("""
+            SELECT text_hash, embedding,
+                   last_used_at < now() - make_interval(secs => :touch_seconds) AS stale
+            FROM embedding_cache
+            WHERE model_name = :model_name AND text_hash IN :hashes
+        """).bindparams(bindparam('hashes', expanding=True)).columns(text_hash=String, embedding=Float32Vector())
+
+        with self.engine.begin() as connection:
+            rows = connection.execute(query, {
+                'model_name': self.model_name,
+                'hashes': list(hashes),
+                'touch_seconds': EMBEDDING_STORE_TOUCH_SECONDS,
+            }).all()
+
+            # Время использования обновляется редко, чтобы чтение не превращалось в запись
+            stale = [row.text_hash for row in rows if row.stale]
+            if stale:
+                connection.execute(text("""
+                    UPDATE embedding_cache SET last_used_at = now()
+                    WHERE model_name = :model_name AND text_hash IN :hashes
+                """).bindparams(bindparam('hashes', expanding=True)),
+                    {'model_name': self.model_name, 'hashes': stale})
+
+        return {row.text_hash: row.embedding for row in rows}
+
+
+def get_embedding_store(engine, model_name: str) -> Optional[EmbeddingStore]:
+    """Хранилище процесса для модели (None, если хранилище выключено)"""
+    if not EMBEDDING_STORE_ENABLED or engine is None:
+        return None
+
+    key = (id(engine), model_name)
+    if key not in _stores:
+        _stores[key] = EmbeddingStore(engine, model_name)
+    return _stores[key]
@@ -1,29 +1,362 @@
 """
 Простейший сервис эмбеддингов без тяжелых зависимостей
+
+Бэкенды модели (EMBEDDINGS_BACKEND):
+- torch - sentence-transformers на PyTorch;
+- onnx  - модель, экспортированная в ONNX и квантованная в int8
+  (export_onnx_model), через onnxruntime. На CPU быстрее в несколько раз,
+  эмбеддинги совпадают с PyTorch с точностью до квантования
+  (проверка - benchmarks/onnx_embeddings_benchmark.py).
+
+sentence-transformers (torch) и onnxruntime импортируются при создании
+модели, а не при импорте модуля: константы и similarity_matrix не тянут
+за собой torch (benchmarks/import_time.py).
 """
 
+import os
+import json
 import logging
-from typing import List, Optional
-from sentence_transformers import SentenceTransformer
+import importlib.util
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
 import numpy as np
 
+ONNX_AVAILABLE = importlib.util.find_spec("onnxruntime") is not None
+
 logger = logging.getLogger(__name__)
 
+# Модель эмбеддингов по умолчанию. Воркер и бот берут активную модель из
+# реестра embedding_models, EMBEDDINGS_MODEL - начальная модель пустого реестра
+EMBEDDINGS_MODEL_NAME = os.getenv("EMBEDDINGS_MODEL", "ai-forever/sbert_large_nlu_ru")
+
+# Бэкенд модели: torch или onnx
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "torch")
+
+# Каталог ONNX модели (создается export_onnx_model)
+EMBEDDINGS_ONNX_PATH = os.getenv("EMBEDDINGS_ONNX_PATH", "/app/models_cache/onnx/sbert_large_nlu_ru")
+
+# Потоков onnxruntime (0 - по числу ядер)
+EMBEDDINGS_ONNX_THREADS = int(os.getenv("EMBEDDINGS_ONNX_THREADS", "0"))
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_CONFIG_FILE = "sentence_config.json"
+
+# Эмбеддинги сервиса нормируются (косинусное сходство - скалярное произведение)
+EMBEDDINGS_NORMALIZE = os.getenv("EMBEDDINGS_NORMALIZE", "1") == "1"
+
+# Файл PCA для сокращения размерности (.npz, создается PcaReducer.save; пусто - без сокращения)
+EMBEDDINGS_PCA_PATH = os.getenv("EMBEDDINGS_PCA_PATH", "")
+
+
+class OnnxSentenceEncoder:
+    """
+    ONNX модель эмбеддингов с интерфейсом SentenceTransformer.encode
+    
+    Каталог модели: model.onnx, файлы токенизатора и sentence_config.json
+    (пулинг, max_seq_length, нормализация), см. export_onnx_model.
+    """
+    
+    def __init__(self, model_dir: str = EMBEDDINGS_ONNX_PATH, threads: int = EMBEDDINGS_ONNX_THREADS):
+        if not ONNX_AVAILABLE:
+            raise RuntimeError("onnxruntime не установлен")
+        
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        
+        path = Path(model_dir)
+        config = json.loads((path / ONNX_CONFIG_FILE).read_text(encoding="utf-8"))
+        self.pooling = config.get("pooling", "mean")
+        self.normalize = config.get("normalize", False)
+        self.max_seq_length = config.get("max_seq_length", 512)
+        self.embedding_dim = config["dimension"]
+        self.model_key = f"{config.get('model_name', EMBEDDINGS_MODEL_NAME)}+onnx" + (
+            "-int8" if config.get("quantized") else "")
+        self.tokenizer = AutoTokenizer.from_pretrained(str(path))
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(path / ONNX_MODEL_FILE), options,
+                                            providers=["CPUExecutionProvider"])
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.embedding_dim
+    
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = False,
+               convert_to_numpy: bool = True, show_progress_bar: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        matrix = np.zeros((len(texts), self.embedding_dim), dtype=np.float32)
+        
+        # Тексты близкой длины в одном батче - меньше паддинга
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            indexes = order[start:start + batch_size]
+            encoded = self.tokenizer([texts[i] for i in indexes], padding=True, truncation=True,
+                                     max_length=self.max_seq_length, return_tensors="np")
+            inputs = {name: encoded[name].astype(np.int64) for name in encoded if name in self._input_names}
+            hidden = self.session.run(None, inputs)[0]
+            matrix[indexes] = self._pool(hidden, encoded["attention_mask"])
+        
+        if (normalize_embeddings or self.normalize) and len(matrix):
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms == 0, 1.0, norms)
+        return matrix[0] if single else matrix
+    
+    def _pool(self, hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        if self.pooling == "cls":
+            return hidden[:, 0]
+        mask = attention_mask[..., None].astype(hidden.dtype)
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+
+def export_onnx_model(model_name: str = EMBEDDINGS_MODEL_NAME, output_dir: str = EMBEDDINGS_ONNX_PATH,
+                      quantize: bool = True, opset: int = 14) -> Path:
+    """
+    Экспорт модели sentence-transformers в ONNX с динамической int8 квантизацией
+    
+    Нужны torch, onnx и onnxruntime. Квантуются веса линейных слоев,
+    активации квантуются на лету - калибровочные данные не нужны.
+    
+    Returns:
+        Path: Каталог модели для OnnxSentenceEncoder
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0].auto_model.eval()
+    transformer.config.return_dict = False
+    pooling = model[1].get_pooling_mode_str() if len(model) > 1 and hasattr(model[1], "get_pooling_mode_str") else "mean"
+    
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    
+    sample = model.tokenizer(["Пример текста для экспорта"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+    
+    float_path = output / "model.float.onnx"
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            str(float_path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+    
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(str(float_path), str(output / ONNX_MODEL_FILE), weight_type=QuantType.QInt8)
+        float_path.unlink()
+    else:
+        float_path.replace(output / ONNX_MODEL_FILE)
+    
+    model.tokenizer.save_pretrained(str(output))
+    (output / ONNX_CONFIG_FILE).write_text(json.dumps({
+        "model_name": model_name,
+        "pooling": pooling,
+        "normalize": any(type(module).__name__ == "Normalize" for module in model),
+        "max_seq_length": model.max_seq_length,
+        "dimension": model.get_sentence_embedding_dimension(),
+        "quantized": quantize,
+    }, ensure_ascii=False, indent=2), encoding="utf-8")
+    
+    logger.info(f"Модель {model_name} экспортирована в {output}")
+    return output
+
+
+def create_embeddings_model(backend: str = EMBEDDINGS_BACKEND, model_name: str = EMBEDDINGS_MODEL_NAME):
+    """
+    Модель эмбеддингов выбранного бэкенда
+    
+    Если ONNX модель недоступна (нет onnxruntime или каталога модели) или
+    экспортирована для другой модели, используется PyTorch.
+    """
+    if backend == "onnx":
+        try:
+            model = OnnxSentenceEncoder()
+            if model.model_key.split("+", 1)[0] == model_name:
+                logger.info(f"Модель эмбеддингов: ONNX ({EMBEDDINGS_ONNX_PATH})")
+                return model
+            logger.warning(f"ONNX модель {EMBEDDINGS_ONNX_PATH} экспортирована не для {model_name}, используем PyTorch")
+        except Exception as e:
+            logger.error(f"Не удалось загрузить ONNX модель, используем PyTorch: {str(e)}")
+    elif backend != "torch":
+        logger.warning(f"Неизвестный бэкенд эмбеддингов {backend}, используем torch")
+    
+    from sentence_transformers import SentenceTransformer
+    
+    model = SentenceTransformer(model_name)
+    model.model_key = model_name
+    return model
+
+
+def embeddings_model_key(model) -> str:
+    """Ключ модели в хранилище эмбеддингов: у ONNX модели векторы немного отличаются от PyTorch"""
+    return getattr(model, "model_key", EMBEDDINGS_MODEL_NAME)
+
+
+class PcaReducer:
+    """
+    Сокращение размерности эмбеддингов методом главных компонент
+    
+    Векторы нормируются до и после проекции: поиск идет по косинусному
+    сходству, а длина исходных векторов на него не влияет. Главные оси
+    считаются без центрирования: проекция сохраняет скалярные произведения
+    исходных векторов, а вычитание среднего меняло бы само сходство. Один и
+    тот же PCA применяется к чанкам при загрузке и к вопросам при поиске.
+    """
+    
+    def __init__(self, components: np.ndarray, explained_variance_ratio: Optional[np.ndarray] = None,
+                 model_key: str = EMBEDDINGS_MODEL_NAME):
+        self.components = components.astype(np.float32)
+        self.explained_variance_ratio = explained_variance_ratio
+        self.model_key = model_key
+    
+    @property
+    def dimensions(self) -> int:
+        return self.components.shape[0]
+    
+    @classmethod
+    def fit(cls, embeddings: np.ndarray, dimensions: int, model_key: str = EMBEDDINGS_MODEL_NAME) -> "PcaReducer":
+        """
+        Подбор PCA по выборке эмбеддингов корпуса
+        
+        Args:
+            embeddings: Матрица (векторов, исходная размерность)
+            dimensions: Размерность после сокращения
+        """
+        matrix = _normalize_rows(np.asarray(embeddings, dtype=np.float64))
+        if dimensions >= matrix.shape[1]:
+            raise ValueError(f"Размерность {dimensions} не меньше исходной {matrix.shape[1]}")
+        if len(matrix) < 2:
+            raise ValueError("Для PCA нужно хотя бы два вектора")
+        
+        # Матрица вторых моментов (размерность x размерность) дешевле SVD по всей выборке
+        moments = matrix.T @ matrix / len(matrix)
+        eigenvalues, eigenvectors = np.linalg.eigh(moments)
+        order = np.argsort(eigenvalues)[::-1][:dimensions]
+        total = eigenvalues.clip(min=0).sum()
+        ratio = eigenvalues[order].clip(min=0) / total if total > 0 else np.zeros(dimensions)
+        return cls(eigenvectors[:, order].T, ratio, model_key)
+    
+    def transform(self, embeddings) -> np.ndarray:
+        """Проекция векторов (одного или матрицы) в пространство меньшей размерности"""
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        single = matrix.ndim == 1
+        projected = _normalize_rows(_normalize_rows(np.atleast_2d(matrix)) @ self.components.T)
+        return projected[0] if single else projected
+    
+    def save(self, path: str) -> None:
+        np.savez(path, components=self.components,
+                 explained_variance_ratio=self.explained_variance_ratio, model_key=np.array(self.model_key))
+    
+    @classmethod
+    def load(cls, path: str) -> "PcaReducer":
+        with np.load(path) as data:
+            return cls(data["components"], data["explained_variance_ratio"], str(data["model_key"]))
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def normalize_embeddings(embeddings) -> np.ndarray:
+    """Эмбеддинги (вектор или матрица) единичной длины в float32, нулевые векторы остаются нулевыми"""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim == 1:
+        return _normalize_rows(matrix[np.newaxis])[0]
+    return _normalize_rows(matrix)
+
+
+def similarity_matrix(queries, candidates, top_k: Optional[int] = None,
+                      normalized: bool = False) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Косинусное сходство батча запросов с матрицей кандидатов
+    
+    Векторы нормируются один раз, сходство считается одним умножением матриц
+    в float32. Для подсчета по многим парам (дедупликация, MMR, семантический
+    кэш) вместо calculate_similarity в цикле.
+    
+    Args:
+        queries: Вектор или матрица (запросов, размерность)
+        candidates: Матрица (кандидатов, размерность)
+        top_k: Вернуть только top_k лучших кандидатов для каждого запроса
+        normalized: Векторы уже нормированы (например, эмбеддинги сервиса)
+        
+    Returns:
+        Матрица сходства (запросов, кандидатов) или, с top_k, пара матриц
+        (индексы кандидатов, сходство) по убыванию сходства. Для одного
+        вектора запроса - строка вместо матрицы.
+    """
+    single = np.ndim(queries) == 1
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    candidates = np.atleast_2d(np.asarray(candidates, dtype=np.float32))
+    if not normalized:
+        queries, candidates = _normalize_rows(queries), _normalize_rows(candidates)
+    scores = queries @ candidates.T
+    
+    if top_k is None:
+        return scores[0] if single else scores
+    
+    k = min(top_k, scores.shape[1])
+    if k < scores.shape[1]:
+        indexes = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        indexes = np.tile(np.arange(scores.shape[1]), (len(scores), 1))
+    top_scores = np.take_along_axis(scores, indexes, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    indexes = np.take_along_axis(indexes, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    return (indexes[0], top_scores[0]) if single else (indexes, top_scores)
+
+
+def load_pca_reducer(path: str = EMBEDDINGS_PCA_PATH, model_key: Optional[str] = None) -> Optional[PcaReducer]:
+    """PCA из EMBEDDINGS_PCA_PATH (None, если не задан или не загрузился)"""
+    if not path:
+        return None
+    try:
+        reducer = PcaReducer.load(path)
+    except Exception as e:
+        logger.error(f"Не удалось загрузить PCA из {path}: {str(e)}")
+        return None
+    
+    if model_key and reducer.model_key != model_key:
+        logger.warning(f"PCA подобран для модели {reducer.model_key}, а используется {model_key}")
+    logger.info(f"PCA {path}: {reducer.components.shape[1]} -> {reducer.dimensions}")
+    return reducer
+
+
 class SimpleEmbeddings:
     """
     Простая система эмбеддингов
     Только локальная модель - никаких сложностей!
     """
     
-    def __init__(self):
-        """Инициализация с локальной русской моделью"""
+    def __init__(self, model_name: str = EMBEDDINGS_MODEL_NAME, normalize: bool = EMBEDDINGS_NORMALIZE):
+        """
+        Инициализация с локальной моделью (по умолчанию русская модель от ai-forever)
+        
+        Args:
+            model_name: Модель эмбеддингов
+            normalize: Возвращать векторы единичной длины (сходство - скалярное произведение)
+        """
         logger.info("Загружаем локальную модель эмбеддингов...")
+        self.normalize = normalize
         
         try:
-            # Используем лучшую русскую модель от ai-forever
-            self.model = SentenceTransformer('ai-forever/sbert_large_nlu_ru')
-            self.model_name = "sbert_large_nlu_ru"
-            self.embedding_dim = 1024  # Размерность эмбеддингов
+            self.model = create_embeddings_model(model_name=model_name)
+            self.model_key = embeddings_model_key(self.model)
+            self.model_name = model_name
+            self.embedding_dim = self.model.get_sentence_embedding_dimension()
             
             logger.info(f"Модель {self.model_name} успешно загружена!")
             
@@ -31,7 +364,7 @@ class SimpleEmbeddings:
             logger.error(f"Ошибка загрузки модели: {str(e)}")
             raise
     
-    def create_embedding(self, text: str) -> Optional[List[float]]:
+    def create_embedding(self, text: str) -> Optional[np.ndarray]:
         """
         Создание эмбеддинга для текста
         
@@ -39,7 +372,7 @@ class SimpleEmbeddings:
             text: Входной текст
             
         Returns:
-            List[float]: Вектор эмбеддинга или None при ошибке
+            np.ndarray: Вектор эмбеддинга (float32) или None при ошибке
         """
         if not text or not text.strip():
             logger.warning("Пустой текст для создания эмбеддинга")
@@ -50,16 +383,15 @@ class SimpleEmbeddings:
             clean_text = text.strip()
             
             # Создаем эмбеддинг
-            embedding = self.model.encode(clean_text)
+            embedding = self.model.encode(clean_text, normalize_embeddings=self.normalize)
             
-            # Конвертируем в список
-            return embedding.tolist()
+            return np.ascontiguousarray(embedding, dtype=np.float32)
             
         except Exception as e:
             logger.error(f"Ошибка создания эмбеддинга: {str(e)}")
             return None
     
-    def create_embeddings_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
+    def create_embeddings_batch(self, texts: List[str]) -> List[Optional[np.ndarray]]:
         """
         Создание эмбеддингов для списка текстов (батчевая обработка)
         
@@ -67,7 +399,7 @@ class SimpleEmbeddings:
             texts: Список текстов
             
         Returns:
-            List[Optional[List[float]]]: Список эмбеддингов
+            List[Optional[np.ndarray]]: Эмбеддинги (строки одной матрицы float32)
         """
         if not texts:
             return []
@@ -80,15 +412,15 @@ class SimpleEmbeddings:
                 return [None] * len(texts)
             
             # Создаем эмбеддинги батчем (быстрее)
-            embeddings = self.model.encode(clean_texts)
+            embeddings = np.ascontiguousarray(
+                self.model.encode(clean_texts, normalize_embeddings=self.normalize), dtype=np.float32)
         
-            # Конвертируем в список списков
             result = []
             clean_idx = 0
             
             for original_text in texts:
                 if original_text and original_text.strip():
-                    result.append(embeddings[clean_idx].tolist())
+                    result.append(embeddings[clean_idx])
                     clean_idx += 1
                 else:
                     result.append(None)
@@ -99,7 +431,7 @@ class SimpleEmbeddings:
             logger.error(f"Ошибка создания батча эмбеддингов: {str(e)}")
             return [None] * len(texts)
     
-    def calculate_similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
+    def calculate_similarity(self, embedding1, embedding2) -> float:
         """
         Вычисление косинусного сходства между эмбеддингами
         
@@ -111,18 +443,10 @@ class SimpleEmbeddings:
             float: Значение сходства от 0 до 1
         """
         try:
-            vec1 = np.array(embedding1)
-            vec2 = np.array(embedding2)
-            
-            # Косинусное сходство
-            dot_product = np.dot(vec1, vec2)
-            norm1 = np.linalg.norm(vec1)
-            norm2 = np.linalg.norm(vec2)
-            
-            if norm1 == 0 or norm2 == 0:
+            if not (np.any(embedding1) and np.any(embedding2)):
                 return 0.0
             
-            similarity = dot_product / (norm1 * norm2)
+            similarity = float(similarity_matrix(embedding1, [embedding2])[0])
             
             # Приводим к диапазону [0, 1]
             return max(0.0, min(1.0, (similarity + 1) / 2))
@@ -137,6 +461,7 @@ class SimpleEmbeddings:
             'model_name': self.model_name,
             'embedding_dimension': self.embedding_dim,
             'type': 'local',
+            'backend': 'onnx' if isinstance(self.model, OnnxSentenceEncoder) else 'torch',
             'language': 'russian',
             'cost': 'free'
         }
@@ -152,15 +477,68 @@ class SimpleEmbeddings:
 
 # Для совместимости с новым кодом
 class EmbeddingService(SimpleEmbeddings):
-    """Алиас для совместимости"""
+    """
+    Сервис эмбеддингов с общим хранилищем
     
-    def get_embedding(self, text: str) -> List[float]:
+    Если передан engine базы данных, эмбеддинги ищутся в общем хранилище
+    (EmbeddingStore) до обращения к модели, а новые сохраняются. Модель без
+    явного model_name берется активная из реестра embedding_models.
+    """
+    
+    def __init__(self, engine=None, model_name: Optional[str] = None):
+        if model_name is None and engine is not None:
+            from .embedding_models import get_active_model_name
+            model_name = get_active_model_name(engine, max_age=0)
+        super().__init__(model_name or EMBEDDINGS_MODEL_NAME)
+        self.store = None
+        if engine is not None:
+            from .embedding_store import get_embedding_store
+            self.store = get_embedding_store(engine, self.model_key)
+    
+    def create_embedding(self, text: str) -> Optional[np.ndarray]:
+        if self.store is None or not text or not text.strip():
+            return super().create_embedding(text)
+        return self.create_embeddings_batch([text])[0]
+    
+    def create_embeddings_batch(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        if self.store is None or not texts:
+            return super().create_embeddings_batch(texts)
+        
+        valid = [i for i, text in enumerate(texts) if text and text.strip()]
+        result: List[Optional[np.ndarray]] = [None] * len(texts)
+        for i, embedding in zip(valid, self.store.lookup([texts[i] for i in valid])):
+            result[i] = embedding
+        
+        missing = [i for i in valid if result[i] is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            embeddings = super().create_embeddings_batch(missing_texts)
+            for i, embedding in zip(missing, embeddings):
+                result[i] = embedding
+            self.store.save(missing_texts, embeddings)
+        
+        return result
+    
+    def get_embedding(self, text: str) -> np.ndarray:
         """Совместимость с новым API"""
         result = self.create_embedding(text)
-        return result if result is not None else [0.0] * self.embedding_dim
+        return result if result is not None else np.zeros(self.embedding_dim, dtype=np.float32)
     
     def similarity(self, text1: str, text2: str) -> float:
-        """Вычисляет схожесть между двумя текстами"""
-        emb1 = self.get_embedding(text1)
-        emb2 = self.get_embedding(text2)
-        return self.calculate_similarity(emb1, emb2) 
\ No newline at end of file
+        """Вычисляет схожесть между двумя текстами (оба текста кодируются одним батчем)"""
+        emb1, emb2 = self.create_embeddings_batch([text1, text2])
+        if emb1 is None or emb2 is None:
+            return 0.0
+        return self.calculate_similarity(emb1, emb2)
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Экспорт модели эмбеддингов в ONNX")
+    parser.add_argument("--model", default=EMBEDDINGS_MODEL_NAME)
+    parser.add_argument("--output", default=EMBEDDINGS_ONNX_PATH)
+    parser.add_argument("--no-quantize", action="store_true", help="Без int8 квантизации")
+    args = parser.parse_args()
+    print(export_onnx_model(args.model, args.output, quantize=not args.no_quantize))
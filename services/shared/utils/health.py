@@ -0,0 +1,115 @@
+"""
+Кэшированные проверки работоспособности компонентов
+
+HealthMonitor выполняет проверки (БД, LLM, модель) в фоновом потоке раз в
+HEALTH_CHECK_INTERVAL секунд и хранит последний результат. Команды и
+эндпоинты статуса читают кэш через snapshot() и не ждут сеть: проверка
+провайдера LLM не выполняется на каждый запрос статуса.
+
+Проверка - функция без аргументов: исключение или False означают
+неработающий компонент, любое другое значение - работающий (значение,
+кроме True, сохраняется, например количество документов).
+"""
+
+import os
+import time
+import logging
+import threading
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Optional
+
+from .metrics import HEALTH_CHECK_SECONDS, HEALTH_COMPONENT_UP
+
+logger = logging.getLogger(__name__)
+
+# Период фоновых проверок, секунды
+HEALTH_CHECK_INTERVAL = int(os.getenv("HEALTH_CHECK_INTERVAL", "60"))
+
+
+@dataclass
+class ComponentStatus:
+    """Результат последней проверки компонента"""
+    ok: bool
+    checked_at: Optional[float] = None
+    duration: Optional[float] = None
+    value: Any = None
+    error: Optional[str] = None
+
+
+class HealthMonitor:
+    """Фоновые проверки компонентов с кэшем результатов"""
+
+    def __init__(self, checks: Dict[str, Callable[[], Any]], interval: int = HEALTH_CHECK_INTERVAL):
+        self.checks = checks
+        self.interval = interval
+        # До первой проверки компоненты считаются неработающими
+        self._statuses = {name: ComponentStatus(ok=False, error="не проверялся") for name in checks}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Запуск фоновых проверок (первая - сразу)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="health-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Остановка фоновых проверок"""
+        self._stopped = True
+        self._wake.set()
+
+    def refresh_soon(self) -> None:
+        """Внеочередная фоновая проверка (например, после инициализации компонента)"""
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            # Сбрасываем до проверки: запрос refresh_soon во время проверки не теряется
+            self._wake.clear()
+            self.refresh()
+            self._wake.wait(self.interval)
+
+    def refresh(self) -> Dict[str, ComponentStatus]:
+        """Выполнение всех проверок сейчас (блокирует до завершения)"""
+        for name, check in self.checks.items():
+            started = time.perf_counter()
+            try:
+                result = check()
+                status = ComponentStatus(ok=result is not False,
+                                         value=None if isinstance(result, bool) else result)
+            except Exception as e:
+                logger.error(f"Проверка {name} не прошла: {str(e)}")
+                status = ComponentStatus(ok=False, error=str(e))
+            status.checked_at = time.time()
+            status.duration = round(time.perf_counter() - started, 4)
+
+            HEALTH_CHECK_SECONDS.labels(component=name).observe(status.duration)
+            HEALTH_COMPONENT_UP.labels(component=name).set(1 if status.ok else 0)
+            with self._lock:
+                self._statuses[name] = status
+        return self.statuses()
+
+    def statuses(self) -> Dict[str, ComponentStatus]:
+        """Последние результаты проверок без ожидания"""
+        with self._lock:
+            return dict(self._statuses)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Последние результаты проверок в виде словаря
+
+        Returns:
+            Dict: overall, components (имя -> поля ComponentStatus) и
+                age - возраст самой старой проверки в секундах
+        """
+        statuses = self.statuses()
+        checked = [status.checked_at for status in statuses.values() if status.checked_at is not None]
+        return {
+            'overall': all(status.ok for status in statuses.values()),
+            'components': {name: asdict(status) for name, status in statuses.items()},
+            'age': round(time.time() - min(checked), 1) if len(checked) == len(statuses) else None,
+        }
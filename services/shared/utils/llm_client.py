@@ -1,5 +1,6 @@
 # services/shared/utils/llm_client.py
 
+import os
 import logging
 import requests
 import json
@@ -8,6 +9,9 @@ from dataclasses import dataclass
 
 logger = logging.getLogger(__name__)
 
+# Таймаут проверки доступности провайдера, секунды
+LLM_HEALTH_TIMEOUT = float(os.getenv("LLM_HEALTH_TIMEOUT", "5"))
+
 @dataclass
 class LLMResponse:
     """Ответ от LLM"""
@@ -20,9 +24,9 @@ class LLMResponse:
 class GigaChatClient:
     """Простой клиент для GigaChat - единственный LLM провайдер"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, base_url: Optional[str] = None):
         self.api_key = api_key
-        self.base_url = "https://gigachat.devices.sberbank.ru/api/v1"
+        self.base_url = base_url or os.getenv("GIGACHAT_BASE_URL", "https://gigachat.devices.sberbank.ru/api/v1")
         self.model = "GigaChat"
         
     def _get_headers(self) -> Dict[str, str]:
@@ -32,6 +36,20 @@ class GigaChatClient:
             "Content-Type": "application/json"
         }
     
+    def check_available(self, timeout: float = LLM_HEALTH_TIMEOUT) -> bool:
+        """
+        Проверка доступности API по списку моделей (GET /models)
+        
+        Запрос не расходует токены: проверяет сеть, ключ и что API отвечает.
+        
+        Raises:
+            RuntimeError: API ответил ошибкой (например, 401 при неверном ключе)
+        """
+        response = requests.get(f"{self.base_url}/models", headers=self._get_headers(), timeout=timeout)
+        if response.status_code != 200:
+            raise RuntimeError(f"API error: {response.status_code}")
+        return True
+    
     def generate_response(self, 
                          prompt: str, 
                          max_tokens: int = 1000,
@@ -99,8 +117,8 @@ class GigaChatClient:
 class SimpleLLMClient:
     """Упрощенный клиент - только GigaChat"""
     
-    def __init__(self, gigachat_api_key: str):
-        self.gigachat = GigaChatClient(gigachat_api_key)
+    def __init__(self, gigachat_api_key: str, base_url: Optional[str] = None):
+        self.gigachat = GigaChatClient(gigachat_api_key, base_url)
         logger.info("Инициализирован простой LLM клиент с GigaChat")
     
     def generate_answer(self, 
@@ -141,13 +159,9 @@ class SimpleLLMClient:
         )
     
     def health_check(self) -> bool:
-        """Проверка работоспособности LLM"""
+        """Проверка работоспособности LLM без генерации (список моделей)"""
         try:
-            response = self.gigachat.generate_response(
-                prompt="Привет! Это тест.",
-                max_tokens=50
-            )
-            return response.success
+            return self.gigachat.check_available()
         except Exception as e:
             logger.error(f"Health check failed: {str(e)}")
             return False 
\ No newline at end of file
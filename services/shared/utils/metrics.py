@@ -0,0 +1,303 @@
+"""
+Метрики Prometheus для сервисов RAG системы
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        Counter,
+        Gauge,
+        Histogram,
+        generate_latest,
+        start_http_server,
+    )
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+logger = logging.getLogger(__name__)
+
+# Границы бакетов для этапов пайплайна: от миллисекунд (поиск) до десятков секунд (LLM)
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _NoopMetric:
+    """Заглушка метрики, если prometheus_client не установлен"""
+
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+
+    def observe(self, value: float) -> None:
+        pass
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def dec(self, amount: float = 1) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+
+def _histogram(name: str, documentation: str, labelnames=(), buckets=STAGE_BUCKETS):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    return Histogram(name, documentation, labelnames, buckets=buckets)
+
+
+def _counter(name: str, documentation: str, labelnames=()):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    return Counter(name, documentation, labelnames)
+
+
+def _gauge(name: str, documentation: str, labelnames=()):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    return Gauge(name, documentation, labelnames)
+
+
+# RAG пайплайн
+RAG_STAGE_SECONDS = _histogram(
+    "rag_stage_duration_seconds",
+    "Длительность этапов RAG пайплайна (embed, search, context, llm, log, total)",
+    ["stage"],
+)
+RAG_REQUESTS_TOTAL = _counter(
+    "rag_requests_total",
+    "Количество вопросов к RAG системе",
+    ["status"],
+)
+RAG_COALESCED_REQUESTS_TOTAL = _counter(
+    "rag_coalesced_requests_total",
+    "Количество вопросов, объединенных с уже выполняющимся запросом",
+)
+
+# Обработка документов (Celery worker)
+INGESTION_DOCUMENTS_TOTAL = _counter(
+    "ingestion_documents_total",
+    "Количество обработанных документов",
+    ["status"],
+)
+INGESTION_CHUNKS_TOTAL = _counter(
+    "ingestion_chunks_total",
+    "Количество сохраненных чанков",
+)
+INGESTION_DURATION_SECONDS = _histogram(
+    "ingestion_document_duration_seconds",
+    "Длительность обработки одного документа",
+    buckets=(1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 1800.0),
+)
+INGESTION_CHUNKS_PER_SECOND = _gauge(
+    "ingestion_chunks_per_second",
+    "Скорость обработки последнего документа (чанков в секунду)",
+)
+EMBEDDING_BATCH_SIZES = _histogram(
+    "embedding_batch_size",
+    "Размер батчей при создании эмбеддингов",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+INGESTION_STAGE_SECONDS = _histogram(
+    "ingestion_stage_busy_seconds",
+    "Время работы этапа потоковой обработки документа (extract, chunk, embed, insert) без ожидания очередей",
+    ["stage"],
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 600.0, 1800.0),
+)
+INGESTION_STAGE_ITEMS_PER_SECOND = _gauge(
+    "ingestion_stage_items_per_second",
+    "Пропускная способность этапа на последнем документе (страниц/абзацев для extract, чанков для остальных)",
+    ["stage"],
+)
+EMBEDDINGS_REUSED_TOTAL = _counter(
+    "ingestion_embeddings_reused_total",
+    "Чанков, для которых взят сохраненный эмбеддинг того же текста вместо нового",
+)
+EMBEDDING_STORE_LOOKUPS_TOTAL = _counter(
+    "embedding_store_lookups_total",
+    "Поиск текстов в общем хранилище эмбеддингов",
+    ["result"],
+)
+DUPLICATE_UPLOADS_TOTAL = _counter(
+    "ingestion_duplicate_uploads_total",
+    "Загрузок файла, который уже есть в системе (обработка пропущена)",
+)
+
+# Celery задачи
+CELERY_TASK_SECONDS = _histogram(
+    "celery_task_duration_seconds",
+    "Длительность выполнения Celery задач",
+    ["task", "state"],
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 600.0, 1800.0),
+)
+CELERY_TASK_RETRIES_TOTAL = _counter(
+    "celery_task_retries_total",
+    "Количество повторов Celery задач",
+    ["task"],
+)
+CELERY_TASK_FAILURES_TOTAL = _counter(
+    "celery_task_failures_total",
+    "Количество Celery задач, завершившихся исключением",
+    ["task"],
+)
+CELERY_QUEUE_LENGTH = _gauge(
+    "celery_queue_length",
+    "Количество задач, ожидающих в очереди брокера",
+    ["queue"],
+)
+
+# Пул соединений SQLAlchemy
+DB_POOL_CHECKOUTS_TOTAL = _counter(
+    "db_pool_checkouts_total",
+    "Количество выдач соединений из пула SQLAlchemy",
+)
+DB_POOL_CHECKED_OUT = _gauge(
+    "db_pool_checked_out",
+    "Количество соединений, выданных из пула в данный момент",
+)
+
+# Фоновые проверки компонентов (shared.utils.health)
+HEALTH_COMPONENT_UP = _gauge(
+    "health_component_up",
+    "Результат последней проверки компонента (1 - работает)",
+    ["component"],
+)
+HEALTH_CHECK_SECONDS = _histogram(
+    "health_check_seconds",
+    "Длительность проверки компонента",
+    ["component"],
+)
+
+
+class StageTimer:
+    """
+    Замер длительности этапов пайплайна
+
+    Повторный замер этапа с тем же именем суммируется с предыдущим.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Контекстный менеджер для замера одного этапа"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def elapsed(self) -> float:
+        """Время с момента создания таймера в секундах"""
+        return time.perf_counter() - self.started_at
+
+    def finish(self) -> Dict[str, float]:
+        """
+        Завершение замера: добавляет этап total и экспортирует гистограммы
+
+        Returns:
+            Dict[str, float]: Длительность этапов в секундах
+        """
+        self.timings["total"] = self.elapsed()
+        observe_stage_timings(self.timings)
+        return {stage: round(seconds, 4) for stage, seconds in self.timings.items()}
+
+
+def observe_stage_timings(timings: Dict[str, float]) -> None:
+    """Запись длительностей этапов в гистограмму Prometheus"""
+    for stage, seconds in timings.items():
+        RAG_STAGE_SECONDS.labels(stage=stage).observe(seconds)
+
+
+def instrument_engine_pool(engine) -> None:
+    """
+    Подписка на события пула соединений SQLAlchemy
+
+    Повторный вызов для того же движка ничего не делает.
+    """
+    if getattr(engine, "_pool_metrics_instrumented", False):
+        return
+
+    from sqlalchemy import event
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKOUTS_TOTAL.inc()
+        DB_POOL_CHECKED_OUT.inc()
+
+    def on_checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.dec()
+
+    event.listen(engine, "checkout", on_checkout)
+    event.listen(engine, "checkin", on_checkin)
+    engine._pool_metrics_instrumented = True
+
+
+# Клиенты Redis для update_queue_lengths: URL -> клиент (пул соединений на процесс)
+_redis_clients: Dict[str, Any] = {}
+
+
+def update_queue_lengths(redis_url: str, queues: Iterable[str] = ("celery",)) -> None:
+    """
+    Обновление глубины очередей Celery (брокер Redis хранит очередь в списке)
+
+    Args:
+        redis_url: URL брокера Redis
+        queues: Имена очередей
+    """
+    if not PROMETHEUS_AVAILABLE:
+        return
+
+    try:
+        client = _redis_clients.get(redis_url)
+        if client is None:
+            import redis
+
+            client = _redis_clients[redis_url] = redis.Redis.from_url(redis_url, socket_timeout=1)
+        for queue in queues:
+            CELERY_QUEUE_LENGTH.labels(queue=queue).set(client.llen(queue))
+    except Exception as e:
+        logger.warning(f"Не удалось получить длину очередей Celery: {str(e)}")
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Текущие значения метрик в текстовом формате Prometheus
+
+    Returns:
+        Tuple[bytes, str]: Тело ответа и content-type
+    """
+    if not PROMETHEUS_AVAILABLE:
+        return b"# prometheus_client is not installed\n", CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: int, addr: str = "0.0.0.0") -> bool:
+    """
+    Запуск отдельного HTTP сервера с метриками (для сервисов без веб-интерфейса)
+
+    Args:
+        port: Порт для /metrics
+        addr: Адрес для прослушивания
+
+    Returns:
+        bool: True если сервер запущен
+    """
+    if not PROMETHEUS_AVAILABLE:
+        logger.warning("prometheus_client не установлен - метрики не экспортируются")
+        return False
+
+    try:
+        start_http_server(port, addr=addr)
+        logger.info(f"Метрики Prometheus доступны на порту {port}")
+        return True
+    except Exception as e:
+        logger.error(f"Не удалось запустить сервер метрик на порту {port}: {str(e)}")
+        return False
@@ -1,17 +1,29 @@
 # services/shared/utils/simple_rag.py
 
+import os
 import logging
+import threading
+from collections import OrderedDict
 import numpy as np
-from typing import List, Dict, Any, Optional
-from sentence_transformers import SentenceTransformer
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
 from ..models.document import Document, DocumentChunk
 from .llm_client import SimpleLLMClient, LLMResponse
+from .embeddings import EMBEDDINGS_NORMALIZE, create_embeddings_model, embeddings_model_key, load_pca_reducer
+from .embedding_models import forget_active_model, get_active_model_name, model_name_from_key, search_target
+from .vector_storage import get_search_mode, search_chunk_ids
+from .metrics import StageTimer, RAG_REQUESTS_TOTAL
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
 
 logger = logging.getLogger(__name__)
 
+# Эмбеддингов вопросов в кэше процесса (0 - без кэша)
+QUESTION_EMBEDDING_CACHE_SIZE = int(os.getenv("QUESTION_EMBEDDING_CACHE_SIZE", "1000"))
+
 class SimpleRAG:
     """
     Максимально простая RAG система
@@ -20,35 +32,124 @@ class SimpleRAG:
     - Никаких сложностей!
     """
     
-    def __init__(self, db_session: Session, gigachat_api_key: str):
+    def __init__(self, 
+                 db_session: Session, 
+                 gigachat_api_key: str,
+                 embeddings_model: Optional['SentenceTransformer'] = None,
+                 search_limit: int = 5,
+                 similarity_threshold: float = 0.7,
+                 follow_active_model: bool = False,
+                 question_cache_size: int = QUESTION_EMBEDDING_CACHE_SIZE):
         """
         Инициализация простой RAG системы
         
         Args:
             db_session: Сессия базы данных
             gigachat_api_key: API ключ для GigaChat
+            embeddings_model: Уже загруженная модель эмбеддингов (чтобы не загружать повторно)
+            search_limit: Количество чанков в контексте
+            similarity_threshold: Порог схожести при поиске чанков
+            follow_active_model: Загружать новую модель, когда в реестре embedding_models сменилась активная,
+                и искать по колонке векторов модели, которой посчитан вопрос
+            question_cache_size: Размер кэша эмбеддингов повторяющихся вопросов (LRU в процессе)
         """
         self.db = db_session
         self.llm_client = SimpleLLMClient(gigachat_api_key)
+        self.search_limit = search_limit
+        self.similarity_threshold = similarity_threshold
+        # Эмбеддинги вопросов: (модель, текст) -> вектор. Общее хранилище
+        # embedding_cache содержит тексты чанков, вопросы в нем не встречаются
+        self.question_cache_size = question_cache_size
+        self._question_cache: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._question_cache_lock = threading.Lock()
+        # PCA вопроса для первого прохода по сокращенным эмбеддингам
+        self.reducer = load_pca_reducer() if get_search_mode() == "reduced" else None
+        self.follow_active_model = follow_active_model
+        self._model_lock = threading.Lock()
+        
+        if embeddings_model is not None:
+            self.embeddings_model = embeddings_model
+            return
         
         # Загружаем локальную модель эмбеддингов (один раз)
         logger.info("Загружаем модель эмбеддингов...")
-        self.embeddings_model = SentenceTransformer('ai-forever/sbert_large_nlu_ru')
+        self.embeddings_model = create_embeddings_model()
         logger.info("Модель эмбеддингов загружена!")
         
-    def create_embedding(self, text: str) -> List[float]:
-        """Создание эмбеддинга для текста"""
+    def _sync_embeddings_model(self) -> None:
+        """Загружает активную модель из реестра, если она сменилась (переход на новую модель)"""
+        engine = self.db.get_bind()
+        active = get_active_model_name(engine)
+        if active == model_name_from_key(embeddings_model_key(self.embeddings_model)):
+            return
+        
+        with self._model_lock:
+            if active == model_name_from_key(embeddings_model_key(self.embeddings_model)):
+                return
+            logger.info(f"Активная модель эмбеддингов сменилась, загружаем {active}...")
+            self.embeddings_model = create_embeddings_model(model_name=active)
+            if self.reducer is not None and model_name_from_key(self.reducer.model_key) != active:
+                logger.warning("PCA подобран для прежней модели, первый проход reduced отключен")
+                self.reducer = None
+            logger.info(f"Модель эмбеддингов {active} загружена")
+    
+    def create_embedding(self, text: str) -> Optional[np.ndarray]:
+        """Создание эмбеддинга для текста (float32, None при ошибке)"""
+        return self._embed(text)[0]
+    
+    def _embed(self, text: str) -> Tuple[Optional[np.ndarray], Optional[str]]:
+        """Эмбеддинг текста и имя модели, которой он посчитан"""
         try:
-            embedding = self.embeddings_model.encode(text)
-            return embedding.tolist()
+            if self.follow_active_model:
+                self._sync_embeddings_model()
+            
+            # Модель может смениться параллельно - берем ее один раз
+            model = self.embeddings_model
+            model_key = embeddings_model_key(model)
+            key = (model_key, text)
+            
+            with self._question_cache_lock:
+                embedding = self._question_cache.get(key)
+                if embedding is not None:
+                    self._question_cache.move_to_end(key)
+                    return embedding, model_name_from_key(model_key)
+            
+            embedding = np.ascontiguousarray(
+                model.encode(text, normalize_embeddings=EMBEDDINGS_NORMALIZE), dtype=np.float32)
+            if self.question_cache_size > 0:
+                # Вектор отдается нескольким запросам - защищаем от изменения
+                embedding.setflags(write=False)
+                with self._question_cache_lock:
+                    self._question_cache[key] = embedding
+                    while len(self._question_cache) > self.question_cache_size:
+                        self._question_cache.popitem(last=False)
+            return embedding, model_name_from_key(model_key)
         except Exception as e:
             logger.error(f"Ошибка создания эмбеддинга: {str(e)}")
-            return []
+            return None, None
+    
+    def _search_target(self, model_name: str) -> Optional[Tuple[str, Optional[int]]]:
+        """
+        Колонка векторов и размерность для вопроса, посчитанного model_name
+        
+        Без follow_active_model поиск идет по embedding. Иначе модель
+        проверяется по реестру в транзакции поиска: до загрузки новой
+        активной модели вопрос ищется по векторам прежней (embedding_prev).
+        """
+        if not self.follow_active_model:
+            return "embedding", None
+        
+        target = search_target(self.db, model_name)
+        if target is None or target[0] != "embedding":
+            # Следующий вопрос загрузит активную модель, не дожидаясь проверки реестра
+            forget_active_model(self.db.get_bind())
+        return target
     
     def search_relevant_chunks(self, 
                               question: str, 
                               limit: int = 5,
-                              similarity_threshold: float = 0.7) -> List[DocumentChunk]:
+                              similarity_threshold: float = 0.7,
+                              timer: Optional[StageTimer] = None) -> List[DocumentChunk]:
         """
         Поиск релевантных чанков документов
         
@@ -56,38 +157,46 @@ class SimpleRAG:
             question: Вопрос пользователя
             limit: Максимальное количество чанков
             similarity_threshold: Порог схожести
+            timer: Таймер для замера этапов embed и search
             
         Returns:
             List[DocumentChunk]: Список релевантных чанков
         """
+        timer = timer or StageTimer()
         try:
-            # Создаем эмбеддинг для вопроса
-            question_embedding = self.create_embedding(question)
-            if not question_embedding:
+            target = None
+            # Вторая попытка - если векторов модели вопроса уже нет: загружаем активную
+            for _ in range(2):
+                # Создаем эмбеддинг для вопроса
+                with timer.stage('embed'):
+                    question_embedding, model_name = self._embed(question)
+                if question_embedding is None:
+                    return []
+                
+                with timer.stage('search'):
+                    target = self._search_target(model_name)
+                if target is not None:
+                    break
+                logger.warning(f"Векторов модели {model_name} нет в базе, загружаем активную модель")
+                self.db.rollback()
+            if target is None:
                 return []
+            column, dimensions = target
             
-            # Поиск похожих чанков через pgvector
-            query = text("""
-                SELECT id, document_id, content, chunk_index, 
-                       1 - (embedding <=> :question_embedding) as similarity
-                FROM document_chunks 
-                WHERE 1 - (embedding <=> :question_embedding) > :threshold
-                ORDER BY embedding <=> :question_embedding
-                LIMIT :limit
-            """)
-            
-            result = self.db.execute(query, {
-                'question_embedding': question_embedding,
-                'threshold': similarity_threshold,
-                'limit': limit
-            })
-            
-            chunk_ids = [row[0] for row in result]
-            
-            # Получаем полные объекты чанков
-            chunks = self.db.query(DocumentChunk).filter(
-                DocumentChunk.id.in_(chunk_ids)
-            ).all()
+            with timer.stage('search'):
+                # Поиск похожих чанков через pgvector (первый проход по halfvec/binary/PCA
+                # индексу с пересчетом по float векторам - см. VECTOR_SEARCH_MODE)
+                reduced = self.reducer.transform(question_embedding) if self.reducer is not None else None
+                chunk_ids = search_chunk_ids(self.db, question_embedding, limit, similarity_threshold,
+                                             reduced_embedding=reduced, column=column, dimensions=dimensions)
+                
+                # Получаем полные объекты чанков в порядке сходства
+                chunks = self.db.query(DocumentChunk).filter(
+                    DocumentChunk.id.in_(chunk_ids)
+                ).all()
+                positions = {chunk_id: position for position, chunk_id in enumerate(chunk_ids)}
+                chunks.sort(key=lambda chunk: positions[chunk.id])
+                self._detach(chunks)
             
             logger.info(f"Найдено {len(chunks)} релевантных чанков для вопроса: {question[:50]}...")
             return chunks
@@ -95,19 +204,46 @@ class SimpleRAG:
         except Exception as e:
             logger.error(f"Ошибка поиска чанков: {str(e)}")
             return []
+        finally:
+            # Читающая транзакция завершается сразу после поиска: блокировка
+            # document_chunks (search_target) не держится до ответа LLM и после
+            # него, а после ошибки сессия не остается в прерванной транзакции
+            self.db.rollback()
     
-    def format_context(self, chunks: List[DocumentChunk]) -> str:
+    def _detach(self, objects) -> None:
+        """Отделяет загруженные объекты от сессии: после rollback они не перечитываются из БД"""
+        for obj in objects:
+            self.db.expunge(obj)
+    
+    def _load_documents(self, chunks: List[DocumentChunk]) -> Dict[int, Document]:
+        """Загрузка документов для чанков одним запросом"""
+        document_ids = {chunk.document_id for chunk in chunks}
+        if not document_ids:
+            return {}
+        
+        try:
+            documents = self.db.query(Document).filter(
+                Document.id.in_(document_ids)
+            ).all()
+            self._detach(documents)
+        finally:
+            self.db.rollback()
+        return {document.id: document for document in documents}
+    
+    def format_context(self, 
+                       chunks: List[DocumentChunk],
+                       documents: Optional[Dict[int, Document]] = None) -> str:
         """Форматирование контекста из найденных чанков"""
         if not chunks:
             return "Информация не найдена."
         
+        if documents is None:
+            documents = self._load_documents(chunks)
+        
         context_parts = []
         for i, chunk in enumerate(chunks, 1):
             # Получаем название документа
-            document = self.db.query(Document).filter(
-                Document.id == chunk.document_id
-            ).first()
-            
+            document = documents.get(chunk.document_id)
             doc_title = document.title if document else "Неизвестный документ"
             
             context_parts.append(
@@ -127,46 +263,54 @@ class SimpleRAG:
             user_id: ID пользователя (для логирования)
             
         Returns:
-            Dict с ответом и метаданными
+            Dict с ответом и метаданными, включая длительность этапов
+            в секундах (timings) и общее время ответа (response_time)
         """
+        timer = StageTimer()
         try:
             logger.info(f"Обрабатываем вопрос: {question[:100]}...")
             
             # 1. Ищем релевантные документы
-            relevant_chunks = self.search_relevant_chunks(question)
+            relevant_chunks = self.search_relevant_chunks(
+                question,
+                limit=self.search_limit,
+                similarity_threshold=self.similarity_threshold,
+                timer=timer
+            )
             
             if not relevant_chunks:
-                return {
+                return self._finish(timer, {
                     'answer': 'К сожалению, я не нашел информации по вашему вопросу в корпоративной базе знаний. Попробуйте переформулировать вопрос или обратитесь к HR-отделу.',
                     'sources': [],
                     'success': True,
                     'tokens_used': 0
-                }
+                })
             
             # 2. Формируем контекст
-            context = self.format_context(relevant_chunks)
+            with timer.stage('context'):
+                documents = self._load_documents(relevant_chunks)
+                context = self.format_context(relevant_chunks, documents)
             
             # 3. Получаем ответ от LLM
-            llm_response = self.llm_client.generate_answer(
-                context=context,
-                question=question
-            )
+            with timer.stage('llm'):
+                llm_response = self.llm_client.generate_answer(
+                    context=context,
+                    question=question
+                )
             
             if not llm_response.success:
-                return {
+                return self._finish(timer, {
                     'answer': 'Извините, произошла ошибка при генерации ответа. Попробуйте позже.',
                     'sources': [],
                     'success': False,
                     'error': llm_response.error,
                     'tokens_used': 0
-                }
+                })
             
             # 4. Формируем источники
             sources = []
             for chunk in relevant_chunks:
-                document = self.db.query(Document).filter(
-                    Document.id == chunk.document_id
-                ).first()
+                document = documents.get(chunk.document_id)
                 
                 if document:
                     sources.append({
@@ -177,27 +321,44 @@ class SimpleRAG:
             
             # 5. Логируем запрос (опционально)
             if user_id:
-                self._log_query(user_id, question, llm_response.text, len(relevant_chunks))
+                with timer.stage('log'):
+                    self._log_query(user_id, question, llm_response.text,
+                                    len(relevant_chunks), response_time=timer.elapsed())
             
-            return {
+            return self._finish(timer, {
                 'answer': llm_response.text,
                 'sources': sources,
                 'success': True,
                 'tokens_used': llm_response.tokens_used,
                 'chunks_found': len(relevant_chunks)
-            }
+            })
             
         except Exception as e:
             logger.error(f"Ошибка в answer_question: {str(e)}")
-            return {
+            return self._finish(timer, {
                 'answer': 'Произошла техническая ошибка. Обратитесь к администратору.',
                 'sources': [],
                 'success': False,
                 'error': str(e),
                 'tokens_used': 0
-            }
+            })
+    
+    def _finish(self, timer: StageTimer, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Добавление длительности этапов к ответу и экспорт метрик"""
+        timings = timer.finish()
+        RAG_REQUESTS_TOTAL.labels(status='success' if result['success'] else 'error').inc()
+        logger.info(f"Этапы ответа (сек): {timings}")
+        
+        result['timings'] = timings
+        result['response_time'] = timings['total']
+        return result
     
-    def _log_query(self, user_id: int, question: str, answer: str, chunks_count: int):
+    def _log_query(self, 
+                   user_id: int, 
+                   question: str, 
+                   answer: str, 
+                   chunks_count: int,
+                   response_time: Optional[float] = None):
         """Логирование запроса пользователя"""
         try:
             from ..models.query_log import QueryLog
@@ -207,7 +368,8 @@ class SimpleRAG:
                 query_text=question,
                 response_text=answer,
                 chunks_used=chunks_count,
-                model_used="GigaChat"
+                model_used="GigaChat",
+                response_time=response_time
             )
             
             self.db.add(log_entry)
@@ -215,6 +377,35 @@ class SimpleRAG:
             
         except Exception as e:
             logger.error(f"Ошибка логирования запроса: {str(e)}")
+            self.db.rollback()
+    
+    def warm_up(self, text_: str = "Прогрев модели эмбеддингов") -> Dict[str, float]:
+        """
+        Прогрев перед приемом запросов: проход модели и пробный поиск по pgvector
+        
+        В отличие от search_relevant_chunks ошибки не перехватываются:
+        если модель или поиск не работают, сервис не готов.
+        
+        Returns:
+            Dict[str, float]: Длительность этапов embed и search, секунды
+        """
+        timer = StageTimer()
+        model = self.embeddings_model
+        with timer.stage('embed'):
+            embedding = np.ascontiguousarray(
+                model.encode(text_, normalize_embeddings=EMBEDDINGS_NORMALIZE), dtype=np.float32)
+        try:
+            with timer.stage('search'):
+                target = self._search_target(model_name_from_key(embeddings_model_key(model)))
+                if target is None:
+                    raise RuntimeError("Загруженная модель эмбеддингов не активна в реестре embedding_models")
+                column, dimensions = target
+                reduced = self.reducer.transform(embedding) if self.reducer is not None else None
+                search_chunk_ids(self.db, embedding, 1, -1.0, reduced_embedding=reduced,
+                                 column=column, dimensions=dimensions)
+        finally:
+            self.db.rollback()
+        return {stage: round(seconds, 4) for stage, seconds in timer.timings.items()}
     
     def health_check(self) -> Dict[str, bool]:
         """Проверка работоспособности всех компонентов"""
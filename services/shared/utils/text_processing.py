@@ -1,11 +1,8 @@
 import os
 import re
 import logging
-from typing import List, Optional
+from typing import Iterator, List, Optional
 from pathlib import Path
-import docx
-import PyPDF2
-from docx import Document as DocxDocument
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +10,10 @@ logger = logging.getLogger(__name__)
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "800"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "150"))
 
+# Все, кроме букв, цифр и знаков препинания (в том числе пробельные символы):
+# каждая такая последовательность заменяется одним пробелом
+_CLEAN_TEXT_RE = re.compile(r'[^\w.,!?;:()\-—–«»"\']+')
+
 
 def clean_text(text: str) -> str:
     """
@@ -21,16 +22,24 @@ def clean_text(text: str) -> str:
     if not text:
         return ""
     
-    # Удаляем лишние пробелы и переносы строк
-    text = re.sub(r'\s+', ' ', text)
-    
-    # Удаляем специальные символы, оставляя только буквы, цифры и знаки препинания
-    text = re.sub(r'[^\w\s\.,!?;:()\-—–«»""\']+', ' ', text)
-    
-    # Нормализуем пробелы
-    text = re.sub(r'\s+', ' ', text).strip()
+    # Удаляем специальные символы и нормализуем пробелы за один проход
+    return _CLEAN_TEXT_RE.sub(' ', text).strip()
+
+
+def estimate_chunk_count(text_length: int, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> int:
+    """
+    Оценка сверху количества чанков для текста заданной длины.
     
-    return text
+    Чанкеры сдвигают начало каждого следующего чанка не меньше чем на
+    chunk_size - overlap символов и останавливаются на чанке, дошедшем
+    до конца текста.
+    """
+    if text_length <= 0:
+        return 0
+    if text_length <= chunk_size:
+        return 1
+    step = max(chunk_size - overlap, 1)
+    return -(-(text_length - chunk_size) // step) + 1
 
 
 def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[str]:
@@ -40,6 +49,9 @@ def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVE
     if not text:
         return []
     
+    if overlap >= chunk_size:
+        raise ValueError(f"Перекрытие ({overlap}) должно быть меньше размера чанка ({chunk_size})")
+    
     # Очищаем текст
     text = clean_text(text)
     
@@ -48,6 +60,8 @@ def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVE
     
     chunks = []
     start = 0
+    # Минимальный сдвиг начала следующего чанка
+    step = chunk_size - overlap
     
     while start < len(text):
         end = start + chunk_size
@@ -55,41 +69,64 @@ def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVE
         # Если это не последний чанк, пытаемся найти границу предложения
         if end < len(text):
             # Ищем ближайшую точку, восклицательный или вопросительный знак
+            # (не ближе step от начала, иначе чанки пойдут почти посимвольно)
             sentence_end = max(
-                text.rfind('.', start, end),
-                text.rfind('!', start, end),
-                text.rfind('?', start, end)
+                text.rfind('.', start + step, end),
+                text.rfind('!', start + step, end),
+                text.rfind('?', start + step, end)
             )
             
             # Если нашли границу предложения, используем её
-            if sentence_end > start:
+            if sentence_end != -1:
                 end = sentence_end + 1
         
         chunk = text[start:end].strip()
         if chunk:
             chunks.append(chunk)
         
-        # Следующий чанк начинается с учетом перекрытия
-        start = end - overlap
+        # Чанк дошел до конца текста
+        if end >= len(text):
+            break
         
-        # Избегаем бесконечного цикла
-        if start >= end:
-            start = end
+        # Следующий чанк начинается с учетом перекрытия, но не ближе step
+        start = max(end - overlap, start + step)
     
     return chunks
 
 
+def iter_pdf_text(file_path: str) -> Iterator[str]:
+    """
+    Постранично извлекает текст из PDF файла.
+    
+    Генератор не держит в памяти весь текст документа: вызывающий код
+    может обрабатывать страницы по мере извлечения или собрать текст
+    одним "".join(...).
+    """
+    import PyPDF2
+    
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page in pdf_reader.pages:
+            yield page.extract_text() + "\n"
+
+
+def iter_docx_text(file_path: str) -> Iterator[str]:
+    """
+    Поабзацно извлекает текст из DOCX файла.
+    """
+    from docx import Document as DocxDocument
+    
+    doc = DocxDocument(file_path)
+    for paragraph in doc.paragraphs:
+        yield paragraph.text + "\n"
+
+
 def extract_text_from_pdf(file_path: str) -> str:
     """
     Извлекает текст из PDF файла.
     """
     try:
-        text = ""
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-        return text
+        return "".join(iter_pdf_text(file_path))
     except Exception as e:
         logger.error(f"Ошибка при извлечении текста из PDF {file_path}: {e}")
         return ""
@@ -100,11 +137,7 @@ def extract_text_from_docx(file_path: str) -> str:
     Извлекает текст из DOCX файла.
     """
     try:
-        doc = DocxDocument(file_path)
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text
+        return "".join(iter_docx_text(file_path))
     except Exception as e:
         logger.error(f"Ошибка при извлечении текста из DOCX {file_path}: {e}")
         return ""
@@ -0,0 +1,387 @@
+"""
+Поиск по эмбеддингам пониженной точности с пересчетом по float векторам
+
+Режимы первого прохода (VECTOR_SEARCH_MODE):
+- float   - точный поиск по embedding (vector, 4 байта на координату);
+- halfvec - HNSW индекс по embedding::halfvec (2 байта на координату);
+- binary  - HNSW индекс по binary_quantize(embedding) (1 бит на координату,
+            расстояние Хэмминга);
+- reduced - HNSW индекс по embedding_reduced: эмбеддинг, сокращенный PCA
+            (EMBEDDINGS_PCA_PATH) до 256/384 координат.
+
+Индексы halfvec и binary строятся по выражениям, поэтому колонка embedding
+остается единственным хранилищем полных векторов. Размерность в выражениях -
+размерность активной модели из реестра embedding_models (VECTOR_DIMENSIONS -
+только если она там не записана). При переходе на новую модель индексы
+заранее строятся по embedding_next и переименовываются вместе с колонками
+(см. embedding_models.switch_over). Первый проход отбирает
+limit * VECTOR_RESCORE_FACTOR кандидатов по индексу, затем они
+пересортировываются по точному косинусному расстоянию float векторов.
+
+Индексы создаются командой (нужен pgvector 0.7+):
+    python -m shared.utils.vector_storage migrate --mode halfvec
+    python -m shared.utils.vector_storage status
+
+PCA подбирается по эмбеддингам корпуса и применяется к сохраненным чанкам:
+    python -m shared.utils.vector_storage fit-pca --dimensions 256 --pca /app/models_cache/pca256.npz
+    python -m shared.utils.vector_storage reduce --pca /app/models_cache/pca256.npz
+    python -m shared.utils.vector_storage migrate --mode reduced --pca /app/models_cache/pca256.npz
+"""
+
+import os
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from sqlalchemy import bindparam, text
+
+from .vector_types import Float32Vector
+
+logger = logging.getLogger(__name__)
+
+VECTOR_SEARCH_MODES = ("float", "halfvec", "binary", "reduced")
+
+# Режим первого прохода поиска
+VECTOR_SEARCH_MODE = os.getenv("VECTOR_SEARCH_MODE", "float")
+
+# Кандидатов первого прохода на один результат
+VECTOR_RESCORE_FACTOR = int(os.getenv("VECTOR_RESCORE_FACTOR", "10"))
+
+# Размерность эмбеддингов для индексов, если ее нет в реестре embedding_models
+VECTOR_DIMENSIONS = int(os.getenv("VECTOR_DIMENSIONS", "1024"))
+
+# hnsw.ef_search не может быть больше
+MAX_EF_SEARCH = 1000
+
+MIN_PGVECTOR_VERSION = (0, 7, 0)
+
+INDEX_NAMES = {
+    "halfvec": "ix_document_chunks_embedding_halfvec",
+    "binary": "ix_document_chunks_embedding_binary",
+    "reduced": "ix_document_chunks_embedding_reduced",
+}
+
+# Индексы по выражениям от embedding (строятся заново при смене модели)
+EMBEDDING_INDEX_MODES = ("halfvec", "binary")
+
+# Векторов за один запрос при заполнении embedding_reduced
+REDUCE_BATCH_SIZE = 1000
+
+_reduced_column_ready = False
+
+
+def index_name(mode: str, column: str = "embedding") -> str:
+    """Имя индекса первого прохода (для embedding_next/embedding_prev - с суффиксом _next/_prev)"""
+    name = INDEX_NAMES[mode]
+    return name if column == "embedding" else f"{name}_{column.rsplit('_', 1)[1]}"
+
+
+def first_pass_expressions(mode: str, dimensions: int = VECTOR_DIMENSIONS,
+                           column: str = "embedding") -> Dict[str, str]:
+    """Выражения индекса и расстояния до вопроса для режима первого прохода по колонке column"""
+    if mode == "halfvec":
+        return {
+            "index": f"({column}::halfvec({dimensions})) halfvec_cosine_ops",
+            "distance": f"{column}::halfvec({dimensions}) <=> CAST(:question_embedding AS halfvec({dimensions}))",
+        }
+    if mode == "binary":
+        return {
+            "index": f"(binary_quantize({column})::bit({dimensions})) bit_hamming_ops",
+            "distance": (f"binary_quantize({column})::bit({dimensions}) <~> "
+                         f"binary_quantize(CAST(:question_embedding AS vector({dimensions})))"),
+        }
+    if mode == "reduced":
+        return {
+            "index": f"(embedding_reduced::vector({dimensions})) vector_cosine_ops",
+            "distance": (f"embedding_reduced::vector({dimensions}) <=> "
+                         f"CAST(:reduced_embedding AS vector({dimensions}))"),
+        }
+    raise ValueError(f"Неизвестный режим первого прохода: {mode}")
+
+
+def get_search_mode() -> str:
+    """Режим из VECTOR_SEARCH_MODE (неизвестное значение - float)"""
+    if VECTOR_SEARCH_MODE not in VECTOR_SEARCH_MODES:
+        logger.warning(f"Неизвестный режим поиска {VECTOR_SEARCH_MODE}, используем float")
+        return "float"
+    return VECTOR_SEARCH_MODE
+
+
+def candidate_count(limit: int, factor: int = VECTOR_RESCORE_FACTOR) -> int:
+    return min(MAX_EF_SEARCH, max(limit, limit * factor))
+
+
+def build_search_query(mode: str, dimensions: int = VECTOR_DIMENSIONS, column: str = "embedding"):
+    """
+    Запрос поиска чанков: id и точное сходство, отсортированные по убыванию
+
+    Параметры: question_embedding, threshold, limit, для первого прохода по
+    индексу - candidates, для reduced - reduced_embedding (вопрос после PCA).
+    column - колонка с float векторами (embedding_prev - векторы прежней модели).
+    """
+    if mode == "float":
+        query = text(f"""
+            SELECT id, 1 - ({column} <=> CAST(:question_embedding AS vector)) AS similarity
+            FROM document_chunks
+            WHERE 1 - ({column} <=> CAST(:question_embedding AS vector)) > :threshold
+            ORDER BY {column} <=> CAST(:question_embedding AS vector)
+            LIMIT :limit
+        """)
+    else:
+        distance = first_pass_expressions(mode, dimensions, column)["distance"]
+        query = text(f"""
+            WITH candidates AS (
+                SELECT id, {column} AS embedding
+                FROM document_chunks
+                ORDER BY {distance}
+                LIMIT :candidates
+            )
+            SELECT id, 1 - (embedding <=> CAST(:question_embedding AS vector)) AS similarity
+            FROM candidates
+            WHERE 1 - (embedding <=> CAST(:question_embedding AS vector)) > :threshold
+            ORDER BY embedding <=> CAST(:question_embedding AS vector)
+            LIMIT :limit
+        """)
+    query = query.bindparams(bindparam('question_embedding', type_=Float32Vector()))
+    if mode == "reduced":
+        query = query.bindparams(bindparam('reduced_embedding', type_=Float32Vector()))
+    return query
+
+
+def search_chunk_ids(db, question_embedding: np.ndarray, limit: int, threshold: float,
+                     mode: Optional[str] = None, factor: int = VECTOR_RESCORE_FACTOR,
+                     reduced_embedding: Optional[np.ndarray] = None,
+                     column: str = "embedding", dimensions: Optional[int] = None) -> List[int]:
+    """
+    id чанков, похожих на вопрос, в порядке убывания точного сходства
+
+    dimensions - размерность векторов column из реестра моделей (по умолчанию
+    размерность вопроса).
+    """
+    mode = mode or get_search_mode()
+    params = {'question_embedding': question_embedding, 'threshold': threshold, 'limit': limit}
+    dimensions = dimensions or len(question_embedding)
+
+    if mode == "reduced":
+        if reduced_embedding is None:
+            logger.warning("Режим reduced без PCA (EMBEDDINGS_PCA_PATH), используем float")
+            mode = "float"
+        else:
+            params['reduced_embedding'] = reduced_embedding
+            dimensions = len(reduced_embedding)
+
+    if mode != "float":
+        params['candidates'] = candidate_count(limit, factor)
+        # HNSW возвращает не больше ef_search строк - поднимаем до числа кандидатов
+        db.execute(text("SELECT set_config('hnsw.ef_search', :value, true)"),
+                   {'value': str(params['candidates'])})
+
+    return [row.id for row in db.execute(build_search_query(mode, dimensions, column), params)]
+
+
+def ensure_reduced_column(engine) -> None:
+    """Добавляет колонку embedding_reduced, если ее еще нет (один раз на процесс)"""
+    global _reduced_column_ready
+    if _reduced_column_ready:
+        return
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS embedding_reduced vector"))
+    _reduced_column_ready = True
+
+
+def set_reduced_embeddings(db, reduced: Dict[int, np.ndarray]) -> None:
+    """Записывает сокращенные эмбеддинги {id чанка: вектор}"""
+    if not reduced:
+        return
+    query = text("UPDATE document_chunks SET embedding_reduced = :embedding WHERE id = :chunk_id").bindparams(
+        bindparam('embedding', type_=Float32Vector()))
+    db.execute(query, [{'chunk_id': chunk_id, 'embedding': vector} for chunk_id, vector in reduced.items()])
+
+
+def load_embedding_sample(connection, size: int) -> np.ndarray:
+    """Случайная выборка float эмбеддингов чанков для подбора PCA"""
+    rows = connection.execute(text("""
+        SELECT embedding FROM document_chunks
+        WHERE embedding IS NOT NULL
+        ORDER BY random()
+        LIMIT :size
+    """).columns(embedding=Float32Vector()), {'size': size}).scalars().all()
+    return np.vstack([np.asarray(row, dtype=np.float32) for row in rows]) if rows else np.zeros((0, 0))
+
+
+def reduce_stored_embeddings(engine, reducer) -> int:
+    """Пересчитывает embedding_reduced всех чанков (после подбора нового PCA), возвращает число чанков"""
+    ensure_reduced_column(engine)
+    select = text("""
+        SELECT id, embedding FROM document_chunks
+        WHERE id > :after AND embedding IS NOT NULL
+        ORDER BY id
+        LIMIT :batch
+    """).columns(embedding=Float32Vector())
+
+    updated = 0
+    after = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(select, {'after': after, 'batch': REDUCE_BATCH_SIZE}).all()
+            if not rows:
+                break
+            reduced = reducer.transform(np.vstack([np.asarray(row.embedding, dtype=np.float32) for row in rows]))
+            set_reduced_embeddings(connection, {row.id: vector for row, vector in zip(rows, reduced)})
+        updated += len(rows)
+        after = rows[-1].id
+        logger.info(f"Сокращено {updated} эмбеддингов")
+    return updated
+
+
+def pgvector_version(connection) -> Optional[tuple]:
+    version = connection.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")).scalar()
+    if not version:
+        return None
+    return tuple(int(part) for part in version.split('.')[:3] if part.isdigit())
+
+
+def create_index(engine, mode: str, dimensions: int = VECTOR_DIMENSIONS, column: str = "embedding") -> str:
+    """
+    Создает HNSW индекс первого прохода (CREATE INDEX CONCURRENTLY, без блокировки записи)
+
+    column - колонка векторов для halfvec и binary (embedding_next - индекс
+    новой модели до переключения).
+
+    Returns:
+        str: Имя индекса
+    """
+    name = index_name(mode, column)
+    index = first_pass_expressions(mode, dimensions, column)["index"]
+    if mode == "reduced":
+        ensure_reduced_column(engine)
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        version = pgvector_version(connection)
+        if version is None or version < MIN_PGVECTOR_VERSION:
+            raise RuntimeError(f"Нужен pgvector {'.'.join(map(str, MIN_PGVECTOR_VERSION))}+, "
+                               f"установлен {version}: выполните ALTER EXTENSION vector UPDATE")
+
+        # Недостроенный после прерванного CONCURRENTLY индекс остается невалидным
+        invalid = connection.execute(text("""
+            SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = :name AND NOT i.indisvalid
+        """), {'name': name}).scalar()
+        if invalid:
+            connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+        connection.execute(text(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON document_chunks USING hnsw ({index})"
+        ))
+
+    logger.info(f"Индекс {name} готов")
+    return name
+
+
+def existing_indexes(connection, modes=EMBEDDING_INDEX_MODES, column: str = "embedding") -> List[str]:
+    """Режимы, для которых есть валидный индекс первого прохода по колонке"""
+    names = {index_name(mode, column): mode for mode in modes}
+    rows = connection.execute(text("""
+        SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname IN :names AND i.indisvalid
+    """).bindparams(bindparam('names', expanding=True)), {'names': list(names)}).scalars().all()
+    return [names[name] for name in rows]
+
+
+def drop_index(engine, mode: str) -> None:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAMES[mode]}"))
+
+
+def storage_status(connection) -> Dict[str, object]:
+    """Размеры таблицы чанков, ее векторов и индексов первого прохода, байт"""
+    has_reduced = connection.execute(text("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'document_chunks' AND column_name = 'embedding_reduced'
+    """)).scalar()
+    reduced_bytes = "coalesce(sum(pg_column_size(embedding_reduced)), 0)" if has_reduced else "NULL"
+    status = connection.execute(text(f"""
+        SELECT count(*) AS chunks,
+               coalesce(sum(pg_column_size(embedding)), 0) AS embedding_bytes,
+               {reduced_bytes} AS reduced_bytes,
+               pg_total_relation_size('document_chunks') AS table_total_bytes
+        FROM document_chunks
+    """)).mappings().one()
+
+    indexes = {}
+    for mode, name in INDEX_NAMES.items():
+        size = connection.execute(text("""
+            SELECT pg_relation_size(c.oid) FROM pg_class c WHERE c.relname = :name
+        """), {'name': name}).scalar()
+        indexes[mode] = size
+
+    return {**dict(status), "indexes": indexes}
+
+
+def main():
+    import argparse
+    from sqlalchemy import create_engine
+
+    from .embeddings import EMBEDDINGS_PCA_PATH, PcaReducer
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Индексы поиска пониженной точности и PCA")
+    parser.add_argument("command", choices=["migrate", "drop", "status", "fit-pca", "reduce"])
+    parser.add_argument("--mode", choices=["halfvec", "binary", "reduced", "all"], default="all",
+                        help="all - halfvec и binary")
+    parser.add_argument("--dimensions", type=int, default=None,
+                        help="Размерность векторов индекса или PCA "
+                             "(по умолчанию активной модели из реестра / из --pca)")
+    parser.add_argument("--pca", default=EMBEDDINGS_PCA_PATH, help="Файл PCA (.npz)")
+    parser.add_argument("--sample", type=int, default=20000, help="Векторов для подбора PCA")
+    parser.add_argument("--model-key", default=None, help="Ключ модели для PCA (по умолчанию активная модель)")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    args = parser.parse_args()
+
+    if not args.database_url:
+        raise SystemExit("Нужен --database-url или DATABASE_URL")
+    if args.command in ("fit-pca", "reduce") and not args.pca:
+        raise SystemExit("Нужен --pca или EMBEDDINGS_PCA_PATH")
+
+    engine = create_engine(args.database_url)
+    modes = ["halfvec", "binary"] if args.mode == "all" else [args.mode]
+    try:
+        if args.command == "fit-pca":
+            from .embedding_models import get_active_model_name
+
+            with engine.connect() as connection:
+                sample = load_embedding_sample(connection, args.sample)
+            reducer = PcaReducer.fit(sample, args.dimensions or 256, args.model_key or get_active_model_name(engine))
+            reducer.save(args.pca)
+            print(f"PCA {sample.shape[1]} -> {reducer.dimensions} по {len(sample)} векторам, "
+                  f"объясненная дисперсия {reducer.explained_variance_ratio.sum():.3f}: {args.pca}")
+        elif args.command == "reduce":
+            print(f"Сокращено эмбеддингов: {reduce_stored_embeddings(engine, PcaReducer.load(args.pca))}")
+        elif args.command == "migrate":
+            from .embedding_models import get_active_dimensions
+
+            for mode in modes:
+                dimensions = args.dimensions
+                if dimensions is None:
+                    dimensions = (PcaReducer.load(args.pca).dimensions if mode == "reduced"
+                                  else get_active_dimensions(engine) or VECTOR_DIMENSIONS)
+                create_index(engine, mode, dimensions)
+        elif args.command == "drop":
+            for mode in modes:
+                drop_index(engine, mode)
+
+        with engine.connect() as connection:
+            status = storage_status(connection)
+        reduced = (f", сокращенные: {status['reduced_bytes'] / 1024 / 1024:.1f} МБ"
+                   if status["reduced_bytes"] is not None else "")
+        print(f"Чанков: {status['chunks']}, векторы: {status['embedding_bytes'] / 1024 / 1024:.1f} МБ{reduced}, "
+              f"таблица с индексами: {status['table_total_bytes'] / 1024 / 1024:.1f} МБ")
+        for mode, size in status["indexes"].items():
+            print(f"  индекс {mode}: " + (f"{size / 1024 / 1024:.1f} МБ" if size is not None else "нет"))
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
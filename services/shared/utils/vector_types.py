@@ -0,0 +1,46 @@
+"""
+Тип pgvector для эмбеддингов float32
+
+pgvector.sqlalchemy.Vector передает вектор текстом и форматирует каждую
+координату отдельным вызовом float()/str() в Python (до 17 значащих цифр).
+Float32Vector принимает массивы NumPy и списки и форматирует весь вектор
+одной операцией %: 9 значащих цифр достаточно, чтобы float32 восстановился
+без потерь, а строка выходит примерно на треть короче. Чтение - как у
+Vector (массив float32).
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+from pgvector.sqlalchemy import Vector
+
+# Шаблоны строки вектора по размерности
+_formats: Dict[int, str] = {}
+
+
+def vector_to_db(value, dim: Optional[int] = None) -> Optional[str]:
+    """Текстовое представление вектора для pgvector"""
+    if value is None:
+        return None
+
+    values = np.asarray(value, dtype=np.float32)
+    if values.ndim != 1:
+        raise ValueError('expected ndim to be 1')
+    if dim is not None and len(values) != dim:
+        raise ValueError('expected %d dimensions, not %d' % (dim, len(values)))
+
+    template = _formats.get(len(values))
+    if template is None:
+        template = _formats[len(values)] = "[" + ",".join(["%.9g"] * len(values)) + "]"
+    return template % tuple(values.tolist())
+
+
+class Float32Vector(Vector):
+    """Vector с быстрой передачей массивов float32"""
+
+    cache_ok = True
+
+    def bind_processor(self, dialect):
+        def process(value):
+            return vector_to_db(value, self.dim)
+        return process
@@ -41,7 +41,8 @@ class BotConfig:
     UPLOADS_DIR: str = os.getenv("UPLOADS_DIR", "/app/uploads")
     
     # Настройки эмбеддингов
-    EMBEDDINGS_MODEL: str = os.getenv("EMBEDDINGS_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    # Начальная модель реестра embedding_models (по умолчанию та же, что у воркера)
+    EMBEDDINGS_MODEL: str = os.getenv("EMBEDDINGS_MODEL", "ai-forever/sbert_large_nlu_ru")
     EMBEDDINGS_CACHE_SIZE: int = int(os.getenv("EMBEDDINGS_CACHE_SIZE", "1000"))
     
     # Настройки Redis (если используется)
@@ -51,6 +52,16 @@ class BotConfig:
     MAX_WORKERS: int = int(os.getenv("MAX_WORKERS", "4"))
     REQUEST_TIMEOUT: int = int(os.getenv("REQUEST_TIMEOUT", "30"))
     
+    # Мониторинг (метрики Prometheus)
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "9100"))
+    
+    # Проверки готовности (/health/live, /health/ready)
+    HEALTH_PORT: int = int(os.getenv("HEALTH_PORT", "8081"))
+    INIT_RETRY_SECONDS: int = int(os.getenv("INIT_RETRY_SECONDS", "10"))
+    
+    # Период фоновых проверок БД и GigaChat для /health и /admin_stats, секунды
+    HEALTH_CHECK_INTERVAL: int = int(os.getenv("HEALTH_CHECK_INTERVAL", "60"))
+    
     @classmethod
     def validate(cls) -> bool:
         """
@@ -9,7 +9,7 @@ from pathlib import Path
 from typing import Generator
 import asyncio
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, Session
 
 # Добавляем путь к shared модулям (исправлено для Docker)
@@ -150,7 +150,8 @@ def get_or_create_user(telegram_id: int, username: str = None, full_name: str =
         db.close()
 
 def log_user_query(user_id: int, query_text: str, response_text: str, 
-                   chunks_used: int = 0, model_used: str = "GigaChat") -> bool:
+                   chunks_used: int = 0, model_used: str = "GigaChat",
+                   response_time: float = None) -> bool:
     """
     Логирование запроса пользователя
     
@@ -160,6 +161,7 @@ def log_user_query(user_id: int, query_text: str, response_text: str,
         response_text: Текст ответа
         chunks_used: Количество использованных чанков
         model_used: Используемая модель
+        response_time: Время ответа в секундах
         
     Returns:
         bool: Успешность операции
@@ -172,7 +174,8 @@ def log_user_query(user_id: int, query_text: str, response_text: str,
             query_text=query_text,
             response_text=response_text,
             chunks_used=chunks_used,
-            model_used=model_used
+            model_used=model_used,
+            response_time=response_time
         )
         
         db.add(log_entry)
@@ -239,7 +242,7 @@ def check_database_health() -> bool:
     try:
         db = next(get_db_session())
         # Простой запрос для проверки подключения
-        db.execute("SELECT 1")
+        db.execute(text("SELECT 1"))
         return True
     except Exception as e:
         logger.error(f"Ошибка проверки БД: {e}")
@@ -248,6 +251,22 @@ def check_database_health() -> bool:
         if 'db' in locals():
             db.close()
 
+def count_documents() -> int:
+    """
+    Количество обработанных документов (для фоновой проверки статуса)
+    
+    В отличие от get_documents_count ошибки БД не перехватываются:
+    проверка должна показать, что компонент не работает.
+    
+    Returns:
+        int: Количество документов
+    """
+    db = next(get_db_session())
+    try:
+        return db.query(Document).filter(Document.processing_status == 'completed').count()
+    finally:
+        db.close()
+
 def get_documents_count() -> int:
     """
     Получение количества документов в базе
@@ -256,12 +275,7 @@ def get_documents_count() -> int:
         int: Количество документов
     """
     try:
-        db = next(get_db_session())
-        count = db.query(Document).filter(Document.status == 'completed').count()
-        return count
+        return count_documents()
     except Exception as e:
         logger.error(f"Ошибка подсчета документов: {e}")
         return 0
-    finally:
-        if 'db' in locals():
-            db.close() 
\ No newline at end of file
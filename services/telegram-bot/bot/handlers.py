@@ -11,13 +11,13 @@ from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 
 from .config import config, Messages
-from .database import log_user_query, get_user_stats, check_database_health, get_documents_count, get_or_create_user
+from .database import log_user_query, get_user_stats, get_or_create_user
 from .rag_service import RAGService
 
 logger = logging.getLogger(__name__)
 
 # Инициализируем RAG сервис
-rag_service = RAGService()
+rag_service = RAGService(config.GIGACHAT_API_KEY)
 
 router = Router()
 
@@ -98,21 +98,14 @@ async def question_handler(message: Message):
         # Отправляем сообщение о том, что обрабатываем запрос
         processing_message = await message.answer("🔍 Ищу информацию...")
         
-        # Получаем ответ от RAG системы
-        answer = await rag_service.get_answer(message.text)
+        # Получаем ответ от RAG системы (запрос логируется внутри RAG)
+        result = await rag_service.answer_question(message.text, user_id=user.id)
         
         # Удаляем сообщение о обработке
         await processing_message.delete()
         
         # Отправляем ответ
-        await message.answer(answer)
-        
-        # Логируем запрос
-        await log_user_query(
-            user_id=user.id,
-            query=message.text,
-            response=answer
-        )
+        await message.answer(result['answer'])
         
     except Exception as e:
         logging.error(f"Ошибка в question_handler: {e}")
@@ -164,35 +157,21 @@ async def cmd_health(message: Message, user: Any = None, **kwargs):
         user: Пользователь из middleware
     """
     try:
-        # Проверяем здоровье системы
+        # Статус компонентов из кэша фоновых проверок (без запросов к БД и GigaChat)
+        health = rag_service.health_check()
         health_status = []
         
-        # Проверяем базу данных
-        try:
-            db_health = check_database_health()
-            if db_health:
-                health_status.append("✅ База данных: OK")
-            else:
-                health_status.append("❌ База данных: Ошибка")
-        except Exception as e:
-            health_status.append(f"❌ База данных: {str(e)[:50]}")
-        
-        # Проверяем RAG сервис
-        try:
-            rag_health = await rag_service.health_check()
-            if rag_health:
-                health_status.append("✅ RAG сервис: OK")
+        for key, title in (('database', 'База данных'), ('llm', 'GigaChat'), ('embeddings', 'Модель эмбеддингов')):
+            if health[key]:
+                health_status.append(f"✅ {title}: OK")
             else:
-                health_status.append("❌ RAG сервис: Ошибка")
-        except Exception as e:
-            health_status.append(f"❌ RAG сервис: {str(e)[:50]}")
+                error = health['errors'].get(key)
+                health_status.append(f"❌ {title}: {error[:50] if error else 'Ошибка'}")
         
-        # Проверяем количество документов
-        try:
-            docs_count = get_documents_count()
-            health_status.append(f"📄 Документов в базе: {docs_count}")
-        except Exception as e:
-            health_status.append(f"❌ Документы: {str(e)[:50]}")
+        if health['documents_count'] is not None:
+            health_status.append(f"📄 Документов в базе: {health['documents_count']}")
+        if health['checked_ago'] is not None:
+            health_status.append(f"\n🕒 Проверено {int(health['checked_ago'])} с назад")
         
         # Формируем ответ
         health_message = "🏥 Статус системы:\n\n" + "\n".join(health_status)
@@ -229,15 +208,15 @@ async def handle_admin_command(message: Message, user: Any = None, is_admin: boo
         command = message.text.lower()
         
         if command == "/admin_stats":
-            # Общая статистика системы
-            docs_count = get_documents_count()
+            # Общая статистика системы (статус - из кэша фоновых проверок)
+            health = rag_service.health_check()
             
             stats_text = f"""
 📊 <b>Административная статистика</b>
 
-📄 Документов в базе: {docs_count}
-🤖 Статус RAG: {"✅ Работает" if await rag_service.health_check() else "❌ Ошибка"}
-💾 Статус БД: {"✅ Работает" if check_database_health() else "❌ Ошибка"}
+📄 Документов в базе: {health['documents_count'] if health['documents_count'] is not None else "—"}
+🤖 Статус RAG: {"✅ Работает" if health['overall'] else "❌ Ошибка"}
+💾 Статус БД: {"✅ Работает" if health['database'] else "❌ Ошибка"}
 
 ⚙️ Конфигурация:
 • Макс. длина контекста: {config.MAX_CONTEXT_LENGTH}
@@ -0,0 +1,59 @@
+"""
+HTTP проверки живости и готовности бота для оркестратора
+
+- /health/live  - процесс запущен и event loop отвечает;
+- /health/ready - RAG система инициализирована: модель загружена и прогрета,
+  пробный поиск по pgvector прошел. До этого отвечает 503;
+- /health       - статус компонентов из кэша фоновых проверок
+  (RAGService.health_monitor), 503 если какой-то компонент не работает.
+"""
+
+import logging
+
+from aiohttp import web
+
+from .rag_service import RAGService
+
+logger = logging.getLogger(__name__)
+
+
+def create_health_app(rag_service: RAGService) -> web.Application:
+    """Создание приложения с эндпоинтами проверок"""
+
+    async def live(request: web.Request) -> web.Response:
+        return web.json_response({'status': 'alive'})
+
+    async def ready(request: web.Request) -> web.Response:
+        if rag_service.initialized:
+            return web.json_response({
+                'status': 'ready',
+                'warmup': rag_service.warmup_timings
+            })
+        return web.json_response({
+            'status': 'starting',
+            'error': rag_service.init_error
+        }, status=503)
+
+    async def status(request: web.Request) -> web.Response:
+        health = rag_service.health_check()
+        return web.json_response(health, status=200 if health['overall'] else 503)
+
+    app = web.Application()
+    app.router.add_get('/health', status)
+    app.router.add_get('/health/live', live)
+    app.router.add_get('/health/ready', ready)
+    return app
+
+
+async def start_health_server(port: int, rag_service: RAGService) -> web.AppRunner:
+    """
+    Запуск HTTP сервера проверок в текущем event loop
+
+    Returns:
+        web.AppRunner: Для остановки сервера (runner.cleanup())
+    """
+    runner = web.AppRunner(create_health_app(rag_service), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '0.0.0.0', port).start()
+    logger.info(f"🩺 Проверки готовности: http://0.0.0.0:{port}/health/ready")
+    return runner
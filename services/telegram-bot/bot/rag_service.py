@@ -5,6 +5,7 @@
 import asyncio
 import logging
 import os
+import re
 import sys
 from pathlib import Path
 from typing import Dict, Any, Optional
@@ -14,11 +15,28 @@ sys.path.append('/app/shared')
 
 from utils.simple_rag import SimpleRAG
 from utils.llm_client import SimpleLLMClient
+from utils.metrics import RAG_COALESCED_REQUESTS_TOTAL
+from utils.embeddings import create_embeddings_model
+from utils.embedding_models import get_active_model_name
+from utils.health import HealthMonitor
 from models.document import Document, DocumentChunk
-from .database import get_db_session
+from .config import config
+from .database import check_database_health, count_documents, get_db_session
 
 logger = logging.getLogger(__name__)
 
+
+def normalize_question(question: str) -> str:
+    """
+    Нормализация вопроса для объединения одинаковых запросов
+
+    Регистр, лишние пробелы и завершающие знаки препинания не влияют
+    на результат поиска, поэтому такие вопросы считаются одинаковыми.
+    """
+    normalized = re.sub(r'\s+', ' ', question or '').strip().lower()
+    return normalized.rstrip(' ?!.')
+
+
 class RAGService:
     """
     Асинхронный сервис для работы с RAG системой
@@ -29,41 +47,90 @@ class RAGService:
         self.gigachat_api_key = gigachat_api_key
         self.rag_system = None
         self.initialized = False
+        
+        # Инициализация выполняется один раз, даже если ее ждут несколько обработчиков
+        self._init_lock = asyncio.Lock()
+        self.init_error: Optional[str] = None
+        self.warmup_timings: Dict[str, float] = {}
+        
+        # Статус компонентов обновляется в фоне, команды статуса читают кэш
+        self._llm_probe = SimpleLLMClient(gigachat_api_key)
+        self.health_monitor = HealthMonitor({
+            'database': check_database_health,
+            'llm': self._llm_probe.gigachat.check_available,
+            'embeddings': self._check_embeddings,
+            'documents': count_documents
+        }, interval=config.HEALTH_CHECK_INTERVAL)
+        
+        # Выполняющиеся запросы: нормализованный вопрос -> задача пайплайна
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.coalescing_stats = {
+            'requests': 0,
+            'pipeline_runs': 0,
+            'coalesced': 0
+        }
     
     async def initialize(self):
-        """Инициализация RAG системы"""
+        """
+        Инициализация RAG системы
+        
+        Загружает модель, прогревает ее одним проходом и проверяет поиск
+        по pgvector. Одновременные вызовы ждут одну инициализацию; после
+        ошибки следующий вызов пробует снова.
+        """
         if self.initialized:
             return
         
-        try:
-            logger.info("🔄 Инициализируем RAG систему...")
-            
-            # Получаем синхронную сессию БД
-            db_session = next(get_db_session())
+        async with self._init_lock:
+            if self.initialized:
+                return
             
-            # Создаем RAG систему в отдельном потоке
-            loop = asyncio.get_event_loop()
-            self.rag_system = await loop.run_in_executor(
-                None, 
-                self._create_rag_system, 
-                db_session
-            )
-            
-            self.initialized = True
-            logger.info("✅ RAG система инициализирована")
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка инициализации RAG системы: {e}")
-            raise
+            try:
+                logger.info("🔄 Инициализируем RAG систему...")
+                
+                # Получаем синхронную сессию БД
+                db_session = next(get_db_session())
+                
+                # Создаем и прогреваем RAG систему в отдельном потоке
+                loop = asyncio.get_event_loop()
+                rag_system = await loop.run_in_executor(
+                    None, 
+                    self._create_rag_system, 
+                    db_session
+                )
+                self.warmup_timings = await loop.run_in_executor(None, rag_system.warm_up)
+                
+                self.rag_system = rag_system
+                self.init_error = None
+                self.initialized = True
+                self.health_monitor.refresh_soon()
+                logger.info(f"✅ RAG система инициализирована, прогрев: {self.warmup_timings}")
+                
+            except Exception as e:
+                self.init_error = str(e)
+                logger.error(f"❌ Ошибка инициализации RAG системы: {e}")
+                raise
     
     def _create_rag_system(self, db_session):
         """Создание RAG системы (синхронно)"""
-        return SimpleRAG(db_session, self.gigachat_api_key)
+        engine = db_session.get_bind()
+        embeddings_model = create_embeddings_model(model_name=get_active_model_name(engine))
+        return SimpleRAG(
+            db_session,
+            self.gigachat_api_key,
+            embeddings_model=embeddings_model,
+            search_limit=config.MAX_DOCUMENTS_IN_CONTEXT,
+            similarity_threshold=config.SIMILARITY_THRESHOLD,
+            follow_active_model=True
+        )
     
     async def answer_question(self, question: str, user_id: Optional[int] = None) -> Dict[str, Any]:
         """
         Асинхронный ответ на вопрос пользователя
         
+        Одинаковые вопросы, пришедшие одновременно, обрабатываются одним
+        запуском RAG пайплайна: остальные запросы ждут его результат.
+        
         Args:
             question: Вопрос пользователя
             user_id: ID пользователя Telegram
@@ -74,18 +141,44 @@ class RAGService:
         if not self.initialized:
             await self.initialize()
         
+        self.coalescing_stats['requests'] += 1
+        key = normalize_question(question)
+        
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalescing_stats['coalesced'] += 1
+            RAG_COALESCED_REQUESTS_TOTAL.inc()
+            logger.info(f"Вопрос объединен с уже выполняющимся запросом: {question[:50]}...")
+            result = await asyncio.shield(in_flight)
+            if user_id and result.get('success'):
+                await self._log_coalesced_query(user_id, question, result)
+            return {**result, 'coalesced': True}
+        
+        # Пайплайн - отдельная задача: отмена обработчика, запустившего его,
+        # не отменяет общий результат для объединенных запросов
+        task = asyncio.ensure_future(self._run_pipeline(question, user_id))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._forget_in_flight(key, task))
+        self.coalescing_stats['pipeline_runs'] += 1
+        
+        return await asyncio.shield(task)
+    
+    def _forget_in_flight(self, key: str, task: asyncio.Task):
+        """Запрос завершен - следующие вопросы запускают пайплайн заново"""
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+    
+    async def _run_pipeline(self, question: str, user_id: Optional[int]) -> Dict[str, Any]:
+        """Запуск RAG пайплайна в отдельном потоке"""
         try:
-            # Выполняем поиск ответа в отдельном потоке
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
                 None,
                 self.rag_system.answer_question,
                 question,
                 user_id
             )
             
-            return result
-            
         except Exception as e:
             logger.error(f"Ошибка получения ответа: {e}")
             return {
@@ -96,86 +189,61 @@ class RAGService:
                 'tokens_used': 0
             }
     
-    async def health_check(self) -> Dict[str, Any]:
-        """
-        Проверка работоспособности RAG системы
-        
-        Returns:
-            Dict со статусом компонентов
-        """
-        if not self.initialized:
-            try:
-                await self.initialize()
-            except Exception as e:
-                return {
-                    'overall': False,
-                    'llm': False,
-                    'embeddings': False,
-                    'database': False,
-                    'documents_count': None,
-                    'error': str(e)
-                }
-        
+    async def _log_coalesced_query(self, user_id: int, question: str, result: Dict[str, Any]):
+        """Логирование вопроса, получившего ответ из объединенного запроса"""
         try:
-            # Проверяем статус в отдельном потоке
-            loop = asyncio.get_event_loop()
-            status = await loop.run_in_executor(
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
                 None,
-                self.rag_system.health_check
+                self.rag_system._log_query,
+                user_id,
+                question,
+                result['answer'],
+                result.get('chunks_found', 0),
+                result.get('response_time')
             )
-            
-            # Получаем количество документов
-            documents_count = await self._get_documents_count()
-            
-            overall_status = all([
-                status['embeddings_model'],
-                status['llm_client'],
-                status['database']
-            ])
-            
-            return {
-                'overall': overall_status,
-                'llm': status['llm_client'],
-                'embeddings': status['embeddings_model'],
-                'database': status['database'],
-                'documents_count': documents_count
-            }
-            
         except Exception as e:
-            logger.error(f"Ошибка проверки статуса: {e}")
-            return {
-                'overall': False,
-                'llm': False,
-                'embeddings': False,
-                'database': False,
-                'documents_count': None,
-                'error': str(e)
-            }
+            logger.error(f"Ошибка логирования объединенного запроса: {e}")
     
-    async def _get_documents_count(self) -> Optional[int]:
-        """Получение количества документов в базе"""
-        try:
-            loop = asyncio.get_event_loop()
-            count = await loop.run_in_executor(
-                None,
-                self._count_documents_sync
-            )
-            return count
-        except Exception as e:
-            logger.error(f"Ошибка подсчета документов: {e}")
-            return None
+    def get_coalescing_stats(self) -> Dict[str, Any]:
+        """
+        Статистика объединения одинаковых запросов
+        
+        Returns:
+            Dict со счетчиками запросов, запусков пайплайна и объединений
+        """
+        return {
+            **self.coalescing_stats,
+            'in_flight': len(self._in_flight)
+        }
     
-    def _count_documents_sync(self) -> int:
-        """Синхронный подсчет документов"""
-        try:
-            db_session = next(get_db_session())
-            count = db_session.query(Document).filter(
-                Document.status == 'completed'
-            ).count()
-            return count
-        except Exception as e:
-            logger.error(f"Ошибка подсчета документов: {e}")
-            return 0
+    def _check_embeddings(self) -> bool:
+        """Модель загружена и прогрета"""
+        if not self.initialized:
+            raise RuntimeError(self.init_error or "RAG система не инициализирована")
+        return True
+    
+    def health_check(self) -> Dict[str, Any]:
+        """
+        Статус RAG системы по последним фоновым проверкам
+        
+        Не выполняет запросов к БД и GigaChat: результаты обновляет
+        health_monitor раз в HEALTH_CHECK_INTERVAL секунд.
+        
+        Returns:
+            Dict со статусом компонентов
+        """
+        snapshot = self.health_monitor.snapshot()
+        components = snapshot['components']
+        return {
+            'overall': snapshot['overall'],
+            'llm': components['llm']['ok'],
+            'embeddings': components['embeddings']['ok'],
+            'database': components['database']['ok'],
+            'documents_count': components['documents']['value'],
+            'checked_ago': snapshot['age'],
+            'errors': {name: status['error'] for name, status in components.items() if status['error']}
+        }
     
     async def search_documents(self, query: str, limit: int = 10) -> Dict[str, Any]:
         """
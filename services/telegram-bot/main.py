@@ -17,8 +17,10 @@ from aiogram.enums import ParseMode
 
 from bot.config import config, Messages
 from bot.database import init_db
-from bot.handlers import register_handlers
+from bot.handlers import register_handlers, rag_service
+from bot.health_server import start_health_server
 from bot.middleware import LoggingMiddleware, AuthMiddleware, RateLimitMiddleware
+from utils.metrics import start_metrics_server
 
 # Настройка логирования
 logging.basicConfig(
@@ -49,6 +51,25 @@ async def main():
         await init_db()
         logger.info("✅ База данных инициализирована")
         
+        # Экспортируем метрики Prometheus (длительность этапов RAG и т.д.)
+        start_metrics_server(config.METRICS_PORT)
+        
+        # Проверки живости/готовности; /health/ready отвечает 503 до прогрева модели
+        await start_health_server(config.HEALTH_PORT, rag_service)
+        
+        # Фоновые проверки БД и GigaChat для /health и /admin_stats
+        rag_service.health_monitor.start()
+        
+        # Загружаем и прогреваем модель до приема сообщений, чтобы первый
+        # вопрос не ждал загрузки. Пока БД или модель недоступны - повторяем
+        while True:
+            try:
+                await rag_service.initialize()
+                break
+            except Exception:
+                logger.info(f"🔄 Повторная инициализация RAG через {config.INIT_RETRY_SECONDS} с")
+                await asyncio.sleep(config.INIT_RETRY_SECONDS)
+        
         # Создаем бота (исправлено для aiogram 3.3.0)
         bot = Bot(
             token=config.BOT_TOKEN,